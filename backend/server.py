@@ -1,17 +1,37 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel, EmailStr
-from typing import List, Optional
+from pydantic import BaseModel, EmailStr, Field, ValidationError
+from typing import Dict, List, Optional
 import os
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure, PyMongoError
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import jwt
 from passlib.context import CryptContext
 import logging
 import random
 import string
+import base64
+import json
+import asyncio
+import hashlib
+import re
+import io
+import csv
+import codecs
+import tempfile
+import time
+import bisect
+import heapq
+from collections import OrderedDict
+from contextlib import suppress
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -499,6 +519,15 @@ class WordCard(BaseModel):
     difficulty: str
     points: int
     category: str
+    image: Optional[str] = None
+    image_variants: Optional[Dict[str, Dict[str, str]]] = None
+
+class JobCreate(BaseModel):
+    type: str
+    params: Dict = {}
+
+class WordImport(WordCard):
+    id: Optional[str] = None
 
 class StudySession(BaseModel):
     user_id: str
@@ -506,13 +535,35 @@ class StudySession(BaseModel):
     correct: bool
     timestamp: datetime
     points_earned: int = 0
+    client_event_id: Optional[str] = None
 
-class QuizResult(BaseModel):
-    user_id: str
-    score: int
-    total_questions: int
+class StudySessionEvent(BaseModel):
+    client_event_id: str
+    word_id: str
+    correct: bool
     timestamp: datetime
-    points_earned: int = 0
+
+class StudySessionBatch(BaseModel):
+    sessions: List[StudySessionEvent] = Field(..., max_length=500)
+
+class DecomposeRequest(BaseModel):
+    words: List[str] = Field(..., min_length=1, max_length=5000)
+    limit: int = Field(5, ge=1, le=50)
+
+class QuizGenerateRequest(BaseModel):
+    count: int = Field(10, ge=1, le=50)
+    choices: int = Field(4, ge=2, le=6)
+    seed: Optional[int] = None
+    word_ids: Optional[List[str]] = None
+    study_set_id: Optional[str] = None
+    difficulty: Optional[str] = None
+
+class QuizSessionCreate(QuizGenerateRequest):
+    time_limit_seconds: int = Field(600, ge=30, le=3600)
+
+class QuizAnswer(BaseModel):
+    question_id: int
+    choice_index: int
 
 class UserProgress(BaseModel):
     user_id: str
@@ -534,70 +585,2943 @@ class LoginCode(BaseModel):
     active: bool = True
     created_at: datetime
 
-class LoginCodeCreate(BaseModel):
-    class_name: str
-    block_number: Optional[str] = None
-    school: Optional[str] = None
-    grade: Optional[str] = None
-    max_uses: int = 50
-    expires_in_days: int = 30
+class LoginCodeCreate(BaseModel):
+    class_name: str
+    block_number: Optional[str] = None
+    school: Optional[str] = None
+    grade: Optional[str] = None
+    max_uses: int = 50
+    expires_in_days: int = 30
+
+class StudentRegisterWithCode(BaseModel):
+    email: EmailStr
+    password: str
+    first_name: str
+    last_name: str
+    login_code: Optional[str] = None
+
+# Password hashing pool
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', '4'))
+PASSWORD_HASH_MAX_QUEUE = int(os.environ.get('PASSWORD_HASH_MAX_QUEUE', '200'))
+
+class PasswordHasher:
+    """Runs bcrypt in a bounded thread pool so login bursts never block the event loop.
+
+    At most ``workers`` hashes run at once and up to ``max_queue`` more wait;
+    beyond that requests are rejected with 503 so clients back off and retry.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @staticmethod
+    def _timed(queued_at: float, func, *args):
+        return time.monotonic() - queued_at, func(*args)
+
+    async def run(self, func, *args):
+        if self.in_flight >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Server busy, please try again", headers={"Retry-After": "1"})
+        
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            wait, result = await loop.run_in_executor(self.executor, self._timed, time.monotonic(), func, *args)
+        finally:
+            self.in_flight -= 1
+        
+        self.completed += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        return result
+
+    def metrics(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": max(0, self.in_flight - self.workers),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "average_wait_ms": round(self.total_wait / self.completed * 1000, 1) if self.completed else 0,
+            "max_wait_ms": round(self.max_wait * 1000, 1)
+        }
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE)
+
+# Helper functions
+async def hash_password(password: str) -> str:
+    return await password_hasher.run(pwd_context.hash, password)
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.run(pwd_context.verify, plain_password, hashed_password)
+
+def create_access_token(data: dict):
+    to_encode = data.copy()
+    expire = datetime.utcnow() + timedelta(hours=24)
+    to_encode.update({"exp": expire})
+    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return encoded_jwt
+
+def calculate_level(points: int) -> int:
+    """Calculate user level based on points"""
+    if points < 100:
+        return 1
+    elif points < 250:
+        return 2
+    elif points < 500:
+        return 3
+    elif points < 1000:
+        return 4
+    elif points < 2000:
+        return 5
+    else:
+        return min(10, 5 + (points - 2000) // 500)
+
+def get_badges(points: int, level: int, streak: int) -> List[str]:
+    """Determine earned badges"""
+    badges = []
+    if points >= 100:
+        badges.append("First Century")
+    if points >= 500:
+        badges.append("Word Warrior")
+    if points >= 1000:
+        badges.append("Scholar Supreme")
+    if level >= 5:
+        badges.append("Level Master")
+    if streak >= 7:
+        badges.append("Week Warrior")
+    if streak >= 30:
+        badges.append("Monthly Master")
+    return badges
+
+def generate_login_code() -> str:
+    """Generate a unique login code"""
+    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
+
+# Word listing helpers
+WORD_FIELDS = list(WordCard.model_fields.keys())
+
+def encode_word_cursor(word_id: str) -> str:
+    """Encode the last returned word id as an opaque pagination cursor"""
+    raw = json.dumps({"id": word_id}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_word_cursor(cursor: str) -> str:
+    """Decode a pagination cursor back into the last seen word id"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))["id"]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def parse_word_fields(fields: Optional[str]) -> List[str]:
+    """Validate a comma separated fields= projection against WordCard"""
+    if not fields:
+        return WORD_FIELDS
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in WORD_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    # The id is always returned so clients can page and fetch details
+    return ["id"] + [f for f in requested if f != "id"]
+
+# Conditional responses
+async def get_revision(resource: str) -> int:
+    """Read the write revision counter of a resource"""
+    doc = await db.revisions.find_one({"_id": resource})
+    return doc["rev"] if doc else 0
+
+async def bump_revision(resource: str):
+    """Record a write so cached copies of the resource become stale"""
+    await db.revisions.update_one({"_id": resource}, {"$inc": {"rev": 1}}, upsert=True)
+
+def make_etag(*parts) -> str:
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check If-None-Match using weak comparison"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
+def set_cache_headers(response: Response, etag: str):
+    # Browsers revalidate with If-None-Match on every request
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+
+def not_modified_response(etag: str) -> Response:
+    response = Response(status_code=304)
+    set_cache_headers(response, etag)
+    return response
+
+# Word catalog cache
+CATALOG_POLL_SECONDS = float(os.environ.get('CATALOG_POLL_SECONDS', '5'))
+
+class WordCatalog:
+    """Process-local copy of the word catalog.
+
+    Words are kept in a dict keyed by id together with the pre-serialized JSON
+    of the full list. A shared revision counter in ``db.revisions`` lets other
+    workers notice writes, either through a change stream or by polling.
+    """
+
+    def __init__(self):
+        self.words = {}
+        self.payload = b"[]"
+        self.etag = None
+        self.version = None
+        self.listeners = []
+        self._lock = asyncio.Lock()
+
+    async def current_version(self) -> int:
+        return await get_revision("words")
+
+    async def load(self):
+        """Reload every word from Mongo and rebuild the serialized payload"""
+        async with self._lock:
+            version = await self.current_version()
+            words = {}
+            async for word in db.words.find({}, {"_id": 0}):
+                try:
+                    words[word["id"]] = WordCard(**word).model_dump()
+                except Exception as e:
+                    logger.warning(f"Skipping invalid word {word.get('id')}: {e}")
+            self._replace(words, version)
+
+    def _replace(self, words: dict, version: int):
+        changed = [word for word_id, word in words.items() if self.words.get(word_id) != word]
+        removed = [word_id for word_id in self.words if word_id not in words]
+        
+        self.words = words
+        self.version = version
+        self.payload = json.dumps(list(words.values())).encode()
+        self.etag = f'"words-{hashlib.md5(self.payload).hexdigest()}"'
+        
+        # Let derived indexes update themselves from the diff
+        for listener in self.listeners:
+            listener(changed, removed)
+
+    async def ensure_loaded(self):
+        if self.version is None:
+            await self.load()
+
+    async def invalidate(self):
+        """Bump the shared revision after a write and reload this process"""
+        await bump_revision("words")
+        await self.load()
+
+    def get(self, word_id: str) -> Optional[dict]:
+        return self.words.get(word_id)
+
+    async def watch(self):
+        """Reload when another worker changes the catalog"""
+        try:
+            while True:
+                async with db.words.watch() as stream:
+                    logger.info("Word catalog watching change stream")
+                    async for _ in stream:
+                        # Drain queued events so a bulk write triggers a single reload
+                        while await stream.try_next() is not None:
+                            pass
+                        await self.load()
+                # A restore renaming a collection over words ends the stream; reopen it
+                await self.load()
+        except Exception as e:
+            # Change streams need a replica set; a local mongod falls back to polling
+            logger.info(f"Word catalog polling revision every {CATALOG_POLL_SECONDS}s ({e})")
+            while True:
+                await asyncio.sleep(CATALOG_POLL_SECONDS)
+                try:
+                    if await self.current_version() != self.version:
+                        await self.load()
+                except Exception as e:
+                    logger.warning(f"Word catalog poll failed: {e}")
+
+word_catalog = WordCatalog()
+background_tasks = []
+
+# Media storage
+MEDIA_ROOT = Path(os.environ.get('MEDIA_ROOT', Path(__file__).parent / 'media'))
+MEDIA_CHUNK_SIZE = 64 * 1024
+# Only raster formats browsers render as images; anything else could run as a page on our origin
+IMAGE_CONTENT_TYPES = {"image/png": "PNG", "image/jpeg": "JPEG", "image/gif": "GIF", "image/webp": "WEBP"}
+DATA_URL_PATTERN = re.compile(r"^data:(?P<content_type>[\w.+-]+/[\w.+-]+);base64,(?P<data>.+)$", re.DOTALL)
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+class MediaStore:
+    """Content-addressed blob store on the local filesystem.
+
+    Blobs are named by their SHA-256 digest, so identical uploads are stored
+    once. Content types live in ``db.media`` next to the blob size.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def _write(self, digest: str, data: bytes):
+        path = self.path(digest)
+        if path.exists():
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary name first so readers never see a partial blob
+        tmp_path = path.with_name(f"{digest}.{uuid.uuid4().hex}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+    async def put(self, data: bytes, content_type: str) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        await asyncio.to_thread(self._write, digest, data)
+        await db.media.update_one(
+            {"_id": digest},
+            {"$setOnInsert": {"content_type": content_type, "size": len(data), "created_at": datetime.utcnow()}},
+            upsert=True
+        )
+        return digest
+
+    def iter_range(self, digest: str, start: int, end: int):
+        """Yield the bytes start..end (inclusive) of a blob in chunks"""
+        with open(self.path(digest), "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(MEDIA_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+media_store = MediaStore(MEDIA_ROOT)
+
+def parse_byte_range(range_header: str, size: int) -> tuple:
+    """Inclusive (start, end) of a single byte-range header; 416 when invalid or unsatisfiable"""
+    match = RANGE_PATTERN.match(range_header.strip())
+    if not match or match.groups() == ("", ""):
+        raise HTTPException(status_code=416, detail="Invalid range", headers={"Content-Range": f"bytes */{size}"})
+    first, last = match.groups()
+    end = size - 1
+    if first:
+        start = int(first)
+        if last:
+            end = min(int(last), size - 1)
+    else:
+        # Suffix range: the last N bytes
+        start = max(size - int(last), 0)
+    if start > end or start >= size:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+def media_url(digest: str) -> str:
+    return f"/api/media/{digest}"
+
+def verify_image(data: bytes, content_type: str) -> bool:
+    """Whether data decodes as an image of the declared type (runs in a worker thread)"""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.verify()
+            return image.format == IMAGE_CONTENT_TYPES[content_type]
+    except Exception:
+        return False
+
+async def store_inline_image(word_data: dict) -> dict:
+    """Move a base64 data URL in word_data["image"] into the media store"""
+    image = word_data.get("image")
+    if not isinstance(image, str) or not image.startswith("data:"):
+        return word_data
+    match = DATA_URL_PATTERN.match(image)
+    if not match:
+        raise HTTPException(status_code=400, detail="Invalid image data")
+    content_type = match.group("content_type").lower()
+    if content_type not in IMAGE_CONTENT_TYPES:
+        raise HTTPException(status_code=400, detail="Images must be PNG, JPEG, GIF or WebP")
+    try:
+        data = base64.b64decode(match.group("data"), validate=True)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid image data")
+    if not await asyncio.to_thread(verify_image, data, content_type):
+        raise HTTPException(status_code=400, detail=f"Image data is not a valid {content_type} file")
+    digest = await media_store.put(data, content_type)
+    # Variants are filled in by the image worker pool once rendered
+    return {**word_data, "image": media_url(digest), "image_hash": digest, "image_variants": None}
+
+# Responsive image variants
+IMAGE_VARIANT_WIDTHS = {"thumb": 160, "320w": 320, "640w": 640, "1024w": 1024}
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', '2'))
+
+image_executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="image-variants")
+image_tasks = set()
+
+def render_image_variants(data: bytes) -> Dict[str, Dict[str, bytes]]:
+    """Resize an image to each variant width as WebP and JPEG (runs in a worker thread)"""
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source).convert("RGBA")
+    
+    # JPEG has no alpha channel, so flatten onto white
+    flattened = Image.new("RGB", image.size, (255, 255, 255))
+    flattened.paste(image, mask=image.getchannel("A"))
+    
+    variants = {}
+    for name, width in IMAGE_VARIANT_WIDTHS.items():
+        # Never upscale; the thumbnail is always produced
+        if width >= image.width and name != "thumb":
+            continue
+        size = (width, max(1, round(image.height * width / image.width))) if width < image.width else image.size
+        encoded = {}
+        buffer = io.BytesIO()
+        image.resize(size, Image.LANCZOS).save(buffer, "WEBP", quality=80, method=4)
+        encoded["webp"] = buffer.getvalue()
+        buffer = io.BytesIO()
+        flattened.resize(size, Image.LANCZOS).save(buffer, "JPEG", quality=82, optimize=True, progressive=True)
+        encoded["jpeg"] = buffer.getvalue()
+        variants[name] = encoded
+    return variants
+
+async def build_image_variants(digest: str) -> Dict[str, Dict[str, str]]:
+    """Render and store the variants of a stored image, reusing earlier renders"""
+    media = await db.media.find_one({"_id": digest})
+    if media and media.get("variants"):
+        return media["variants"]
+    
+    data = await asyncio.to_thread(media_store.path(digest).read_bytes)
+    loop = asyncio.get_running_loop()
+    rendered = await loop.run_in_executor(image_executor, render_image_variants, data)
+    
+    variants = {}
+    for name, encoded in rendered.items():
+        variants[name] = {}
+        for image_format, variant_data in encoded.items():
+            variant_digest = await media_store.put(variant_data, f"image/{image_format}")
+            variants[name][image_format] = media_url(variant_digest)
+    
+    await db.media.update_one({"_id": digest}, {"$set": {"variants": variants}})
+    return variants
+
+async def attach_image_variants(word_id: str, digest: str):
+    try:
+        variants = await build_image_variants(digest)
+    except Exception as e:
+        logger.error(f"Image variants failed for word {word_id}: {e}")
+        return
+    # Skip if the slide image was replaced while rendering
+    result = await db.words.update_one(
+        {"id": word_id, "image_hash": digest},
+        {"$set": {"image_variants": variants}}
+    )
+    if result.modified_count:
+        await word_catalog.invalidate()
+
+# Written only by the server; a client echoing back a stale copy must not overwrite them
+SERVER_IMAGE_FIELDS = ("image_hash", "image_variants")
+
+def without_server_image_fields(word_data: dict) -> dict:
+    return {field: value for field, value in word_data.items() if field not in SERVER_IMAGE_FIELDS}
+
+def schedule_image_variants(word_id: str, word_doc: dict):
+    """Render variants in the background so the editor does not wait for them"""
+    if word_doc.get("image_hash") and not word_doc.get("image_variants"):
+        task = asyncio.create_task(attach_image_variants(word_id, word_doc["image_hash"]))
+        image_tasks.add(task)
+        task.add_done_callback(image_tasks.discard)
+
+# Cross-worker leases
+LEASE_SECONDS = 60
+
+class Lease:
+    """A named lock shared by every worker through the leases collection.
+
+    The holder renews it in the background; if the holder dies the lease
+    expires after ``ttl`` seconds and another worker may take it. Fields set
+    with ``update`` are visible to other workers on the lease document.
+    """
+
+    def __init__(self, name: str, ttl: float = LEASE_SECONDS):
+        self.name = name
+        self.ttl = ttl
+        self.owner = str(uuid.uuid4())
+        self.renewer = None
+
+    async def acquire(self) -> bool:
+        now = datetime.utcnow()
+        try:
+            # Matches only a missing or expired lease; a live one makes the upsert collide on _id
+            await db.leases.update_one(
+                {"_id": self.name, "expires_at": {"$lte": now}},
+                {"$set": {"owner": self.owner, "acquired_at": now, "expires_at": now + timedelta(seconds=self.ttl)}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return False
+        self.renewer = asyncio.create_task(self._renew())
+        return True
+
+    async def _renew(self):
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            try:
+                await self.update()
+            except PyMongoError as e:
+                logger.error(f"❌ Could not renew lease {self.name}: {e}")
+
+    async def update(self, **fields):
+        fields["expires_at"] = datetime.utcnow() + timedelta(seconds=self.ttl)
+        await db.leases.update_one({"_id": self.name, "owner": self.owner}, {"$set": fields})
+
+    async def release(self):
+        if self.renewer:
+            self.renewer.cancel()
+            self.renewer = None
+        await db.leases.delete_one({"_id": self.name, "owner": self.owner})
+
+    async def __aenter__(self):
+        if not await self.acquire():
+            raise HTTPException(status_code=409, detail=f"{self.name} is already running on another worker")
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.release()
+
+# Per-user statistics
+# While user_stats is rebuilt, statistics of events recorded after the rebuild's
+# cutoff go to user_stats_deltas and are merged in once the rebuild is done.
+# Writers re-read the cutoff every STATS_REBUILD_CHECK_SECONDS, and the cutoff is
+# published STATS_REBUILD_SETTLE_SECONDS ahead so every writer sees it in time.
+STATS_REBUILD_LEASE = "user-stats-rebuild"
+STATS_REBUILD_CHECK_SECONDS = 1.0
+STATS_REBUILD_SETTLE_SECONDS = 5.0
+
+def to_utc(timestamp) -> datetime:
+    """Normalize a stored or client timestamp to a naive UTC datetime"""
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+def user_stats_increments(timestamp, sessions: int = 0, correct: int = 0, quizzes: int = 0,
+                          quiz_score: int = 0, points: int = 0) -> dict:
+    """Build the $inc document for one event, including its daily activity bucket"""
+    day = to_utc(timestamp).strftime("%Y-%m-%d")
+    totals = {
+        "study_sessions": sessions,
+        "study_correct": correct,
+        "quiz_count": quizzes,
+        "quiz_score_sum": quiz_score,
+        "points": points
+    }
+    daily = {"sessions": sessions, "correct": correct, "quizzes": quizzes, "points": points}
+    
+    increments = {field: value for field, value in totals.items() if value}
+    increments.update({f"daily.{day}.{field}": value for field, value in daily.items() if value})
+    return increments
+
+class StatsRebuildCutoff:
+    """This worker's view of a running statistics rebuild, re-read at most every second"""
+
+    def __init__(self):
+        self.cutoff = None
+        self.checked = None
+
+    async def get(self) -> Optional[datetime]:
+        now = time.monotonic()
+        if self.checked is None or now - self.checked >= STATS_REBUILD_CHECK_SECONDS:
+            lease = await db.leases.find_one({"_id": STATS_REBUILD_LEASE})
+            live = lease and lease["expires_at"] > datetime.utcnow()
+            self.cutoff = lease.get("cutoff") if live else None
+            self.checked = now
+        return self.cutoff
+
+stats_rebuild_cutoff = StatsRebuildCutoff()
+
+async def user_stats_collection(recorded_at: datetime):
+    """Where statistics of events recorded at ``recorded_at`` are applied"""
+    cutoff = await stats_rebuild_cutoff.get()
+    return db.user_stats_deltas if cutoff and recorded_at >= cutoff else db.user_stats
+
+async def apply_user_stats(user_id: str, increments: dict, collection=None) -> Optional[dict]:
+    """Apply one user's increments; returns the updated daily buckets they touched"""
+    if not increments:
+        return None
+    collection = collection if collection is not None else db.user_stats
+    return await collection.find_one_and_update(
+        {"user_id": user_id},
+        {"$inc": increments, "$set": {"updated_at": datetime.utcnow()}},
+        projection={"_id": 0, **{field: 1 for field in increments if field.startswith("daily.")}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+
+def flatten_increments(doc: dict, prefix: str = "") -> dict:
+    """Turn a nested counter document back into dotted $inc fields"""
+    increments = {}
+    for field, value in doc.items():
+        if isinstance(value, dict):
+            increments.update(flatten_increments(value, f"{prefix}{field}."))
+        else:
+            increments[f"{prefix}{field}"] = value
+    return increments
+
+async def merge_user_stats_deltas() -> int:
+    """Fold statistics recorded during a rebuild into user_stats"""
+    merged = 0
+    async for delta in db.user_stats_deltas.find({}):
+        counters = {field: value for field, value in delta.items() if field not in ("_id", "user_id", "updated_at")}
+        await apply_user_stats(delta["user_id"], flatten_increments(counters))
+        await db.user_stats_deltas.delete_one({"_id": delta["_id"]})
+        merged += 1
+    return merged
+
+# Class analytics
+ANALYTICS_GROUP_FIELDS = ["teacher", "class_name", "block_number", "school", "grade"]
+WEAKEST_ROOTS_LIMIT = 3
+WEAKEST_ROOTS_MIN_ATTEMPTS = 3
+
+def weakest_roots(word_stats: List[dict]) -> List[dict]:
+    """Pick the words with the lowest accuracy among those attempted often enough"""
+    candidates = [w for w in word_stats if w["attempts"] >= WEAKEST_ROOTS_MIN_ATTEMPTS]
+    candidates.sort(key=lambda w: (w["correct"] / w["attempts"], -w["attempts"]))
+    roots = []
+    for w in candidates[:WEAKEST_ROOTS_LIMIT]:
+        word = word_catalog.get(w["word_id"]) or {}
+        roots.append({
+            "word_id": w["word_id"],
+            "root": word.get("root", w["word_id"]),
+            "attempts": w["attempts"],
+            "accuracy_rate": round(w["correct"] / w["attempts"] * 100, 1)
+        })
+    return roots
+
+def rate(numerator: int, denominator: int) -> float:
+    return round(numerator / denominator * 100, 1) if denominator else 0
+
+def group_sort_key(value) -> tuple:
+    """Order group values as Mongo sorts them: missing first, then numbers, then strings"""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    return (2, str(value))
+
+async def run_class_analytics(database, group_by: str, filters: dict, days: int) -> dict:
+    """Per-student and per-group analytics from one aggregation over users.
+
+    The pipeline emits one document per student, so no single result grows
+    with the size of the class; groups and their weakest roots are summed
+    here while the cursor is read.
+    """
+    since = datetime.utcnow() - timedelta(days=days)
+    pipeline = [
+        {"$match": {"is_teacher": False, **filters}},
+        {"$sort": {"last_name": 1, "first_name": 1}},
+        # Per-word attempts for each student; uses the (user_id, word_id) index
+        {"$lookup": {
+            "from": "study_sessions",
+            "let": {"user_id": "$id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$user_id", "$$user_id"]}}},
+                {"$group": {
+                    "_id": "$word_id",
+                    "attempts": {"$sum": 1},
+                    "correct": {"$sum": {"$cond": ["$correct", 1, 0]}},
+                    "recent": {"$sum": {"$cond": [{"$gte": [{"$toDate": "$timestamp"}, since]}, 1, 0]}}
+                }}
+            ],
+            "as": "word_stats"
+        }},
+        {"$lookup": {
+            "from": "quiz_results",
+            "let": {"user_id": "$id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$user_id", "$$user_id"]}}},
+                {"$group": {"_id": None, "count": {"$sum": 1}, "score": {"$sum": "$score"}}}
+            ],
+            "as": "quiz_stats"
+        }},
+        {"$project": {
+            "_id": 0,
+            "id": 1, "email": 1, "first_name": 1, "last_name": 1, "total_points": 1,
+            **{field: 1 for field in ANALYTICS_GROUP_FIELDS},
+            "word_stats": {"$map": {"input": "$word_stats", "as": "w", "in": {
+                "word_id": "$$w._id", "attempts": "$$w.attempts", "correct": "$$w.correct"
+            }}},
+            "study_sessions": {"$sum": "$word_stats.attempts"},
+            "correct": {"$sum": "$word_stats.correct"},
+            "recent": {"$sum": "$word_stats.recent"},
+            "quizzes": {"$ifNull": [{"$first": "$quiz_stats.count"}, 0]},
+            "quiz_score": {"$ifNull": [{"$first": "$quiz_stats.score"}, 0]}
+        }}
+    ]
+    
+    totals = {}
+    group_words = {}
+    students = []
+    async for student in database.users.aggregate(pipeline, allowDiskUse=True):
+        word_stats = student.pop("word_stats")
+        correct, recent = student.pop("correct"), student.pop("recent")
+        quizzes, quiz_score = student.pop("quizzes"), student.pop("quiz_score")
+        
+        group = student.get(group_by)
+        total = totals.setdefault(group, {"students": 0, "study_sessions": 0, "correct": 0, "recent": 0, "quizzes": 0, "quiz_score": 0})
+        for field, value in [("students", 1), ("study_sessions", student["study_sessions"]), ("correct", correct),
+                             ("recent", recent), ("quizzes", quizzes), ("quiz_score", quiz_score)]:
+            total[field] += value
+        words = group_words.setdefault(group, {})
+        for w in word_stats:
+            word = words.setdefault(w["word_id"], {"word_id": w["word_id"], "attempts": 0, "correct": 0})
+            word["attempts"] += w["attempts"]
+            word["correct"] += w["correct"]
+        
+        students.append({
+            **student,
+            "accuracy_rate": rate(correct, student["study_sessions"]),
+            "recent_activity_count": recent,
+            "total_quizzes": quizzes,
+            "average_quiz_score": round(quiz_score / quizzes, 1) if quizzes else 0,
+            "weakest_roots": weakest_roots(word_stats)
+        })
+    
+    groups = [{
+        "group": group,
+        "students": total["students"],
+        "study_sessions": total["study_sessions"],
+        "accuracy_rate": rate(total["correct"], total["study_sessions"]),
+        "recent_activity_count": total["recent"],
+        "total_quizzes": total["quizzes"],
+        "average_quiz_score": round(total["quiz_score"] / total["quizzes"], 1) if total["quizzes"] else 0,
+        "weakest_roots": weakest_roots(list(group_words[group].values()))
+    } for group, total in sorted(totals.items(), key=lambda item: group_sort_key(item[0]))]
+    
+    return {"group_by": group_by, "window_days": days, "groups": groups, "students": students}
+
+# Index registry
+# Every index the app relies on, applied idempotently at startup
+INDEX_REGISTRY = [
+    # Authentication and profile lookups
+    {"collection": "users", "keys": [("email", 1)], "unique": True},
+    {"collection": "users", "keys": [("id", 1)], "unique": True},
+    # Leaderboard: non-teachers sorted by points
+    {"collection": "users", "keys": [("is_teacher", 1), ("total_points", -1)]},
+    # Class analytics filters
+    *[{"collection": "users", "keys": [("is_teacher", 1), (field, 1)]} for field in ANALYTICS_GROUP_FIELDS],
+    # Word catalog and the filtered, id-ordered word listing
+    {"collection": "words", "keys": [("id", 1)], "unique": True},
+    *[{"collection": "words", "keys": [(field, 1), ("id", 1)]} for field in ["origin", "type", "difficulty", "category"]],
+    # Bulk import matches rows without an id on root and type
+    {"collection": "words", "keys": [("root", 1), ("type", 1)]},
+    # Word snapshots: newest first, and each snapshot's manifest in word order
+    {"collection": "word_snapshots", "keys": [("status", 1), ("created_at", -1)]},
+    {"collection": "word_snapshot_entries", "keys": [("snapshot_id", 1), ("word_id", 1)], "unique": True},
+    {"collection": "word_blobs", "keys": [("created_at", 1)]},
+    {"collection": "word_blobs", "keys": [("last_used", 1)]},
+    # Admin jobs: recent first, by type, and stale-job recovery
+    {"collection": "jobs", "keys": [("created_at", -1)]},
+    {"collection": "jobs", "keys": [("type", 1), ("status", 1)]},
+    {"collection": "jobs", "keys": [("status", 1), ("updated_at", 1)]},
+    # Quiz sessions, dropped by Mongo once expired
+    {"collection": "quiz_sessions", "keys": [("id", 1)], "unique": True},
+    {"collection": "quiz_sessions", "keys": [("expires_at", 1)], "expire_after": 0},
+    # Per-user events, statistics and analytics
+    {"collection": "study_sessions", "keys": [("user_id", 1), ("timestamp", 1)]},
+    {"collection": "study_sessions", "keys": [("user_id", 1), ("word_id", 1)]},
+    # Client event ids make retried and batched events idempotent
+    {"collection": "study_sessions", "keys": [("user_id", 1), ("client_event_id", 1)], "unique": True,
+     "partial": {"client_event_id": {"$exists": True}}},
+    {"collection": "quiz_results", "keys": [("user_id", 1), ("timestamp", 1)]},
+    {"collection": "quiz_results", "keys": [("user_id", 1), ("client_event_id", 1)], "unique": True,
+     "partial": {"client_event_id": {"$exists": True}}},
+    # Events whose points and statistics a failed write left unapplied
+    *[{"collection": collection, "keys": [("applied", 1), ("claimed_until", 1)], "partial": {"applied": False}}
+      for collection in ["study_sessions", "quiz_results"]],
+    {"collection": "user_stats", "keys": [("user_id", 1)], "unique": True},
+    {"collection": "user_stats_deltas", "keys": [("user_id", 1)], "unique": True},
+    # Spaced repetition schedule
+    {"collection": "srs_cards", "keys": [("user_id", 1), ("word_id", 1)], "unique": True},
+    {"collection": "srs_cards", "keys": [("user_id", 1), ("due_at", 1)]},
+    # Login codes
+    {"collection": "login_codes", "keys": [("code", 1)], "unique": True},
+    {"collection": "login_codes", "keys": [("id", 1)], "unique": True},
+    {"collection": "login_codes", "keys": [("teacher_id", 1), ("created_at", -1)]},
+]
+
+# Queries on hot paths that must be answered from an index
+HOT_QUERIES = [
+    {"name": "login by email", "collection": "users", "filter": {"email": "student@example.com"}},
+    {"name": "current user by id", "collection": "users", "filter": {"id": "user-id"}},
+    {"name": "leaderboard", "collection": "users", "filter": {"is_teacher": False}, "sort": [("total_points", -1)]},
+    {"name": "class roster", "collection": "users", "filter": {"is_teacher": False, "class_name": "Class"}},
+    {"name": "word by id", "collection": "words", "filter": {"id": "word-id"}},
+    {"name": "filtered word page", "collection": "words", "filter": {"origin": "Greek", "id": {"$gt": ""}}, "sort": [("id", 1)]},
+    {"name": "quiz session by id", "collection": "quiz_sessions", "filter": {"id": "session-id"}},
+    {"name": "recent study sessions", "collection": "study_sessions", "filter": {"user_id": "user-id"}, "sort": [("timestamp", -1)]},
+    {"name": "recent quiz results", "collection": "quiz_results", "filter": {"user_id": "user-id"}, "sort": [("timestamp", -1)]},
+    {"name": "unapplied events", "collection": "study_sessions", "filter": {"applied": False, "claimed_until": {"$lte": datetime(2024, 1, 1)}}},
+    {"name": "user statistics", "collection": "user_stats", "filter": {"user_id": "user-id"}},
+    {"name": "due review cards", "collection": "srs_cards", "filter": {"user_id": "user-id", "due_at": {"$lte": datetime(2024, 1, 1)}}, "sort": [("due_at", 1)]},
+    {"name": "seen new words", "collection": "srs_cards", "filter": {"user_id": "user-id", "word_id": {"$in": ["word-id"]}}},
+    {"name": "active login code", "collection": "login_codes", "filter": {"code": "ABCD1234", "active": True}},
+    {"name": "teacher login codes", "collection": "login_codes", "filter": {"teacher_id": "user-id"}, "sort": [("created_at", -1)]},
+]
+
+async def create_registered_index(collection, spec: dict):
+    options = {"unique": spec.get("unique", False)}
+    if spec.get("partial"):
+        options["partialFilterExpression"] = spec["partial"]
+    if "expire_after" in spec:
+        options["expireAfterSeconds"] = spec["expire_after"]
+    await collection.create_index(spec["keys"], **options)
+
+async def ensure_indexes(database=None):
+    """Create every registered index; existing identical indexes are a no-op"""
+    database = database if database is not None else db
+    for spec in INDEX_REGISTRY:
+        try:
+            await create_registered_index(database[spec["collection"]], spec)
+        except OperationFailure as e:
+            # e.g. duplicate values blocking a unique index; keep serving and report it
+            logger.error(f"❌ Index {spec['collection']} {spec['keys']} could not be created: {e}")
+
+def plan_stages(plan) -> List[str]:
+    """Collect every stage name in an explain() plan tree"""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(plan_stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            stages.extend(plan_stages(value))
+    return stages
+
+async def check_hot_queries(database=None) -> List[str]:
+    """Explain every hot query and describe the ones not served by an index"""
+    database = database if database is not None else db
+    problems = []
+    for query in HOT_QUERIES:
+        cursor = database[query["collection"]].find(query["filter"])
+        if query.get("sort"):
+            cursor = cursor.sort(query["sort"])
+        explain = await cursor.explain()
+        stages = plan_stages(explain["queryPlanner"]["winningPlan"])
+        if "COLLSCAN" in stages:
+            problems.append(f"{query['name']}: collection scan on {query['collection']}")
+        elif query.get("sort") and "SORT" in stages:
+            problems.append(f"{query['name']}: in-memory sort on {query['collection']}")
+    return problems
+
+# Authenticated user cache
+USER_CACHE_TTL_SECONDS = float(os.environ.get('USER_CACHE_TTL_SECONDS', '30'))
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', '10000'))
+
+class UserCache:
+    """Short-TTL LRU of user documents, without the password hash, keyed by user id"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+
+    def get(self, user_id: str) -> Optional[dict]:
+        entry = self.entries.get(user_id)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if expires_at < time.monotonic():
+            del self.entries[user_id]
+            return None
+        self.entries.move_to_end(user_id)
+        return user
+
+    def set(self, user_id: str, user: dict):
+        self.entries[user_id] = (time.monotonic() + self.ttl, user)
+        self.entries.move_to_end(user_id)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        self.entries.pop(user_id, None)
+
+user_cache = UserCache(USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS)
+
+async def user_changed(user_id: str):
+    """Drop the cached copy of a user and mark user listings stale"""
+    user_cache.invalidate(user_id)
+    await bump_revision("users")
+
+# Leaderboard
+# Scope name -> user field it groups by
+LEADERBOARD_SCOPES = {"global": None, "school": "school", "teacher": "teacher", "class": "class_name", "block": "block_number"}
+LEADERBOARD_WINDOWS = {"all": None, "week": 7, "month": 30}
+LEADERBOARD_DAYS_KEPT = 31
+LEADERBOARD_REBUILD_SECONDS = float(os.environ.get('LEADERBOARD_REBUILD_SECONDS', '300'))
+LEADERBOARD_USER_FIELDS = ["id", "first_name", "last_name", "level", "total_points", "badges", "school", "teacher", "class_name", "block_number"]
+
+class RankedBoard:
+    """User ids ordered by points descending, kept as a sorted list of (-points, user_id)"""
+
+    def __init__(self):
+        self.keys = []
+
+    def add(self, user_id: str, points: int):
+        bisect.insort(self.keys, (-points, user_id))
+
+    def discard(self, user_id: str, points: int):
+        index = bisect.bisect_left(self.keys, (-points, user_id))
+        if index < len(self.keys) and self.keys[index] == (-points, user_id):
+            del self.keys[index]
+
+    def rank(self, points: int) -> int:
+        """1 + the number of users with strictly more points"""
+        return bisect.bisect_left(self.keys, (-points,)) + 1
+
+    def top(self, limit: int) -> List[str]:
+        return [user_id for _, user_id in self.keys[:limit]]
+
+class Leaderboard:
+    """In-memory ranked boards of students per scope, updated on every points change.
+
+    Each worker keeps its own copy, rebuilt from Mongo at startup and every
+    LEADERBOARD_REBUILD_SECONDS to pick up points awarded by other workers.
+    Time-windowed boards are summed from per-day point buckets. Changes made
+    while a rebuild reads Mongo are replayed onto the rebuilt board, and
+    ``instance`` with ``version`` identify exactly what this worker serves.
+    """
+
+    def __init__(self):
+        self.users = {}
+        self.daily = {}
+        self.boards = {}
+        self.instance = uuid.uuid4().hex
+        self.version = 0
+        self.loaded = False
+        self._window_cache = {}
+        self._changes = None
+
+    def _board_keys(self, user: dict):
+        for scope, field in LEADERBOARD_SCOPES.items():
+            if field is None:
+                yield (scope, None)
+            elif user.get(field):
+                yield (scope, user[field])
+
+    def _unlink(self, user_id: str):
+        user = self.users.pop(user_id, None)
+        if user:
+            for key in self._board_keys(user):
+                self.boards[key].discard(user_id, user["total_points"])
+        return user
+
+    def _link(self, user: dict):
+        self.users[user["id"]] = user
+        for key in self._board_keys(user):
+            self.boards.setdefault(key, RankedBoard()).add(user["id"], user["total_points"])
+
+    def upsert_user(self, user: dict):
+        """Add or refresh a student; teachers are never ranked"""
+        if self._changes is not None:
+            self._changes.append(("upsert", user))
+        self._unlink(user["id"])
+        if not user.get("is_teacher"):
+            entry = {field: user.get(field) for field in LEADERBOARD_USER_FIELDS}
+            entry.update({"total_points": user.get("total_points", 0), "level": user.get("level", 1), "badges": user.get("badges", [])})
+            self._link(entry)
+        self.version += 1
+
+    def remove_user(self, user_id: str):
+        if self._changes is not None:
+            self._changes.append(("remove", user_id))
+        self._unlink(user_id)
+        self.daily.pop(user_id, None)
+        self.version += 1
+
+    def add_points(self, user_id: str, daily_points: dict, total_points: Optional[int] = None,
+                   day_totals: Optional[dict] = None):
+        """Apply points awarded to a user, given per activity day.
+
+        ``total_points`` and ``day_totals`` are the values Mongo returned after
+        the award. Awarded points only grow, so the board keeps the larger of
+        its own value and these, which makes applying an award twice or out of
+        order harmless. Without them the award is added on.
+        """
+        if self._changes is not None:
+            self._changes.append(("points", (user_id, daily_points, total_points, day_totals)))
+        user = self._unlink(user_id)
+        if user:
+            if total_points is None:
+                user["total_points"] += sum(daily_points.values())
+            else:
+                user["total_points"] = max(user["total_points"], total_points)
+            self._link(user)
+        days = self.daily.setdefault(user_id, {})
+        for day, points in daily_points.items():
+            if day_totals is None or day not in day_totals:
+                days[day] = days.get(day, 0) + points
+            else:
+                days[day] = max(days.get(day, 0), day_totals[day])
+        self.version += 1
+
+    def board(self, scope: str, value: Optional[str]) -> RankedBoard:
+        return self.boards.get((scope, value), RankedBoard())
+
+    def _window_ranking(self, scope: str, value: Optional[str], days: int) -> List[tuple]:
+        """(points, user_id) sorted best first for the last `days` days, cached per version"""
+        cache_key = (scope, value, days)
+        cached = self._window_cache.get(cache_key)
+        if cached and cached[0] == self.version:
+            return cached[1]
+        today = datetime.utcnow().date()
+        window_days = {(today - timedelta(days=offset)).strftime("%Y-%m-%d") for offset in range(days)}
+        ranking = []
+        for _, user_id in self.board(scope, value).keys:
+            points = sum(p for day, p in self.daily.get(user_id, {}).items() if day in window_days)
+            ranking.append((-points, user_id))
+        ranking.sort()
+        self._window_cache[cache_key] = (self.version, ranking)
+        return ranking
+
+    def top(self, scope: str, value: Optional[str], window: str, limit: int) -> List[dict]:
+        days = LEADERBOARD_WINDOWS[window]
+        if days is None:
+            board = self.board(scope, value)
+            return [dict(self.users[user_id], rank=board.rank(self.users[user_id]["total_points"])) for user_id in board.top(limit)]
+        ranking = self._window_ranking(scope, value, days)
+        return [
+            dict(self.users[user_id], window_points=-negative_points, rank=bisect.bisect_left(ranking, (negative_points,)) + 1)
+            for negative_points, user_id in ranking[:limit]
+        ]
+
+    def rank(self, user_id: str, scope: str, value: Optional[str], window: str) -> Optional[dict]:
+        user = self.users.get(user_id)
+        if not user:
+            return None
+        board = self.board(scope, value)
+        days = LEADERBOARD_WINDOWS[window]
+        if days is None:
+            return {"rank": board.rank(user["total_points"]), "total": len(board.keys), "points": user["total_points"]}
+        ranking = self._window_ranking(scope, value, days)
+        today = datetime.utcnow().date()
+        window_days = {(today - timedelta(days=offset)).strftime("%Y-%m-%d") for offset in range(days)}
+        points = sum(p for day, p in self.daily.get(user_id, {}).items() if day in window_days)
+        return {"rank": bisect.bisect_left(ranking, (-points,)) + 1, "total": len(ranking), "points": points}
+
+    async def rebuild(self):
+        """Reload every student and their recent daily points from Mongo"""
+        cutoff = (datetime.utcnow() - timedelta(days=LEADERBOARD_DAYS_KEPT)).strftime("%Y-%m-%d")
+        # Changes made by this worker while Mongo is read, replayed onto the new board
+        self._changes = changes = []
+        try:
+            users = {}
+            async for user in db.users.find({"is_teacher": False}, {"_id": 0, **{field: 1 for field in LEADERBOARD_USER_FIELDS}}):
+                users[user["id"]] = user
+            daily = {}
+            async for stats in db.user_stats.find({}, {"_id": 0, "user_id": 1, "daily": 1}):
+                if stats["user_id"] not in users:
+                    continue
+                daily[stats["user_id"]] = {
+                    day: bucket.get("points", 0) for day, bucket in stats.get("daily", {}).items() if day >= cutoff
+                }
+        finally:
+            self._changes = None
+        
+        self.users, self.boards, self.daily, self._window_cache = {}, {}, daily, {}
+        for user in users.values():
+            self.upsert_user(user)
+        for kind, change in changes:
+            if kind == "points":
+                self.add_points(*change)
+            elif kind == "remove":
+                self.remove_user(change)
+            elif change["id"] not in users:
+                # Registered during the read; a refreshed student keeps the totals just read
+                self.upsert_user(change)
+        self.loaded = True
+
+    async def ensure_loaded(self):
+        if not self.loaded:
+            await self.rebuild()
+
+    async def refresh_periodically(self):
+        while True:
+            await asyncio.sleep(LEADERBOARD_REBUILD_SECONDS)
+            try:
+                await self.rebuild()
+            except Exception as e:
+                logger.warning(f"Leaderboard rebuild failed: {e}")
+
+leaderboard = Leaderboard()
+
+# Spaced repetition
+SRS_INITIAL_EASE = 2.5
+SRS_MIN_EASE = 1.3
+SRS_RELEARN_MINUTES = 10
+SRS_MASTERED_INTERVAL_DAYS = 21
+SRS_DIFFICULT_LAPSES = 3
+DIFFICULTY_ORDER = {"beginner": 0, "intermediate": 1, "advanced": 2}
+
+def new_srs_card(user_id: str, word_id: str) -> dict:
+    return {"user_id": user_id, "word_id": word_id, "ease": SRS_INITIAL_EASE, "interval_days": 0, "reps": 0, "lapses": 0}
+
+def srs_review(card: dict, correct: bool, reviewed_at: datetime) -> dict:
+    """SM-2 update of a card from a flashcard answer (correct = quality 4, wrong = quality 1)"""
+    quality = 4 if correct else 1
+    card = dict(card)
+    card["ease"] = max(SRS_MIN_EASE, card["ease"] + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    if correct:
+        card["reps"] += 1
+        if card["reps"] == 1:
+            card["interval_days"] = 1
+        elif card["reps"] == 2:
+            card["interval_days"] = 6
+        else:
+            card["interval_days"] = round(card["interval_days"] * card["ease"])
+        card["due_at"] = reviewed_at + timedelta(days=card["interval_days"])
+    else:
+        # Relearn the card in the same session
+        card["reps"] = 0
+        card["lapses"] += 1
+        card["interval_days"] = 0
+        card["due_at"] = reviewed_at + timedelta(minutes=SRS_RELEARN_MINUTES)
+    card["last_reviewed_at"] = reviewed_at
+    return card
+
+async def update_srs_cards(docs: List[dict]):
+    """Apply recorded study sessions to the review schedule in one read and one bulk write"""
+    if not docs:
+        return
+    pairs = {(doc["user_id"], doc["word_id"]) for doc in docs}
+    cards = {}
+    user_ids = {user_id for user_id, _ in pairs}
+    word_ids = {word_id for _, word_id in pairs}
+    async for card in db.srs_cards.find({"user_id": {"$in": list(user_ids)}, "word_id": {"$in": list(word_ids)}}, {"_id": 0}):
+        cards[(card["user_id"], card["word_id"])] = card
+    
+    for doc in sorted(docs, key=lambda d: to_utc(d["timestamp"])):
+        key = (doc["user_id"], doc["word_id"])
+        card = cards.get(key) or new_srs_card(*key)
+        cards[key] = srs_review(card, doc["correct"], to_utc(doc["timestamp"]))
+    
+    await db.srs_cards.bulk_write([
+        UpdateOne({"user_id": user_id, "word_id": word_id}, {"$set": cards[(user_id, word_id)]}, upsert=True)
+        for user_id, word_id in pairs
+    ], ordered=False)
+
+def classify_srs_card(card: dict) -> str:
+    if card["lapses"] >= SRS_DIFFICULT_LAPSES or card["ease"] < 1.8:
+        return "difficult"
+    if card["interval_days"] >= SRS_MASTERED_INTERVAL_DAYS:
+        return "mastered"
+    return "studying"
+
+class NewWordOrder:
+    """Catalog word ids in the order new words are introduced: easiest first, then by id.
+
+    Kept in sync with the word catalog through its change listener, so a
+    review queue request never sorts the catalog.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.word_keys = {}
+
+    @staticmethod
+    def _key(word: dict) -> tuple:
+        return (DIFFICULTY_ORDER.get(word["difficulty"], len(DIFFICULTY_ORDER)), word["id"])
+
+    def _remove(self, word_id: str):
+        key = self.word_keys.pop(word_id, None)
+        if key:
+            del self.keys[bisect.bisect_left(self.keys, key)]
+
+    def apply(self, changed: List[dict], removed: List[str]):
+        for word_id in removed:
+            self._remove(word_id)
+        for word in changed:
+            self._remove(word["id"])
+            key = self._key(word)
+            self.word_keys[word["id"]] = key
+            bisect.insort(self.keys, key)
+
+new_word_order = NewWordOrder()
+word_catalog.listeners.append(new_word_order.apply)
+
+async def first_unseen_words(user_id: str, count: int) -> List[str]:
+    """The first ``count`` words in introduction order the user has no card for.
+
+    Walks the order in growing chunks and asks the (user_id, word_id) index
+    which words of each chunk were seen, so the cost follows how far into the
+    order the user has got rather than the catalog size.
+    """
+    keys = new_word_order.keys
+    unseen = []
+    start, chunk = 0, max(2 * count, 50)
+    while len(unseen) < count and start < len(keys):
+        word_ids = [word_id for _, word_id in keys[start:start + chunk]]
+        seen = set(await db.srs_cards.distinct("word_id", {"user_id": user_id, "word_id": {"$in": word_ids}}))
+        unseen.extend(word_id for word_id in word_ids if word_id not in seen)
+        start += chunk
+        chunk *= 2
+    return unseen[:count]
+
+# Word search
+SEARCH_FIELD_WEIGHTS = {"root": 8.0, "meaning": 4.0, "category": 3.0, "examples": 2.0, "definition": 1.0}
+SEARCH_PREFIX_FACTOR = 0.5
+SEARCH_MORPHEME_FACTOR = 0.4
+SEARCH_MIN_PREFIX = 2
+SEARCH_MAX_EXPANSIONS = 64
+SEARCH_TERM_BONUS = 1000.0
+SEARCH_STOP_WORDS = {"a", "an", "and", "as", "for", "in", "meaning", "of", "or", "prefix", "root", "something", "suffix", "the", "to", "with"}
+SEARCH_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+
+def search_terms(text: str, keep_stop_words: bool = False) -> List[str]:
+    """Lowercased terms with hyphens ignored: "anti-inflammatory" gives the joined
+    form plus each part, and "-ology" gives "ology"
+    """
+    terms = []
+    for token in SEARCH_TOKEN_PATTERN.findall(text.lower()):
+        parts = token.split("-")
+        for term in ["".join(parts)] + (parts if len(parts) > 1 else []):
+            if term not in terms and (keep_stop_words or term not in SEARCH_STOP_WORDS):
+                terms.append(term)
+    return terms
+
+class SearchIndex:
+    """In-memory inverted index over the word catalog.
+
+    Postings map a term to {word_id: weight}, where the weight sums the field
+    weights the term appears in. A sorted term list serves prefix lookups, and
+    root terms that may open or close a word serve morpheme matches inside
+    longer query words.
+    Updated from the catalog's change listener like the distractor index.
+    """
+
+    # Above this many new or dropped terms the sorted list is rebuilt rather than patched
+    BULK_TERMS = 1000
+
+    def __init__(self):
+        self.words = {}
+        self.postings = {}
+        self.word_terms = {}
+        self.sorted_terms = []
+        self.leading_roots = {}
+        self.trailing_roots = {}
+
+    @staticmethod
+    def _weighted_terms(word: dict) -> Dict[str, float]:
+        fields = {
+            "root": word["root"],
+            "meaning": word["meaning"],
+            "category": word["category"],
+            "examples": " ".join(word["examples"]),
+            "definition": word["definition"]
+        }
+        weights = {}
+        for field, text in fields.items():
+            for term in search_terms(text, keep_stop_words=field == "root"):
+                weights[term] = weights.get(term, 0) + SEARCH_FIELD_WEIGHTS[field]
+        return weights
+
+    def _remove(self, word_id: str, dropped: set):
+        self.words.pop(word_id, None)
+        for term in self.word_terms.pop(word_id, {}):
+            posting = self.postings[term]
+            del posting[word_id]
+            if not posting:
+                del self.postings[term]
+                dropped.add(term)
+            for root_terms in (self.leading_roots, self.trailing_roots):
+                roots = root_terms.get(term)
+                if roots:
+                    roots.discard(word_id)
+                    if not roots:
+                        del root_terms[term]
+
+    def apply(self, changed: List[dict], removed: List[str]):
+        added = set()
+        dropped = set()
+        for word_id in removed:
+            self._remove(word_id, dropped)
+        for word in changed:
+            self._remove(word["id"], dropped)
+            terms = self._weighted_terms(word)
+            self.words[word["id"]] = word
+            self.word_terms[word["id"]] = terms
+            for term, weight in terms.items():
+                posting = self.postings.setdefault(term, {})
+                if not posting:
+                    added.add(term)
+                posting[word["id"]] = weight
+            # Prefixes only open a word and suffixes only close one
+            for term in search_terms(word["root"], keep_stop_words=True):
+                if word["type"] != "suffix":
+                    self.leading_roots.setdefault(term, set()).add(word["id"])
+                if word["type"] != "prefix":
+                    self.trailing_roots.setdefault(term, set()).add(word["id"])
+        
+        # A term dropped and re-added by the same update is still in the list
+        added -= dropped
+        dropped = {term for term in dropped if term not in self.postings}
+        if len(added) + len(dropped) > self.BULK_TERMS:
+            self.sorted_terms = sorted(self.postings)
+            return
+        for term in dropped:
+            del self.sorted_terms[bisect.bisect_left(self.sorted_terms, term)]
+        for term in added:
+            bisect.insort(self.sorted_terms, term)
+
+    def _prefix_terms(self, prefix: str) -> List[str]:
+        start = bisect.bisect_left(self.sorted_terms, prefix)
+        terms = []
+        for term in self.sorted_terms[start:start + SEARCH_MAX_EXPANSIONS + 1]:
+            if not term.startswith(prefix):
+                break
+            if term != prefix:
+                terms.append(term)
+        return terms
+
+    def _morpheme_roots(self, term: str) -> List[set]:
+        """Word ids of roots found at the start or end of a longer query word, e.g. "bio" in "biosphere" """
+        roots = []
+        for size in range(SEARCH_MIN_PREFIX, len(term)):
+            if term[:size] in self.leading_roots:
+                roots.append(self.leading_roots[term[:size]])
+            if term[-size:] in self.trailing_roots:
+                roots.append(self.trailing_roots[term[-size:]])
+        return roots
+
+    def _term_scores(self, term: str) -> Dict[str, float]:
+        """Word scores for one query term: exact postings, then prefix expansions and morphemes at a discount"""
+        exact = self.postings.get(term, {})
+        if len(term) < SEARCH_MIN_PREFIX:
+            return exact
+        expansions = self._prefix_terms(term)
+        roots = self._morpheme_roots(term)
+        if not expansions and not roots:
+            return exact
+        
+        scores = dict(exact)
+        for expansion in expansions:
+            for word_id, weight in self.postings[expansion].items():
+                weight *= SEARCH_PREFIX_FACTOR
+                if weight > scores.get(word_id, 0):
+                    scores[word_id] = weight
+        morpheme_weight = SEARCH_FIELD_WEIGHTS["root"] * SEARCH_MORPHEME_FACTOR
+        for word_ids in roots:
+            for word_id in word_ids:
+                if morpheme_weight > scores.get(word_id, 0):
+                    scores[word_id] = morpheme_weight
+        return scores
+
+    def search(self, query: str, limit: int, filters: Optional[dict] = None) -> List[tuple]:
+        """(score, word) pairs, best first; words matching more query terms rank higher"""
+        terms = search_terms(query) or search_terms(query, keep_stop_words=True)
+        scores = {}
+        for term in terms:
+            # Each matched term adds SEARCH_TERM_BONUS, which outweighs any field score
+            for word_id, score in self._term_scores(term).items():
+                scores[word_id] = scores.get(word_id, 0) + SEARCH_TERM_BONUS + score
+        
+        if filters:
+            scores = {
+                word_id: score for word_id, score in scores.items()
+                if all(self.words[word_id][field] == value for field, value in filters.items())
+            }
+        best = heapq.nlargest(limit, scores, key=scores.__getitem__)
+        return [(round(scores[word_id] % SEARCH_TERM_BONUS, 2), self.words[word_id]) for word_id in best]
+
+search_index = SearchIndex()
+word_catalog.listeners.append(search_index.apply)
+
+# Word decomposition
+MORPHEME_RANKS = {"prefix": 0, "root": 1, "suffix": 2}
+DECOMPOSE_MAX_GAP = 3
+DECOMPOSE_NODE_BUDGET = 5000
+DECOMPOSE_CHUNK_SIZE = 200
+VOWELS = set("aeiouy")
+
+def morpheme_text(root: str) -> str:
+    return re.sub(r"[^a-z]", "", root.lower())
+
+class MorphemeAutomaton:
+    """Aho-Corasick automaton over catalog roots for splitting English words into morphemes.
+
+    The morpheme table follows the word catalog through its change listener;
+    the automaton itself is rebuilt on the next lookup after a change.
+    """
+
+    def __init__(self):
+        self.word_morphemes = {}
+        self.morphemes = {}
+        self.goto = None
+        self.fail = None
+        self.output = None
+
+    def apply(self, changed: List[dict], removed: List[str]):
+        for word_id in removed + [word["id"] for word in changed]:
+            entry = self.word_morphemes.pop(word_id, None)
+            if entry:
+                text, kind = entry
+                self.morphemes[text][kind].remove(word_id)
+                if not self.morphemes[text][kind]:
+                    del self.morphemes[text][kind]
+                if not self.morphemes[text]:
+                    del self.morphemes[text]
+        for word in changed:
+            text = morpheme_text(word["root"])
+            if len(text) < 2:
+                continue
+            self.word_morphemes[word["id"]] = (text, word["type"])
+            self.morphemes.setdefault(text, {}).setdefault(word["type"], []).append(word["id"])
+        self.goto = None
+
+    def _compile(self):
+        goto = [{}]
+        output = [[]]
+        for text in self.morphemes:
+            state = 0
+            for char in text:
+                if char not in goto[state]:
+                    goto.append({})
+                    output.append([])
+                    goto[state][char] = len(goto) - 1
+                state = goto[state][char]
+            output[state].append(text)
+        
+        # Breadth-first failure links; each state also reports the matches of its fallback
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for state in queue:
+            for char, target in goto[state].items():
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[target] = goto[fallback].get(char, 0)
+                output[target] = output[target] + output[fail[target]]
+                queue.append(target)
+        self.goto, self.fail, self.output = goto, fail, output
+
+    def matches(self, text: str) -> Dict[int, List[str]]:
+        """Morphemes found in the text, keyed by start position"""
+        if self.goto is None:
+            self._compile()
+        found = {}
+        state = 0
+        for end, char in enumerate(text, 1):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for morpheme in self.output[state]:
+                found.setdefault(end - len(morpheme), []).append(morpheme)
+        return found
+
+    def decompose(self, word: str, limit: int) -> List[dict]:
+        """Segmentations of a word, fewest unmatched letters first.
+
+        Segments follow prefix, root, suffix order; prefixes only open the word.
+        Letters no morpheme covers become gap segments, and a morpheme may share
+        a vowel with the one before it ("bio" + "ology").
+        """
+        text = morpheme_text(word)
+        starts = self.matches(text)
+        results = []
+        budget = [DECOMPOSE_NODE_BUDGET]
+
+        def walk(position: int, rank: int, segments: List[dict], gap_letters: int):
+            budget[0] -= 1
+            if budget[0] < 0:
+                return
+            if position == len(text):
+                if any(segment["type"] != "gap" for segment in segments):
+                    results.append((gap_letters, len(segments), list(segments)))
+                return
+            
+            previous = segments[-1] if segments else None
+            candidates = [(position, morpheme) for morpheme in starts.get(position, [])]
+            if previous and previous["type"] != "gap" and text[position - 1] in VOWELS:
+                candidates += [(position - 1, m) for m in starts.get(position - 1, []) if len(m) > 1]
+            for start, morpheme in candidates:
+                for kind, word_ids in self.morphemes[morpheme].items():
+                    kind_rank = MORPHEME_RANKS.get(kind, 1)
+                    if kind_rank < rank or (kind_rank == 0 and any(s["type"] == "gap" for s in segments)):
+                        continue
+                    segments.append({"text": morpheme, "type": kind, "start": start, "end": start + len(morpheme), "word_ids": word_ids})
+                    walk(start + len(morpheme), kind_rank, segments, gap_letters)
+                    segments.pop()
+            
+            if previous is None or previous["type"] != "gap":
+                # Short connecting gaps, or a jump straight to a later morpheme or the end
+                ends = set(range(position + 1, min(position + DECOMPOSE_MAX_GAP, len(text)) + 1))
+                ends.update(start for start in starts if start > position)
+                ends.add(len(text))
+                for size in sorted(end - position for end in ends):
+                    segments.append({"text": text[position:position + size], "type": "gap", "start": position, "end": position + size})
+                    walk(position + size, max(rank, 1), segments, gap_letters + size)
+                    segments.pop()
+
+        walk(0, 0, [], 0)
+        results.sort(key=lambda result: (result[0], result[1]))
+        return [{"segments": segments, "unmatched_letters": gap_letters} for gap_letters, _, segments in results[:limit]]
+
+morpheme_automaton = MorphemeAutomaton()
+word_catalog.listeners.append(morpheme_automaton.apply)
+
+# Quiz generation
+class DistractorIndex:
+    """Buckets of word ids by shared attributes, used to pick plausible wrong answers.
+
+    Kept in sync with the word catalog through its change listener, so only
+    the words that changed are re-bucketed.
+    """
+
+    def __init__(self):
+        self.words = {}
+        self.buckets = {}
+
+    @staticmethod
+    def _bucket_keys(word: dict) -> List[tuple]:
+        return [
+            ("type_origin", word["type"], word["origin"]),
+            ("category", word["category"]),
+            ("type", word["type"]),
+            ("all",),
+        ]
+
+    def _remove(self, word_id: str):
+        word = self.words.pop(word_id, None)
+        if word:
+            for key in self._bucket_keys(word):
+                bucket = self.buckets[key]
+                del bucket[bisect.bisect_left(bucket, word_id)]
+
+    def apply(self, changed: List[dict], removed: List[str]):
+        for word_id in removed:
+            self._remove(word_id)
+        for word in changed:
+            self._remove(word["id"])
+            self.words[word["id"]] = word
+            for key in self._bucket_keys(word):
+                bisect.insort(self.buckets.setdefault(key, []), word["id"])
+
+    def distractors(self, word: dict, count: int, rng: random.Random) -> List[str]:
+        """Wrong meanings from the closest tier first: same type and origin at a similar
+        difficulty, then same category, same type and finally any word"""
+        level = DIFFICULTY_ORDER.get(word["difficulty"], 1)
+        similar = [
+            word_id for word_id in self.buckets.get(("type_origin", word["type"], word["origin"]), [])
+            if abs(DIFFICULTY_ORDER.get(self.words[word_id]["difficulty"], 1) - level) <= 1
+        ]
+        tiers = [similar] + [self.buckets.get(key, []) for key in self._bucket_keys(word)[1:]]
+        
+        meanings = []
+        for tier in tiers:
+            candidates = [self.words[word_id]["meaning"] for word_id in tier]
+            candidates = sorted({m for m in candidates if m != word["meaning"] and m not in meanings})
+            rng.shuffle(candidates)
+            meanings.extend(candidates[:count - len(meanings)])
+            if len(meanings) == count:
+                break
+        return meanings
+
+distractor_index = DistractorIndex()
+word_catalog.listeners.append(distractor_index.apply)
+
+def generate_quiz(word_ids: List[str], count: int, choices: int, seed: int) -> List[dict]:
+    """Build multiple-choice questions; the same seed and words give the same quiz"""
+    rng = random.Random(seed)
+    pool = sorted(word_ids)
+    questions = []
+    for index, word_id in enumerate(rng.sample(pool, min(count, len(pool)))):
+        word = distractor_index.words[word_id]
+        options = [word["meaning"]] + distractor_index.distractors(word, choices - 1, rng)
+        rng.shuffle(options)
+        questions.append({
+            "question_id": index,
+            "word_id": word_id,
+            "root": word["root"],
+            "type": word["type"],
+            "origin": word["origin"],
+            "prompt": f"What does \"{word['root']}\" mean?",
+            "choices": options,
+            "answer_index": options.index(word["meaning"])
+        })
+    return questions
+
+async def quiz_word_pool(request: QuizGenerateRequest) -> List[str]:
+    """Word ids a quiz may draw from, narrowed by study set, explicit ids and difficulty"""
+    await word_catalog.ensure_loaded()
+    word_ids = set(distractor_index.words)
+    if request.study_set_id:
+        study_set = await db.study_sets.find_one({"id": request.study_set_id}, {"_id": 0, "word_ids": 1})
+        if not study_set:
+            raise HTTPException(status_code=404, detail="Study set not found")
+        word_ids &= set(study_set["word_ids"])
+    if request.word_ids is not None:
+        word_ids &= set(request.word_ids)
+    if request.difficulty:
+        word_ids = {word_id for word_id in word_ids if distractor_index.words[word_id]["difficulty"] == request.difficulty}
+    if not word_ids:
+        raise HTTPException(status_code=400, detail="No words match the quiz request")
+    return list(word_ids)
+
+# Quiz sessions
+QUIZ_SESSION_GRACE_SECONDS = float(os.environ.get('QUIZ_SESSION_GRACE_SECONDS', '300'))
+QUIZ_SESSION_CACHE_SIZE = int(os.environ.get('QUIZ_SESSION_CACHE_SIZE', '10000'))
+QUIZ_POINTS_PER_CORRECT = 5
+
+class QuizSessionStore:
+    """Quiz sessions kept in the quiz_sessions collection so any worker can score them.
+
+    A session holds the generated questions with their answers, so only the
+    server decides what counts as correct. A TTL index drops sessions a grace
+    period after their deadline. Questions and deadlines never change, so each
+    worker caches recent sessions; answers and the score are always written
+    to Mongo with a conditional update, and finalizing reads them back.
+    """
+
+    def __init__(self, collection, cache_size: int, grace: float):
+        self.collection = collection
+        self.cache_size = cache_size
+        self.grace = grace
+        self.cache = OrderedDict()
+
+    def _remember(self, session: dict):
+        self.cache[session["id"]] = session
+        self.cache.move_to_end(session["id"])
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    async def create(self, user_id: str, seed: int, questions: List[dict], time_limit: int) -> dict:
+        created_at = datetime.utcnow()
+        deadline = created_at + timedelta(seconds=time_limit)
+        session = {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "seed": seed,
+            "questions": questions,
+            "answers": {},
+            "score": 0,
+            "created_at": created_at,
+            "deadline": deadline,
+            "expires_at": deadline + timedelta(seconds=self.grace)
+        }
+        await self.collection.insert_one(dict(session))
+        self._remember(session)
+        return session
+
+    async def get(self, session_id: str, user_id: str, fresh: bool = False) -> dict:
+        """The session, from the cache unless ``fresh`` asks for its current answers"""
+        session = None if fresh else self.cache.get(session_id)
+        if session is None:
+            session = await self.collection.find_one({"id": session_id}, {"_id": 0})
+        # The TTL monitor only runs about once a minute
+        if not session or session["user_id"] != user_id or session["expires_at"] <= datetime.utcnow():
+            self.cache.pop(session_id, None)
+            raise HTTPException(status_code=404, detail="Quiz session not found")
+        self._remember(session)
+        return session
+
+    async def record_answer(self, session_id: str, question_id: int, outcome: dict) -> Optional[dict]:
+        """Store an answer unless the question already has one; returns the updated session or None"""
+        field = f"answers.{question_id}"
+        session = await self.collection.find_one_and_update(
+            {"id": session_id, field: {"$exists": False}},
+            {"$set": {field: outcome}, "$inc": {"score": int(outcome["correct"])}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+        if session:
+            self._remember(session)
+        return session
+
+    async def delete(self, session_id: str):
+        self.cache.pop(session_id, None)
+        await self.collection.delete_one({"id": session_id})
+
+quiz_sessions = QuizSessionStore(db.quiz_sessions, QUIZ_SESSION_CACHE_SIZE, QUIZ_SESSION_GRACE_SECONDS)
+
+def public_quiz_question(question: dict) -> dict:
+    return {field: value for field, value in question.items() if field != "answer_index"}
+
+async def score_quiz_answer(session: dict, answer: QuizAnswer) -> dict:
+    """Record one answer against the session and return the outcome"""
+    if datetime.utcnow() > session["deadline"]:
+        raise HTTPException(status_code=400, detail="Quiz time limit has passed")
+    if not 0 <= answer.question_id < len(session["questions"]):
+        raise HTTPException(status_code=400, detail="Unknown question")
+    # Answer keys are strings, as Mongo stores them
+    if str(answer.question_id) in session["answers"]:
+        raise HTTPException(status_code=400, detail="Question already answered")
+    question = session["questions"][answer.question_id]
+    if not 0 <= answer.choice_index < len(question["choices"]):
+        raise HTTPException(status_code=400, detail="Invalid choice")
+    
+    correct = answer.choice_index == question["answer_index"]
+    outcome = {"choice": answer.choice_index, "correct": correct, "answered_at": datetime.utcnow()}
+    updated = await quiz_sessions.record_answer(session["id"], answer.question_id, outcome)
+    if updated is None:
+        # Answered through another worker, or finalized in the meantime
+        await quiz_sessions.get(session["id"], session["user_id"], fresh=True)
+        raise HTTPException(status_code=400, detail="Question already answered")
+    return {
+        "question_id": answer.question_id,
+        "correct": correct,
+        "correct_index": question["answer_index"],
+        "score": updated["score"],
+        "answered": len(updated["answers"])
+    }
+
+def quiz_session_result(session: dict) -> dict:
+    """Compact quiz_results document with one outcome per question; unanswered questions count as wrong"""
+    outcomes = []
+    for question in session["questions"]:
+        answer = session["answers"].get(str(question["question_id"]))
+        outcomes.append({
+            "word_id": question["word_id"],
+            "root": question["root"],
+            "choice": answer["choice"] if answer else None,
+            "correct": bool(answer and answer["correct"])
+        })
+    return {
+        "user_id": session["user_id"],
+        "client_event_id": session["id"],
+        "quiz_session_id": session["id"],
+        "score": session["score"],
+        "total_questions": len(session["questions"]),
+        "questions": outcomes,
+        "started_at": session["created_at"],
+        "timestamp": datetime.utcnow(),
+        "points_earned": session["score"] * QUIZ_POINTS_PER_CORRECT
+    }
+
+# Bulk word import and export
+WORD_IMPORT_BATCH_SIZE = int(os.environ.get('WORD_IMPORT_BATCH_SIZE', '500'))
+WORD_IMPORT_MAX_ERRORS = 1000
+WORD_EXPORT_PAGE_SIZE = 500
+WORD_CSV_FIELDS = [field for field in WordCard.model_fields if field != "image_variants"]
+EXAMPLE_SEPARATOR = ";"
+
+async def iter_text_lines(stream):
+    """Decode a byte stream into lines without holding the whole body"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    async for chunk in stream:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+async def iter_ndjson_records(lines):
+    """(line number, record, error) for each non-blank NDJSON line"""
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, "Expected a JSON object"
+            continue
+        yield line_number, record, None
+
+async def iter_csv_records(lines):
+    """(line number, record, error) for each CSV row after the header.
+
+    Examples are one cell separated by semicolons. A quoted cell may span
+    lines, so lines are collected until the quotes balance.
+    """
+    header = None
+    pending = []
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        pending.append(line)
+        text = "\n".join(pending)
+        if text.count('"') % 2:
+            continue
+        first_line = line_number - len(pending) + 1
+        pending = []
+        cells = next(csv.reader([text]), [])
+        if header is None:
+            header = [cell.strip() for cell in cells]
+            continue
+        if not any(cell.strip() for cell in cells):
+            continue
+        if len(cells) > len(header):
+            yield first_line, None, f"Expected {len(header)} columns, got {len(cells)}"
+            continue
+        record = {field: cell for field, cell in zip(header, cells) if cell != ""}
+        if "examples" in record:
+            record["examples"] = [example.strip() for example in record["examples"].split(EXAMPLE_SEPARATOR) if example.strip()]
+        yield first_line, record, None
+    if pending:
+        yield line_number - len(pending) + 1, None, "Unterminated quoted field"
+
+def add_import_error(report: dict, line: int, error: str):
+    report["failed"] += 1
+    if len(report["errors"]) < WORD_IMPORT_MAX_ERRORS:
+        report["errors"].append({"line": line, "error": error})
+
+def validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}" for detail in error.errors())
+
+async def write_word_import_batch(batch: List[tuple], report: dict, dry_run: bool):
+    """Upsert one batch of validated rows by id.
+
+    Rows without an id update the word with the same root and type, or are
+    created with a new id, so re-importing a curriculum does not duplicate it.
+    """
+    keyless = [word for _, word in batch if not word.get("id")]
+    existing = {}
+    if keyless:
+        query = {"$or": [{"root": word["root"], "type": word["type"]} for word in keyless]}
+        async for word in db.words.find(query, {"_id": 0, "id": 1, "root": 1, "type": 1}):
+            existing.setdefault((word["root"], word["type"]), word["id"])
+    
+    requests = []
+    rows = []
+    for line, word in batch:
+        if not word.get("id"):
+            word["id"] = existing.setdefault((word["root"], word["type"]), str(uuid.uuid4()))
+        if dry_run:
+            report["valid"] += 1
+            continue
+        try:
+            word = await store_inline_image(word)
+        except HTTPException as e:
+            add_import_error(report, line, e.detail)
+            continue
+        requests.append(UpdateOne({"id": word["id"]}, {"$set": word}, upsert=True))
+        rows.append((line, word))
+    if not requests:
+        return
+    
+    failed = set()
+    try:
+        result = await db.words.bulk_write(requests, ordered=False)
+        report["inserted"] += result.upserted_count
+        report["updated"] += result.matched_count
+    except BulkWriteError as e:
+        report["inserted"] += e.details["nUpserted"]
+        report["updated"] += e.details["nMatched"]
+        for error in e.details["writeErrors"]:
+            failed.add(error["index"])
+            add_import_error(report, rows[error["index"]][0], error["errmsg"])
+    for index, (line, word) in enumerate(rows):
+        if index not in failed:
+            report["valid"] += 1
+            schedule_image_variants(word["id"], word)
+
+async def import_word_records(records, import_format: str, dry_run: bool) -> dict:
+    """Validate parsed rows and upsert them in batches; returns the import report"""
+    report = {"format": import_format, "dry_run": dry_run, "received": 0, "valid": 0, "inserted": 0, "updated": 0, "failed": 0, "errors": []}
+    batch = []
+    # Set before the first write, so a cancelled or failed import still invalidates what it changed
+    written = False
+    try:
+        async for line, record, error in records:
+            report["received"] += 1
+            if error is None:
+                try:
+                    batch.append((line, WordImport(**record).model_dump(exclude={"image_variants"}, exclude_none=True)))
+                except ValidationError as e:
+                    error = validation_message(e)
+            if error:
+                add_import_error(report, line, error)
+            if len(batch) >= WORD_IMPORT_BATCH_SIZE:
+                written = written or not dry_run
+                await write_word_import_batch(batch, report, dry_run)
+                batch = []
+        if batch:
+            written = written or not dry_run
+            await write_word_import_batch(batch, report, dry_run)
+    finally:
+        if written:
+            await word_catalog.invalidate()
+    logger.info(f"📥 Word import: {report['valid']} valid, {report['inserted']} inserted, {report['updated']} updated, {report['failed']} failed")
+    return report
+
+def word_export_fields(word: dict) -> dict:
+    return {field: word[field] for field in WORD_CSV_FIELDS if word.get(field) is not None}
+
+async def iter_word_pages():
+    """The words collection in id order, one page per query"""
+    last_id = None
+    while True:
+        query = {"id": {"$gt": last_id}} if last_id else {}
+        page = await db.words.find(query, {"_id": 0}).sort("id", 1).to_list(WORD_EXPORT_PAGE_SIZE)
+        if page:
+            yield page
+        if len(page) < WORD_EXPORT_PAGE_SIZE:
+            return
+        last_id = page[-1]["id"]
+
+async def iter_word_export(export_format: str):
+    if export_format == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(WORD_CSV_FIELDS)
+        yield buffer.getvalue().encode()
+    async for page in iter_word_pages():
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for word in page:
+                row = word_export_fields(word)
+                row["examples"] = f"{EXAMPLE_SEPARATOR} ".join(row.get("examples", []))
+                writer.writerow([row.get(field, "") for field in WORD_CSV_FIELDS])
+            yield buffer.getvalue().encode()
+        else:
+            yield "".join(json.dumps(word_export_fields(word)) + "\n" for word in page).encode()
+
+# Word snapshots
+WORD_BACKUP_PREFIX = "words_backup_"
+PRE_RESTORE_BACKUP_PREFIX = "words_backup_before_restore_"
+SNAPSHOT_BATCH_SIZE = 500
+BACKUP_KEEP_LAST = int(os.environ.get('BACKUP_KEEP_LAST', '10'))
+BACKUP_KEEP_DAILY_DAYS = int(os.environ.get('BACKUP_KEEP_DAILY_DAYS', '30'))
+# Weekly backups older than the daily window; 0 keeps them indefinitely
+BACKUP_KEEP_WEEKLY_WEEKS = int(os.environ.get('BACKUP_KEEP_WEEKLY_WEEKS', '0'))
+BACKUP_PRUNE_INTERVAL_SECONDS = float(os.environ.get('BACKUP_PRUNE_INTERVAL_SECONDS', '3600'))
+# Blobs and half-written snapshots younger than this are never collected
+SNAPSHOT_GRACE = timedelta(hours=1)
+
+# Serializes this process's snapshot writes with its pruning; other workers are kept
+# off reused blobs by their last_used time and the pruning lease
+snapshot_lock = asyncio.Lock()
+BACKUP_PRUNE_LEASE = "backup-pruning"
+
+def word_content_hash(word: dict) -> str:
+    return hashlib.sha256(json.dumps(word, sort_keys=True, default=str, separators=(",", ":")).encode()).hexdigest()
+
+def backup_readable_time(timestamp: str) -> str:
+    try:
+        return datetime.strptime(timestamp, "%Y%m%d_%H%M%S").strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return timestamp
+
+async def latest_word_snapshot() -> Optional[dict]:
+    return await db.word_snapshots.find_one({"status": "complete"}, sort=[("created_at", -1)])
+
+async def claim_snapshot_id(prefix: str, kind: str) -> dict:
+    """Insert the snapshot's metadata first so concurrent workers cannot share a name"""
+    created_at = datetime.utcnow()
+    timestamp = created_at.strftime("%Y%m%d_%H%M%S")
+    for attempt in range(100):
+        snapshot = {
+            "_id": f"{prefix}{timestamp}" + (f"_{attempt}" if attempt else ""),
+            "timestamp": timestamp,
+            "created_at": created_at,
+            "kind": kind,
+            "status": "writing"
+        }
+        try:
+            await db.word_snapshots.insert_one(snapshot)
+            return snapshot
+        except DuplicateKeyError:
+            continue
+    raise HTTPException(status_code=409, detail="Could not allocate a backup name")
+
+async def store_word_blobs(blobs: dict) -> int:
+    """Insert the word blobs not already stored; returns how many were new.
+
+    Stored blobs are touched before they are looked up, so a collection
+    running on another worker either deletes one first (and it is inserted
+    again here) or sees it inside the grace period and keeps it.
+    """
+    if not blobs:
+        return 0
+    now = datetime.utcnow()
+    await db.word_blobs.update_many({"_id": {"$in": list(blobs)}}, {"$set": {"last_used": now}})
+    known = {blob["_id"] async for blob in db.word_blobs.find({"_id": {"$in": list(blobs)}}, {"_id": 1})}
+    missing = [{"_id": digest, "word": word, "created_at": now, "last_used": now} for digest, word in blobs.items() if digest not in known]
+    if missing:
+        try:
+            await db.word_blobs.insert_many(missing, ordered=False)
+        except BulkWriteError as e:
+            # Another snapshot stored the same content concurrently
+            if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                raise
+    return len(missing)
+
+async def collect_manifest(collection, progress=None, store: bool = True) -> tuple:
+    """Hash every word in a collection, storing its blob unless ``store`` is
+    False; returns the sorted (word id, hash) manifest, the catalog hash and
+    the number of new blobs
+    """
+    manifest = {}
+    blobs = {}
+    new_blobs = 0
+    async for word in collection.find({}, {"_id": 0}):
+        digest = word_content_hash(word)
+        manifest.setdefault(word.get("id") or digest, digest)
+        if not store:
+            continue
+        blobs[digest] = word
+        if len(blobs) >= SNAPSHOT_BATCH_SIZE:
+            new_blobs += await store_word_blobs(blobs)
+            blobs = {}
+            if progress:
+                await progress(len(manifest))
+    new_blobs += await store_word_blobs(blobs)
+    
+    manifest = sorted(manifest.items())
+    catalog_hash = hashlib.sha256("\n".join(f"{word_id}:{digest}" for word_id, digest in manifest).encode()).hexdigest()
+    return manifest, catalog_hash, new_blobs
+
+async def write_snapshot_entries(snapshot_id: str, manifest: List[tuple]):
+    for start in range(0, len(manifest), SNAPSHOT_BATCH_SIZE):
+        await db.word_snapshot_entries.insert_many([
+            {"snapshot_id": snapshot_id, "word_id": word_id, "hash": digest}
+            for word_id, digest in manifest[start:start + SNAPSHOT_BATCH_SIZE]
+        ])
+
+async def create_word_snapshot(prefix: str = WORD_BACKUP_PREFIX, kind: str = "manual", progress=None) -> Optional[dict]:
+    """Snapshot the words collection as a manifest of content hashes.
+
+    Word documents are stored once per distinct content in ``word_blobs``, and
+    ``word_snapshot_entries`` maps each word id to its blob for the snapshot.
+    The catalog is hashed before anything is stored: when its hash matches
+    the latest snapshot nothing is written and that snapshot is returned with
+    ``created`` False. Returns None for an empty catalog.
+    """
+    async with snapshot_lock:
+        manifest, catalog_hash, _ = await collect_manifest(db.words, store=False)
+        if not manifest:
+            return None
+        
+        latest = await latest_word_snapshot()
+        if latest and latest.get("catalog_hash") == catalog_hash:
+            return {**latest, "created": False}
+        
+        # The words are read again to store their blobs, and the snapshot
+        # records what that pass read in case the catalog changed meanwhile
+        manifest, catalog_hash, new_blobs = await collect_manifest(db.words, progress)
+        if not manifest:
+            return None
+        
+        snapshot = await claim_snapshot_id(prefix, kind)
+        await write_snapshot_entries(snapshot["_id"], manifest)
+        completed = {"status": "complete", "word_count": len(manifest), "catalog_hash": catalog_hash, "new_blobs": new_blobs}
+        await db.word_snapshots.update_one({"_id": snapshot["_id"]}, {"$set": completed})
+    logger.info(f"🔐 BACKUP CREATED: {len(manifest)} words in {snapshot['_id']} ({new_blobs} new documents stored)")
+    return {**snapshot, **completed, "created": True}
+
+async def find_word_backup(name: str) -> Optional[dict]:
+    """Snapshot metadata, or a stand-in for a full-copy backup collection from before snapshots"""
+    snapshot = await db.word_snapshots.find_one({"_id": name, "status": "complete"})
+    if snapshot:
+        return {**snapshot, "legacy": snapshot["kind"] == "legacy"}
+    if name.startswith(WORD_BACKUP_PREFIX) and name in await db.list_collection_names():
+        return {"_id": name, "legacy": True}
+    return None
+
+async def iter_backup_words(backup: dict):
+    """The words of a backup in batches, rebuilt from blobs for snapshots"""
+    if backup.get("legacy"):
+        batch = []
+        async for word in db[backup["_id"]].find({}, {"_id": 0}):
+            batch.append(word)
+            if len(batch) == SNAPSHOT_BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+        return
+    
+    entries = db.word_snapshot_entries.find({"snapshot_id": backup["_id"]}, {"_id": 0, "hash": 1}).sort("word_id", 1)
+    hashes = []
+    async for entry in entries:
+        hashes.append(entry["hash"])
+        if len(hashes) == SNAPSHOT_BATCH_SIZE:
+            yield await load_word_blobs(hashes)
+            hashes = []
+    if hashes:
+        yield await load_word_blobs(hashes)
+
+async def load_word_blobs(hashes: List[str]) -> List[dict]:
+    blobs = {blob["_id"]: blob["word"] async for blob in db.word_blobs.find({"_id": {"$in": hashes}})}
+    missing = [digest for digest in hashes if digest not in blobs]
+    if missing:
+        raise HTTPException(status_code=500, detail=f"Backup is missing {len(missing)} stored words")
+    return [blobs[digest] for digest in hashes]
+
+# Backup retention
+def backup_timestamp_from_name(name: str) -> str:
+    return name.replace(PRE_RESTORE_BACKUP_PREFIX, "").replace(WORD_BACKUP_PREFIX, "")
+
+async def find_legacy_backups() -> List[dict]:
+    """Metadata for full-copy backup collections that have no snapshot record yet"""
+    known = {snapshot["_id"] async for snapshot in db.word_snapshots.find({"kind": "legacy"}, {"_id": 1})}
+    legacy = []
+    for name in await db.list_collection_names():
+        if not name.startswith(WORD_BACKUP_PREFIX) or name in known:
+            continue
+        timestamp = backup_timestamp_from_name(name)
+        try:
+            created_at = datetime.strptime(timestamp, "%Y%m%d_%H%M%S")
+        except ValueError:
+            created_at = datetime.utcnow()
+        legacy.append({
+            "_id": name,
+            "timestamp": timestamp,
+            "created_at": created_at,
+            "kind": "legacy",
+            "status": "complete",
+            "word_count": await db[name].count_documents({})
+        })
+    return legacy
+
+async def register_legacy_backups() -> int:
+    """Record metadata for full-copy backup collections so listing never has to count them"""
+    registered = 0
+    for snapshot in await find_legacy_backups():
+        try:
+            await db.word_snapshots.insert_one(snapshot)
+            registered += 1
+        except DuplicateKeyError:
+            continue
+    return registered
+
+def select_backups_to_keep(snapshots: List[dict], now: datetime) -> set:
+    """Ids kept by the retention policy: the newest BACKUP_KEEP_LAST, the newest of each
+    day for BACKUP_KEEP_DAILY_DAYS, and the newest of each ISO week before that
+    """
+    keep = set()
+    days = set()
+    weeks = set()
+    daily_cutoff = now - timedelta(days=BACKUP_KEEP_DAILY_DAYS)
+    weekly_cutoff = now - timedelta(days=BACKUP_KEEP_DAILY_DAYS + 7 * BACKUP_KEEP_WEEKLY_WEEKS)
+    for index, snapshot in enumerate(sorted(snapshots, key=lambda snapshot: snapshot["created_at"], reverse=True)):
+        created_at = snapshot["created_at"]
+        if index < BACKUP_KEEP_LAST:
+            keep.add(snapshot["_id"])
+            days.add(created_at.date())
+        elif created_at >= daily_cutoff:
+            if created_at.date() not in days:
+                keep.add(snapshot["_id"])
+                days.add(created_at.date())
+        elif not BACKUP_KEEP_WEEKLY_WEEKS or created_at >= weekly_cutoff:
+            week = created_at.isocalendar()[:2]
+            if week not in weeks:
+                keep.add(snapshot["_id"])
+                weeks.add(week)
+    return keep
+
+async def delete_backup(snapshot: dict):
+    if snapshot["kind"] == "legacy":
+        await db[snapshot["_id"]].drop()
+    await db.word_snapshot_entries.delete_many({"snapshot_id": snapshot["_id"]})
+    await db.word_snapshots.delete_one({"_id": snapshot["_id"]})
+
+async def compact_legacy_backup(snapshot: dict):
+    """Convert a full-copy backup collection into a deduplicated snapshot under the same name"""
+    manifest, catalog_hash, new_blobs = await collect_manifest(db[snapshot["_id"]])
+    await db.word_snapshot_entries.delete_many({"snapshot_id": snapshot["_id"]})
+    await write_snapshot_entries(snapshot["_id"], manifest)
+    await db.word_snapshots.update_one(
+        {"_id": snapshot["_id"]},
+        {"$set": {"kind": "compacted", "word_count": len(manifest), "catalog_hash": catalog_hash, "new_blobs": new_blobs}}
+    )
+    await db[snapshot["_id"]].drop()
+
+async def collect_word_blobs() -> int:
+    """Delete blobs no snapshot refers to any more and no snapshot has used within the grace period"""
+    referenced = set()
+    async for group in db.word_snapshot_entries.aggregate([{"$group": {"_id": "$hash"}}]):
+        referenced.add(group["_id"])
+    
+    cutoff = datetime.utcnow() - SNAPSHOT_GRACE
+    # Blobs stored before last_used was tracked only have created_at
+    idle = {"$or": [{"last_used": {"$lt": cutoff}}, {"last_used": {"$exists": False}, "created_at": {"$lt": cutoff}}]}
+    
+    async def delete(ids):
+        # Re-checked on delete, so a blob a snapshot touched since the scan survives
+        return (await db.word_blobs.delete_many({"_id": {"$in": ids}, **idle})).deleted_count
+    
+    unreferenced = []
+    deleted = 0
+    async for blob in db.word_blobs.find(idle, {"_id": 1}):
+        if blob["_id"] not in referenced:
+            unreferenced.append(blob["_id"])
+        if len(unreferenced) == SNAPSHOT_BATCH_SIZE:
+            deleted += await delete(unreferenced)
+            unreferenced = []
+    if unreferenced:
+        deleted += await delete(unreferenced)
+    return deleted
+
+async def plan_backup_pruning(dry_run: bool) -> tuple:
+    """The complete snapshots, the ids the retention policy keeps and the report so far.
+
+    Legacy backup collections are registered first, or for a dry run only
+    listed, so the plan never writes when nothing may change.
+    """
+    if dry_run:
+        legacy = await find_legacy_backups()
+        registered = len(legacy)
+    else:
+        legacy = []
+        registered = await register_legacy_backups()
+    snapshots = [snapshot async for snapshot in db.word_snapshots.find({"status": "complete"}, {"_id": 1, "kind": 1, "created_at": 1})]
+    snapshots += [{field: snapshot[field] for field in ("_id", "kind", "created_at")} for snapshot in legacy]
+    keep = select_backups_to_keep(snapshots, datetime.utcnow())
+    pruned = [snapshot["_id"] for snapshot in snapshots if snapshot["_id"] not in keep]
+    return snapshots, keep, {"registered": registered, "kept": len(keep), "pruned": pruned, "dry_run": dry_run}
+
+async def prune_backups(dry_run: bool = False) -> dict:
+    """Apply the retention policy, compact surviving legacy backups and collect unused blobs.
+
+    Only one worker prunes at a time; another worker's attempt gets a 409.
+    """
+    if dry_run:
+        return (await plan_backup_pruning(True))[2]
+    
+    async with Lease(BACKUP_PRUNE_LEASE), snapshot_lock:
+        snapshots, keep, report = await plan_backup_pruning(False)
+        # A running restore may be reading any backup
+        if await db.jobs.find_one({"type": "restore", "status": "running"}, {"_id": 1}):
+            return {**report, "pruned": [], "skipped": "restore in progress"}
+        
+        pruned = [snapshot for snapshot in snapshots if snapshot["_id"] not in keep]
+        # Half-written snapshots left by a crash
+        pruned += [snapshot async for snapshot in db.word_snapshots.find(
+            {"status": "writing", "created_at": {"$lt": datetime.utcnow() - SNAPSHOT_GRACE}}
+        )]
+        for snapshot in pruned:
+            await delete_backup(snapshot)
+        compacted = 0
+        for snapshot in snapshots:
+            if snapshot["_id"] in keep and snapshot["kind"] == "legacy":
+                await compact_legacy_backup(snapshot)
+                compacted += 1
+        report.update({"compacted": compacted, "blobs_deleted": await collect_word_blobs()})
+    logger.info(f"🧹 Backups pruned: {len(report['pruned'])} removed, {report['kept']} kept, {compacted} compacted, {report['blobs_deleted']} unused documents deleted")
+    return report
+
+async def prune_backups_periodically():
+    while True:
+        try:
+            await prune_backups()
+        except HTTPException as e:
+            # Another worker is pruning
+            logger.info(f"Backup pruning skipped: {e.detail}")
+        except Exception as e:
+            logger.warning(f"Backup pruning failed: {e}")
+        await asyncio.sleep(BACKUP_PRUNE_INTERVAL_SECONDS)
+
+# Catalog restore
+async def run_restore(job: "JobContext") -> dict:
+    """Stream a backup into a staging collection, then swap it in for words in one rename.
+
+    Students keep reading the old catalog until the rename, and at most one
+    batch of words is held in memory at a time.
+    """
+    staging = db[f"words_staging_{job.id}"]
+    try:
+        # Create a backup of current state before restoring
+        current_backup = await create_word_snapshot(PRE_RESTORE_BACKUP_PREFIX, kind="pre_restore")
+        if current_backup:
+            logger.info(f"🔐 PRE-RESTORE BACKUP: {current_backup['word_count']} words backed up to {current_backup['_id']}")
+        
+        # Pruning may have compacted or removed the backup while this job was queued
+        backup = await find_word_backup(job.params["backup"])
+        if not backup:
+            raise HTTPException(status_code=404, detail="Backup not found")
+        total = backup.get("word_count") or await db[backup["_id"]].estimated_document_count()
+        
+        await staging.drop()
+        restored = 0
+        async for batch in iter_backup_words(backup):
+            await staging.insert_many(batch)
+            restored += len(batch)
+            await job.progress(restored, total, "Copying words")
+        if not restored:
+            raise HTTPException(status_code=400, detail="Backup is empty")
+        
+        for spec in INDEX_REGISTRY:
+            if spec["collection"] == "words":
+                await create_registered_index(staging, spec)
+        # Last chance to cancel; the rename cannot be undone
+        await job.progress(restored, total, "Publishing", force=True)
+        await staging.rename("words", dropTarget=True)
+    except BaseException:
+        await staging.drop()
+        raise
+    await word_catalog.invalidate()
+    
+    logger.info(f"✅ RESTORED: {restored} words restored from {backup['_id']}")
+    return {
+        "restored_from": backup["_id"],
+        "word_count": restored,
+        "pre_restore_backup": current_backup["_id"] if current_backup else None
+    }
+
+# Background jobs
+JOB_CONCURRENCY = {"backup": 1, "restore": 1, "word-import": 2, "prune-backups": 1}
+# Job types an admin may start directly; restores and imports have their own endpoints.
+# Statistics are rebuilt with the rebuild-user-stats management command.
+JOB_SUBMITTABLE = {"backup", "prune-backups"}
+JOB_ACTIVE_STATUSES = ["queued", "running"]
+JOB_PROGRESS_INTERVAL_SECONDS = 0.5
+JOB_HEARTBEAT_SECONDS = 15
+JOB_STALE_AFTER = timedelta(minutes=2)
+JOB_EVENT_POLL_SECONDS = 0.5
+
+class JobCancelled(Exception):
+    pass
+
+class JobContext:
+    """Passed to a job handler to report progress and notice cancellation"""
+
+    def __init__(self, runner: "JobRunner", job: dict):
+        self.runner = runner
+        self.id = job["_id"]
+        self.type = job["type"]
+        self.params = job["params"]
+        self.started = time.monotonic()
+        self.last_report = 0.0
+        self.cancel_requested = False
+
+    async def progress(self, done: int, total: Optional[int] = None, message: Optional[str] = None, force: bool = False):
+        """Record progress and an ETA, at most every JOB_PROGRESS_INTERVAL_SECONDS
+        unless forced. Raises JobCancelled once cancellation has been requested.
+        """
+        if self.cancel_requested:
+            raise JobCancelled()
+        now = time.monotonic()
+        if not force and now - self.last_report < JOB_PROGRESS_INTERVAL_SECONDS:
+            return
+        self.last_report = now
+        
+        fields = {"progress.done": done}
+        if total is not None:
+            fields["progress.total"] = total
+            if done:
+                fields["eta_seconds"] = round((now - self.started) / done * max(total - done, 0), 1)
+        if message:
+            fields["progress.message"] = message
+        job = await self.runner.update(self.id, fields)
+        # Cancelling through another worker only shows up in the job document
+        if job and job.get("cancel_requested"):
+            self.cancel_requested = True
+            raise JobCancelled()
+
+class JobRunner:
+    """Runs admin jobs as asyncio tasks in this process, tracked in ``db.jobs``.
+
+    Each job type has its own concurrency limit within the process. Status,
+    progress, results and errors live in the job document, so any worker can
+    report on a job; running jobs refresh ``updated_at`` as a heartbeat so
+    jobs of a crashed worker can be told apart.
+    """
+
+    def __init__(self, concurrency: Dict[str, int]):
+        self.semaphores = {job_type: asyncio.Semaphore(limit) for job_type, limit in concurrency.items()}
+        self.tasks = {}
+        self.contexts = {}
+
+    async def update(self, job_id: str, fields: dict) -> Optional[dict]:
+        return await db.jobs.find_one_and_update(
+            {"_id": job_id},
+            {"$set": {**fields, "updated_at": datetime.utcnow()}},
+            projection={"cancel_requested": 1},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def submit(self, job_type: str, params: dict, user_id: Optional[str] = None) -> str:
+        if job_type not in JOB_HANDLERS:
+            raise HTTPException(status_code=400, detail=f"Unknown job type {job_type}")
+        now = datetime.utcnow()
+        job = {
+            "_id": str(uuid.uuid4()),
+            "type": job_type,
+            "params": params,
+            "status": "queued",
+            "progress": {"done": 0, "total": None, "message": None},
+            "eta_seconds": None,
+            "cancel_requested": False,
+            "requested_by": user_id,
+            "created_at": now,
+            "updated_at": now
+        }
+        await db.jobs.insert_one(job)
+        task = asyncio.create_task(self._run(job))
+        self.tasks[job["_id"]] = task
+        task.add_done_callback(lambda _: self.tasks.pop(job["_id"], None))
+        return job["_id"]
+
+    async def _heartbeat(self, job_id: str):
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            await db.jobs.update_one({"_id": job_id}, {"$set": {"updated_at": datetime.utcnow()}})
+
+    async def _run(self, job: dict):
+        heartbeat = asyncio.create_task(self._heartbeat(job["_id"]))
+        context = None
+        try:
+            async with self.semaphores.setdefault(job["type"], asyncio.Semaphore(1)):
+                context = JobContext(self, job)
+                self.contexts[job["_id"]] = context
+                started = await self.update(job["_id"], {"status": "running", "started_at": datetime.utcnow()})
+                if started.get("cancel_requested"):
+                    raise JobCancelled()
+                result = await JOB_HANDLERS[job["type"]](context)
+            final = {"status": "completed", "result": result or {}, "eta_seconds": 0}
+        except JobCancelled:
+            final = {"status": "cancelled"}
+        except asyncio.CancelledError:
+            # Cancelled while waiting for a slot, or interrupted by shutdown
+            interrupted = context is not None and not context.cancel_requested
+            final = {"status": "failed", "error": "Interrupted by shutdown"} if interrupted else {"status": "cancelled"}
+            await self.update(job["_id"], {**final, "finished_at": datetime.utcnow()})
+            raise
+        except HTTPException as e:
+            final = {"status": "failed", "error": e.detail}
+        except Exception as e:
+            logger.exception(f"❌ Job {job['type']} {job['_id']} failed")
+            final = {"status": "failed", "error": str(e)}
+        finally:
+            heartbeat.cancel()
+            self.contexts.pop(job["_id"], None)
+        await self.update(job["_id"], {**final, "finished_at": datetime.utcnow()})
+        logger.info(f"⚙️ Job {job['type']} {job['_id']} {final['status']}")
+
+    async def wait(self, job_id: str) -> dict:
+        """The job document once it has finished; the job keeps running if the caller goes away"""
+        task = self.tasks.get(job_id)
+        if task:
+            await asyncio.wait({task})
+        return await db.jobs.find_one({"_id": job_id})
+
+    async def cancel(self, job_id: str) -> Optional[dict]:
+        job = await db.jobs.find_one_and_update(
+            {"_id": job_id, "status": {"$in": JOB_ACTIVE_STATUSES}},
+            {"$set": {"cancel_requested": True, "updated_at": datetime.utcnow()}},
+            return_document=ReturnDocument.AFTER
+        )
+        if job:
+            if job_id in self.contexts:
+                # Running handlers stop at their next progress report
+                self.contexts[job_id].cancel_requested = True
+            elif job_id in self.tasks:
+                self.tasks[job_id].cancel()
+        return job
+
+    async def stop(self):
+        for task in list(self.tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+
+    def metrics(self) -> dict:
+        running = {}
+        for context in self.contexts.values():
+            running[context.type] = running.get(context.type, 0) + 1
+        return {"running": running, "queued": len(self.tasks) - len(self.contexts)}
+
+job_runner = JobRunner(JOB_CONCURRENCY)
+
+async def recover_stale_jobs():
+    """Fail jobs left queued or running by a worker that stopped heartbeating"""
+    result = await db.jobs.update_many(
+        {"status": {"$in": JOB_ACTIVE_STATUSES}, "updated_at": {"$lt": datetime.utcnow() - JOB_STALE_AFTER}},
+        {"$set": {"status": "failed", "error": "Interrupted", "finished_at": datetime.utcnow()}}
+    )
+    if result.modified_count:
+        logger.info(f"⚙️ Marked {result.modified_count} interrupted jobs as failed")
+
+def job_response(job: dict) -> dict:
+    progress = job["progress"]
+    return {
+        "job_id": job["_id"],
+        "type": job["type"],
+        "status": job["status"],
+        "params": {field: value for field, value in job["params"].items() if field != "path"},
+        "progress": {**progress, "fraction": round(progress["done"] / progress["total"], 3) if progress.get("total") else None},
+        "eta_seconds": job.get("eta_seconds"),
+        "result": job.get("result"),
+        "error": job.get("error"),
+        "cancel_requested": job.get("cancel_requested", False),
+        "requested_by": job.get("requested_by"),
+        "created_at": job["created_at"],
+        "started_at": job.get("started_at"),
+        "finished_at": job.get("finished_at")
+    }
+
+async def backup_job(job: JobContext) -> dict:
+    total = await db.words.estimated_document_count()
+    snapshot = await create_word_snapshot(kind="manual", progress=lambda done: job.progress(done, total, "Storing words"))
+    if not snapshot:
+        raise HTTPException(status_code=400, detail="No words to backup")
+    return {
+        "collection_name": snapshot["_id"],
+        "word_count": snapshot["word_count"],
+        "timestamp": snapshot["timestamp"],
+        "created": snapshot["created"]
+    }
+
+async def word_import_job(job: JobContext) -> dict:
+    """Import a request body that was spooled to a temporary file"""
+    path = Path(job.params["path"])
+    size = path.stat().st_size
+
+    async def chunks():
+        read = 0
+        with path.open("rb") as spool:
+            while chunk := spool.read(MEDIA_CHUNK_SIZE):
+                read += len(chunk)
+                yield chunk
+                await job.progress(read, size, "Importing rows")
+
+    try:
+        lines = iter_text_lines(chunks())
+        records = iter_csv_records(lines) if job.params["format"] == "csv" else iter_ndjson_records(lines)
+        return await import_word_records(records, job.params["format"], job.params["dry_run"])
+    finally:
+        path.unlink(missing_ok=True)
+
+async def prune_backups_job(job: JobContext) -> dict:
+    return await prune_backups(bool(job.params.get("dry_run", False)))
+
+JOB_HANDLERS = {
+    "backup": backup_job,
+    "restore": run_restore,
+    "word-import": word_import_job,
+    "prune-backups": prune_backups_job,
+}
+
+# Event recording
+# Stored events are claimed by their writer for this long while their points and
+# statistics are applied; after that a retry or the periodic sweep may finish them
+EVENT_APPLY_LEASE_SECONDS = float(os.environ.get('EVENT_APPLY_LEASE_SECONDS', '30'))
+EVENT_APPLY_SWEEP_LIMIT = 500
+
+def merge_increments(target: dict, increments: dict) -> dict:
+    for field, value in increments.items():
+        target[field] = target.get(field, 0) + value
+    return target
+
+async def resolve_word_points(word_ids) -> dict:
+    """Points per word id from the catalog cache, with one $in query for misses"""
+    points = {}
+    missing = []
+    for word_id in set(word_ids):
+        word = word_catalog.get(word_id)
+        if word:
+            points[word_id] = word.get("points", 10)
+        else:
+            missing.append(word_id)
+    if missing:
+        async for word in db.words.find({"id": {"$in": missing}}, {"_id": 0, "id": 1, "points": 1}):
+            points[word["id"]] = word.get("points", 10)
+    return points
+
+async def insert_events(collection, docs: List[dict]) -> List[bool]:
+    """Insert event documents in one unordered bulk write.
+
+    Events carrying a client_event_id are upserted on (user_id, client_event_id)
+    so a retry matches the stored event instead of adding a new one. Returns
+    whether each document was inserted; duplicates are reported as False.
+    Inserted documents get their ``_id`` filled in.
+    """
+    if not docs:
+        return []
+    requests = []
+    for doc in docs:
+        if doc.get("client_event_id"):
+            key = {"user_id": doc["user_id"], "client_event_id": doc["client_event_id"]}
+            requests.append(UpdateOne(key, {"$setOnInsert": doc}, upsert=True))
+        else:
+            requests.append(InsertOne(doc))
+    
+    inserted = [not doc.get("client_event_id") for doc in docs]
+    try:
+        result = await collection.bulk_write(requests, ordered=False)
+        upserted = result.upserted_ids
+    except BulkWriteError as e:
+        # Concurrent upserts of the same event race on the unique index
+        for error in e.details["writeErrors"]:
+            if error["code"] != 11000:
+                raise
+            inserted[error["index"]] = False
+        upserted = {item["index"]: item["_id"] for item in e.details["upserted"]}
+    for index, _id in upserted.items():
+        inserted[index] = True
+        docs[index]["_id"] = _id
+    return inserted
+
+async def find_recorded_event(collection, user_id: str, client_event_id: str) -> dict:
+    """The stored copy of an event that was already recorded"""
+    return await collection.find_one({"user_id": user_id, "client_event_id": client_event_id}, {"_id": 0}) or {}
+
+async def claim_event(collection, query: dict, claim: str) -> Optional[dict]:
+    """Take over an event whose points and statistics are not applied yet.
+
+    An event is claimed by whoever stored it for EVENT_APPLY_LEASE_SECONDS.
+    It can be claimed again with the same token, or by anyone once the claim
+    has lapsed or was released after a failure. Returns the stored event, or
+    None when it is applied or someone else is applying it.
+    """
+    now = datetime.utcnow()
+    return await collection.find_one_and_update(
+        {**query, "applied": False, "$or": [{"claim": claim}, {"claimed_until": {"$lte": now}}]},
+        {"$set": {"claim": claim, "claimed_until": now + timedelta(seconds=EVENT_APPLY_LEASE_SECONDS)}},
+        return_document=ReturnDocument.AFTER
+    )
+
+async def mark_events_applied(collection, docs: List[dict], step: str, fields: Optional[dict] = None):
+    """Record that one side effect of these events is done"""
+    await collection.update_many(
+        {"_id": {"$in": [doc["_id"] for doc in docs]}},
+        {"$addToSet": {"applied_steps": step}, **({"$set": fields} if fields else {})}
+    )
+    for doc in docs:
+        doc["applied_steps"] = [*doc.get("applied_steps", []), step]
+
+async def apply_events(collection, docs: List[dict], stats_for, steps: Optional[dict] = None):
+    """Apply the points, statistics and extra steps of claimed events.
+
+    Each step is marked on the events as soon as it is done, so an event that
+    failed part-way only repeats the steps it is missing. The event is flagged
+    applied once every step is done. On failure the claims are released so a
+    retry of the request can finish the job straight away.
+    """
+    if not docs:
+        return
+    try:
+        by_user = {}
+        for doc in docs:
+            by_user.setdefault(doc["user_id"], []).append(doc)
+        
+        for user_id, user_docs in by_user.items():
+            stats = None
+            pending = [doc for doc in user_docs if "stats" not in doc.get("applied_steps", [])]
+            if pending:
+                # recorded_at places the statistics before or after a statistics rebuild's cutoff
+                recorded_at = datetime.utcnow()
+                stats_collection = await user_stats_collection(recorded_at)
+                increments = {}
+                for doc in pending:
+                    merge_increments(increments, stats_for(doc))
+                stats = await apply_user_stats(user_id, increments, stats_collection)
+                if stats_collection is not db.user_stats:
+                    # Totals from user_stats_deltas during a statistics rebuild are not the day's totals
+                    stats = None
+                await mark_events_applied(collection, pending, "stats", {"recorded_at": recorded_at})
+            
+            pending = [doc for doc in user_docs if "points" not in doc.get("applied_steps", [])]
+            if pending:
+                daily_points = {}
+                for doc in pending:
+                    day = to_utc(doc["timestamp"]).strftime("%Y-%m-%d")
+                    merge_increments(daily_points, {day: doc["points_earned"]})
+                user_points = sum(daily_points.values())
+                if user_points > 0:
+                    user = await db.users.find_one_and_update(
+                        {"id": user_id},
+                        {"$inc": {"total_points": user_points}},
+                        projection={"_id": 0, "total_points": 1},
+                        return_document=ReturnDocument.AFTER
+                    )
+                    day_totals = None
+                    if stats:
+                        day_totals = {day: bucket.get("points", 0) for day, bucket in stats.get("daily", {}).items()}
+                    leaderboard.add_points(user_id, daily_points, user and user.get("total_points"), day_totals)
+                    await user_changed(user_id)
+                await mark_events_applied(collection, pending, "points")
+        
+        for step, apply_step in (steps or {}).items():
+            pending = [doc for doc in docs if step not in doc.get("applied_steps", [])]
+            if pending:
+                await apply_step(pending)
+                await mark_events_applied(collection, pending, step)
+        
+        await collection.update_many(
+            {"_id": {"$in": [doc["_id"] for doc in docs]}},
+            {"$set": {"applied": True}, "$unset": {"claim": "", "claimed_until": ""}}
+        )
+    except BaseException:
+        with suppress(PyMongoError):
+            await collection.update_many(
+                {"_id": {"$in": [doc["_id"] for doc in docs]}, "applied": False},
+                {"$set": {"claimed_until": datetime.min}}
+            )
+        raise
+
+async def write_events(collection, docs: List[dict], stats_for, steps: Optional[dict] = None) -> List[bool]:
+    """Store event documents, then apply their points and statistics.
+
+    Events are stored unapplied and claimed by this call. A retry that matches
+    a stored event which never finished applying (say, the first attempt
+    failed after the insert) applies what is still missing instead of
+    reporting a plain duplicate.
+    """
+    claimed_until = datetime.utcnow() + timedelta(seconds=EVENT_APPLY_LEASE_SECONDS)
+    for doc in docs:
+        # Buffered events keep their claim token, so a rewritten batch can reclaim them
+        doc.setdefault("claim", uuid.uuid4().hex)
+        doc.update({"applied": False, "applied_steps": [], "recorded_at": None, "claimed_until": claimed_until})
+    inserted = await insert_events(collection, docs)
+    
+    claimed = [doc for doc, ok in zip(docs, inserted) if ok]
+    for doc, ok in zip(docs, inserted):
+        if not ok and doc.get("client_event_id"):
+            stored = await claim_event(collection, {"user_id": doc["user_id"], "client_event_id": doc["client_event_id"]}, doc["claim"])
+            if stored:
+                claimed.append(stored)
+    await apply_events(collection, claimed, stats_for, steps)
+    return inserted
+
+def study_session_increments(doc: dict) -> dict:
+    return user_stats_increments(doc["timestamp"], sessions=1, correct=int(doc["correct"]), points=doc["points_earned"])
+
+def quiz_result_increments(doc: dict) -> dict:
+    return user_stats_increments(doc["timestamp"], quizzes=1, quiz_score=doc["score"], points=doc["points_earned"])
+
+async def write_study_sessions(docs: List[dict]) -> List[bool]:
+    return await write_events(db.study_sessions, docs, study_session_increments, {"srs": update_srs_cards})
+
+async def write_quiz_results(docs: List[dict]) -> List[bool]:
+    return await write_events(db.quiz_results, docs, quiz_result_increments)
+
+async def apply_unapplied_events():
+    """Finish events whose writer failed and whose client never retried"""
+    applied = 0
+    for collection, stats_for, steps in (
+        (db.study_sessions, study_session_increments, {"srs": update_srs_cards}),
+        (db.quiz_results, quiz_result_increments, None)
+    ):
+        query = {"applied": False, "claimed_until": {"$lte": datetime.utcnow()}}
+        async for event in collection.find(query, {"_id": 1}).limit(EVENT_APPLY_SWEEP_LIMIT):
+            stored = await claim_event(collection, {"_id": event["_id"]}, uuid.uuid4().hex)
+            if stored:
+                await apply_events(collection, [stored], stats_for, steps)
+                applied += 1
+    if applied:
+        logger.info(f"✅ Applied {applied} events left unapplied by a failed write")
+
+async def apply_unapplied_events_periodically():
+    while True:
+        try:
+            await apply_unapplied_events()
+        except Exception as e:
+            logger.warning(f"Applying unapplied events failed: {e}")
+        await asyncio.sleep(EVENT_APPLY_LEASE_SECONDS)
+
+# Write-behind event buffer
+EVENT_WRITE_BEHIND = os.environ.get('EVENT_WRITE_BEHIND', '').lower() in ('1', 'true', 'yes')
+EVENT_FLUSH_INTERVAL_MS = int(os.environ.get('EVENT_FLUSH_INTERVAL_MS', '250'))
+EVENT_FLUSH_MAX_EVENTS = int(os.environ.get('EVENT_FLUSH_MAX_EVENTS', '500'))
+EVENT_BUFFER_MAX_EVENTS = int(os.environ.get('EVENT_BUFFER_MAX_EVENTS', '20000'))
+EVENT_SPILL_PATH = os.environ.get('EVENT_SPILL_PATH', '')
+
+EVENT_WRITERS = {
+    "study_session": write_study_sessions,
+    "quiz_result": write_quiz_results,
+}
+
+def encode_spilled_value(value):
+    """json.dumps default for spilled events; datetimes are tagged so replay can restore them"""
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    raise TypeError(f"Cannot spill value of type {type(value).__name__}")
+
+def decode_spilled_value(obj: dict):
+    """json.loads object_hook undoing encode_spilled_value"""
+    if len(obj) == 1 and "$date" in obj:
+        return to_utc(obj["$date"])
+    return obj
+
+class EventWriteBuffer:
+    """Coalesces study sessions and quiz results into periodic bulk writes.
 
-class StudentRegisterWithCode(BaseModel):
-    email: EmailStr
-    password: str
-    first_name: str
-    last_name: str
-    login_code: Optional[str] = None
+    Events are flushed every ``flush_interval_ms`` or as soon as ``flush_max``
+    are pending. Memory is bounded by ``max_events``; beyond it new events are
+    rejected with 429. When Mongo is unavailable a batch is appended to the
+    spill file (if configured) and replayed on the next start, otherwise it is
+    kept in memory and retried. A batch interrupted by shutdown or an
+    unexpected error goes back to the front of the queue.
+    """
 
-# Helper functions
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    def __init__(self, flush_interval_ms: int, flush_max: int, max_events: int, spill_path: str):
+        self.flush_interval = flush_interval_ms / 1000
+        self.flush_max = flush_max
+        self.max_events = max_events
+        self.spill_path = Path(spill_path) if spill_path else None
+        # Replayed events not yet written; the file is removed once they all are
+        self.replay_path = None
+        self.pending = []
+        self.flush_requested = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self.task = None
+        self.written = 0
+        self.rejected = 0
+        self.spilled = 0
+        self.failed_flushes = 0
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    def add(self, kind: str, doc: dict):
+        if len(self.pending) >= self.max_events:
+            self.rejected += 1
+            raise HTTPException(status_code=429, detail="Too many events, please retry", headers={"Retry-After": "1"})
+        self.pending.append((kind, doc))
+        if len(self.pending) >= self.flush_max:
+            self.flush_requested.set()
 
-def create_access_token(data: dict):
-    to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(hours=24)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.flush_requested.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.flush_requested.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"❌ Event buffer flush crashed: {e}")
 
-def calculate_level(points: int) -> int:
-    """Calculate user level based on points"""
-    if points < 100:
-        return 1
-    elif points < 250:
-        return 2
-    elif points < 500:
-        return 3
-    elif points < 1000:
-        return 4
-    elif points < 2000:
-        return 5
-    else:
-        return min(10, 5 + (points - 2000) // 500)
+    async def flush(self):
+        async with self._lock:
+            while self.pending:
+                batch = self.pending[:self.flush_max]
+                del self.pending[:len(batch)]
+                try:
+                    await self.write(batch)
+                except PyMongoError as e:
+                    self.failed_flushes += 1
+                    logger.error(f"❌ Event flush of {len(batch)} events failed: {e}")
+                    await self.set_aside(batch)
+                    return
+                except BaseException:
+                    # Cancelled or crashed part-way through. Events already stored keep
+                    # this batch's claim tokens, so the rewrite applies what they miss
+                    self.failed_flushes += 1
+                    self.pending[:0] = batch
+                    raise
+            if self.replay_path:
+                self.replay_path.unlink(missing_ok=True)
+                logger.info(f"✅ Replayed spilled events from {self.replay_path}")
+                self.replay_path = None
 
-def get_badges(points: int, level: int, streak: int) -> List[str]:
-    """Determine earned badges"""
-    badges = []
-    if points >= 100:
-        badges.append("First Century")
-    if points >= 500:
-        badges.append("Word Warrior")
-    if points >= 1000:
-        badges.append("Scholar Supreme")
-    if level >= 5:
-        badges.append("Level Master")
-    if streak >= 7:
-        badges.append("Week Warrior")
-    if streak >= 30:
-        badges.append("Monthly Master")
-    return badges
+    async def set_aside(self, batch: List[tuple]):
+        """Keep a batch Mongo refused: spill it to disk, or retry it on the next tick"""
+        if self.spill_path:
+            try:
+                await asyncio.to_thread(self.spill, batch)
+                return
+            except BaseException:
+                self.pending[:0] = batch
+                raise
+        # New events queue behind the retried batch
+        self.pending[:0] = batch
 
-def generate_login_code() -> str:
-    """Generate a unique login code"""
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
+    async def write(self, batch: List[tuple]):
+        for kind, writer in EVENT_WRITERS.items():
+            docs = [doc for event_kind, doc in batch if event_kind == kind]
+            if docs:
+                await writer(docs)
+        self.written += len(batch)
+
+    def spill(self, batch: List[tuple]):
+        """Append events to the spill file as JSON lines"""
+        # Encode everything first so a bad document cannot leave a partial append
+        lines = [
+            json.dumps({"kind": kind, "doc": {k: v for k, v in doc.items() if k != "_id"}}, default=encode_spilled_value)
+            for kind, doc in batch
+        ]
+        self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.spill_path, "a") as f:
+            f.writelines(line + "\n" for line in lines)
+            f.flush()
+            os.fsync(f.fileno())
+        self.spilled += len(batch)
+
+    def append_spill(self, replay_path: Path):
+        """Add the current spill file to a replay file an earlier run did not finish"""
+        with open(self.spill_path) as spilled, open(replay_path, "a") as f:
+            f.writelines(spilled)
+            f.flush()
+            os.fsync(f.fileno())
+        self.spill_path.unlink()
+
+    async def replay(self):
+        """Write back events spilled by an earlier run.
+
+        The replay file stays until every event in it is written. Events that
+        Mongo refuses again are spilled anew, and the rest are retried from
+        memory, so a crash meanwhile replays them on the next start.
+        """
+        if not self.spill_path:
+            return
+        replay_path = self.spill_path.with_name(self.spill_path.name + ".replay")
+        if self.spill_path.exists():
+            if replay_path.exists():
+                await asyncio.to_thread(self.append_spill, replay_path)
+            else:
+                os.replace(self.spill_path, replay_path)
+        if not replay_path.exists():
+            return
+        
+        events = []
+        with open(replay_path) as f:
+            for line in f:
+                if line.strip():
+                    event = json.loads(line, object_hook=decode_spilled_value)
+                    # Files spilled before datetimes were tagged hold a bare ISO timestamp
+                    event["doc"]["timestamp"] = to_utc(event["doc"]["timestamp"])
+                    events.append((event["kind"], event["doc"]))
+        # Spilled events carry client_event_ids and claim tokens, so replaying twice is harmless
+        self.pending[:0] = events
+        self.replay_path = replay_path
+        logger.info(f"Replaying {len(events)} spilled events from {replay_path}")
+        await self.flush()
+        if self.replay_path:
+            logger.warning(f"⚠️ {len(self.pending)} events wait for Mongo; keeping {replay_path} until they are written")
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task:
+            # Let an in-flight flush put its batch back before the final flush
+            self.task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self.task
+            self.task = None
+        await self.flush()
+        if self.pending and self.spill_path:
+            # Mongo refused the first batch; keep the rest for the next start too
+            await asyncio.to_thread(self.spill, self.pending)
+            self.pending = []
+        if self.pending:
+            logger.error(f"❌ {len(self.pending)} buffered events could not be written before shutdown")
+
+    def metrics(self) -> dict:
+        return {
+            "enabled": EVENT_WRITE_BEHIND,
+            "pending": len(self.pending),
+            "max_events": self.max_events,
+            "written": self.written,
+            "rejected": self.rejected,
+            "spilled": self.spilled,
+            "failed_flushes": self.failed_flushes
+        }
+
+event_buffer = EventWriteBuffer(EVENT_FLUSH_INTERVAL_MS, EVENT_FLUSH_MAX_EVENTS, EVENT_BUFFER_MAX_EVENTS, EVENT_SPILL_PATH)
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
@@ -607,45 +3531,107 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         if user_id is None:
             raise HTTPException(status_code=401, detail="Invalid token")
         
-        user = await db.users.find_one({"id": user_id})
+        user = user_cache.get(user_id)
         if user is None:
-            raise HTTPException(status_code=401, detail="User not found")
-        return user
+            # Authorization never needs the password hash
+            user = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
+            if user is None:
+                raise HTTPException(status_code=401, detail="User not found")
+            user_cache.set(user_id, user)
+        return dict(user)
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-# Initialize sample content and admin user on startup
-@app.on_event("startup")
-async def startup_event():
-    # AUTOMATIC BACKUP: First, backup existing content before any changes
-    existing_words = []
-    async for word in db.words.find({}):
-        word.pop('_id', None)  # Remove MongoDB _id for clean backup
-        existing_words.append(word)
-    
-    if existing_words:
-        # Create backup with timestamp
-        backup_timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        backup_collection = f"words_backup_{backup_timestamp}"
-        await db[backup_collection].insert_many(existing_words)
-        logger.info(f"🔐 BACKUP CREATED: {len(existing_words)} words backed up to {backup_collection}")
-    
+# Startup warm-up
+class Warmup:
+    """Timed startup phases run in the background after the server starts accepting requests.
+
+    The process is ready once every required phase has finished; optional
+    phases such as the backup run alongside them and only show up in the
+    report. Required phases are registered as pending up front, so the worker
+    does not report ready before they have started.
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.started = time.perf_counter()
+
+    def expect(self, *names: str):
+        for name in names:
+            self.phases.setdefault(name, {"status": "pending", "required": True})
+
+    async def phase(self, name: str, step, required: bool = True):
+        self.phases[name] = {"status": "running", "required": required}
+        started = time.perf_counter()
+        try:
+            await step()
+            self.phases[name]["status"] = "done"
+        except Exception as e:
+            logger.exception(f"❌ Startup phase {name} failed")
+            self.phases[name].update({"status": "failed", "error": str(e)})
+        self.phases[name]["seconds"] = round(time.perf_counter() - started, 3)
+        logger.info(f"⏱️ Startup phase {name}: {self.phases[name]['status']} in {self.phases[name]['seconds']:.2f}s")
+
+    @property
+    def ready(self) -> bool:
+        required = [phase for phase in self.phases.values() if phase["required"]]
+        return bool(required) and all(phase["status"] == "done" for phase in required)
+
+    def report(self) -> dict:
+        return {"ready": self.ready, "phases": self.phases}
+
+warmup = Warmup()
+
+async def backup_existing_words():
+    # AUTOMATIC BACKUP: First, snapshot existing content before any changes
+    snapshot = await create_word_snapshot(kind="startup")
+    if snapshot and not snapshot["created"]:
+        logger.info(f"🔐 Catalog unchanged since backup {snapshot['_id']}, no new backup needed")
+
+async def seed_sample_content():
     # PRESERVE EXISTING CONTENT: Only add sample content if database is completely empty
-    word_count = await db.words.count_documents({})
-    if word_count == 0:
+    if await db.words.find_one({}, {"_id": 1}) is None:
+        # Nothing to back up yet
         await db.words.insert_many(SAMPLE_CONTENT)
         logger.info(f"✅ Initialized {len(SAMPLE_CONTENT)} sample Greek and Latin word elements")
-    else:
-        logger.info(f"✅ Preserved existing {word_count} word cards (no data loss)")
+        return
+    logger.info("✅ Preserved existing word cards (no data loss)")
+    # Reading and hashing the catalog grows with its size, so readiness does not wait for it
+    background_tasks.append(asyncio.create_task(warmup.phase("backup", backup_existing_words, required=False)))
+
+async def warm_word_catalog():
+    # Warm the word catalog cache and follow changes from other workers
+    await word_catalog.load()
+    background_tasks.append(asyncio.create_task(word_catalog.watch()))
+    logger.info(f"✅ Word catalog cache loaded with {len(word_catalog.words)} words")
+
+async def warm_leaderboard():
+    # One-time backfill of statistics for events recorded before they existed
+    if not await db.user_stats.estimated_document_count() and await db.study_sessions.estimated_document_count():
+        try:
+            await rebuild_user_stats()
+        except HTTPException:
+            logger.info("✅ Another worker is backfilling statistics")
     
+    # Materialize the leaderboard and keep it in step with other workers
+    await leaderboard.rebuild()
+    background_tasks.append(asyncio.create_task(leaderboard.refresh_periodically()))
+    logger.info(f"✅ Leaderboard loaded with {len(leaderboard.users)} students")
+
+async def start_event_buffer():
+    await event_buffer.replay()
+    event_buffer.start()
+    logger.info(f"✅ Write-behind event buffer flushing every {EVENT_FLUSH_INTERVAL_MS}ms")
+
+async def ensure_admin_user():
     # Create admin user if doesn't exist
-    admin_exists = await db.users.find_one({"email": "admin@empoweru.com"})
+    admin_exists = await db.users.find_one({"email": "admin@empoweru.com"}, {"_id": 1})
     if not admin_exists:
         admin_id = str(uuid.uuid4())
         admin_doc = {
             "id": admin_id,
             "email": "admin@empoweru.com",
-            "password": hash_password("EmpowerU2024!"),
+            "password": await hash_password("EmpowerU2024!"),
             "first_name": "Admin",
             "last_name": "User",
             "is_teacher": True,
@@ -655,14 +3641,80 @@ async def startup_event():
             "streak_days": 0,
             "badges": ["Admin", "Founder"]
         }
-        await db.users.insert_one(admin_doc)
+        try:
+            await db.users.insert_one(admin_doc)
+        except DuplicateKeyError:
+            # Another worker created it first
+            return
+        await bump_revision("users")
         logger.info("Created admin user: admin@empoweru.com / EmpowerU2024!")
 
+async def run_startup_maintenance():
+    # Seeding only fills an empty catalog, which has nothing to back up; an existing
+    # catalog is backed up in the background. The cache is loaded after seeding.
+    await warmup.phase("seed", seed_sample_content)
+    background_tasks.append(asyncio.create_task(prune_backups_periodically()))
+    background_tasks.append(asyncio.create_task(apply_unapplied_events_periodically()))
+    
+    phases = [
+        warmup.phase("indexes", ensure_indexes),
+        warmup.phase("catalog", warm_word_catalog),
+        warmup.phase("leaderboard", warm_leaderboard),
+        warmup.phase("admin", ensure_admin_user),
+        warmup.phase("jobs", recover_stale_jobs, required=False)
+    ]
+    if EVENT_WRITE_BEHIND:
+        phases.append(warmup.phase("event_buffer", start_event_buffer))
+    await asyncio.gather(*phases)
+    
+    # The backup may still be running
+    timings = ", ".join(f"{name} {phase['seconds']:.2f}s" for name, phase in warmup.phases.items() if "seconds" in phase)
+    logger.info(f"🚀 Startup maintenance finished in {time.perf_counter() - warmup.started:.2f}s ({timings})")
+
+# Initialize sample content and admin user on startup
+@app.on_event("startup")
+async def startup_event():
+    # Only the database connection is checked before serving; the rest warms up in the background
+    warmup.expect("database", "seed", "indexes", "catalog", "leaderboard", "admin")
+    if EVENT_WRITE_BEHIND:
+        warmup.expect("event_buffer")
+    await warmup.phase("database", lambda: db.command("ping"))
+    background_tasks.append(asyncio.create_task(run_startup_maintenance()))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for task in background_tasks:
+        task.cancel()
+    # Write out buffered events before the process exits
+    await event_buffer.stop()
+    await job_runner.stop()
+    image_executor.shutdown(wait=False)
+    password_hasher.executor.shutdown(wait=False)
+
 # API Routes
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy", "app": "Empower U - Word Weaver", "timestamp": datetime.utcnow()}
 
+@app.get("/api/ready")
+async def readiness_check(response: Response):
+    """Warm-up state of this worker; 503 until every required startup phase is done"""
+    if not warmup.ready:
+        response.status_code = 503
+    return warmup.report()
+
+@app.get("/api/admin/metrics")
+async def get_metrics(current_user: dict = Depends(get_current_user)):
+    """Runtime metrics of this worker process"""
+    if not current_user.get("is_teacher"):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return {
+        "password_hashing": password_hasher.metrics(),
+        "event_buffer": event_buffer.metrics(),
+        "jobs": job_runner.metrics()
+    }
+
 @app.post("/api/register")
 async def register(user_data: UserCreate):
     # Check if user already exists
@@ -675,7 +3727,7 @@ async def register(user_data: UserCreate):
     
     # Create new user
     user_id = str(uuid.uuid4())
-    hashed_password = hash_password(user_data.password)
+    hashed_password = await hash_password(user_data.password)
     
     user_doc = {
         "id": user_id,
@@ -697,6 +3749,8 @@ async def register(user_data: UserCreate):
     }
     
     await db.users.insert_one(user_doc)
+    leaderboard.upsert_user(user_doc)
+    await bump_revision("users")
     
     # Create access token
     access_token = create_access_token({"sub": user_id})
@@ -754,7 +3808,7 @@ async def register_with_code(user_data: StudentRegisterWithCode):
     
     # Create new user
     user_id = str(uuid.uuid4())
-    hashed_password = hash_password(user_data.password)
+    hashed_password = await hash_password(user_data.password)
     
     # Use login code info to populate user profile if available
     user_doc = {
@@ -778,6 +3832,8 @@ async def register_with_code(user_data: StudentRegisterWithCode):
     }
     
     await db.users.insert_one(user_doc)
+    leaderboard.upsert_user(user_doc)
+    await bump_revision("users")
     
     # If login code was used, increment usage counter
     if login_code_info:
@@ -785,6 +3841,7 @@ async def register_with_code(user_data: StudentRegisterWithCode):
             {"id": login_code_info["id"]},
             {"$inc": {"current_uses": 1}}
         )
+        await bump_revision("login_codes")
         logger.info(f"🎓 STUDENT REGISTERED WITH CODE: {user_data.email} used code {login_code_info['code']} for class {login_code_info['class_name']}")
     
     # Create access token
@@ -818,7 +3875,7 @@ async def register_with_code(user_data: StudentRegisterWithCode):
 @app.post("/api/login")
 async def login(user_data: UserLogin):
     user = await db.users.find_one({"email": user_data.email})
-    if not user or not verify_password(user_data.password, user["password"]):
+    if not user or not await verify_password(user_data.password, user["password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     access_token = create_access_token({"sub": user["id"]})
@@ -839,11 +3896,74 @@ async def login(user_data: UserLogin):
     }
 
 @app.get("/api/words", response_model=List[WordCard])
-async def get_words(current_user: dict = Depends(get_current_user)):
+async def get_words(request: Request, current_user: dict = Depends(get_current_user)):
+    await word_catalog.ensure_loaded()
+    if etag_matches(request, word_catalog.etag):
+        return not_modified_response(word_catalog.etag)
+    response = Response(content=word_catalog.payload, media_type="application/json")
+    set_cache_headers(response, word_catalog.etag)
+    return response
+
+@app.get("/api/words/search")
+async def search_words(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    type: Optional[str] = None,
+    origin: Optional[str] = None,
+    difficulty: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Ranked search over roots, meanings, definitions, examples and categories"""
+    await word_catalog.ensure_loaded()
+    filters = {field: value for field, value in {"type": type, "origin": origin, "difficulty": difficulty}.items() if value is not None}
+    results = search_index.search(q, limit, filters)
+    return {"query": q, "results": [{"score": score, "word": word} for score, word in results]}
+
+@app.post("/api/words/decompose")
+async def decompose_words(decompose_request: DecomposeRequest, current_user: dict = Depends(get_current_user)):
+    """Split each word into catalog prefixes, roots and suffixes"""
+    await word_catalog.ensure_loaded()
+    segmentations = {}
+    for index, word in enumerate(dict.fromkeys(decompose_request.words)):
+        segmentations[word] = morpheme_automaton.decompose(word, decompose_request.limit)
+        # Yield between chunks so a large batch does not stall other requests
+        if index % DECOMPOSE_CHUNK_SIZE == DECOMPOSE_CHUNK_SIZE - 1:
+            await asyncio.sleep(0)
+    return {"results": [{"word": word, "segmentations": segmentations[word]} for word in decompose_request.words]}
+
+@app.get("/api/v2/words")
+async def get_words_page(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    origin: Optional[str] = None,
+    type: Optional[str] = None,
+    difficulty: Optional[str] = None,
+    category: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Paginated word listing with filters and a field projection"""
+    projection = {field: 1 for field in parse_word_fields(fields)}
+    projection["_id"] = 0
+    
+    filters = {"origin": origin, "type": type, "difficulty": difficulty, "category": category}
+    query = {k: v for k, v in filters.items() if v is not None}
+    if cursor:
+        query["id"] = {"$gt": decode_word_cursor(cursor)}
+    
+    # Fetch one extra document to know whether another page exists
     words = []
-    async for word in db.words.find({}):
-        words.append(WordCard(**word))
-    return words
+    async for word in db.words.find(query, projection).sort("id", 1).limit(limit + 1):
+        words.append(word)
+    
+    has_more = len(words) > limit
+    words = words[:limit]
+    
+    return {
+        "items": words,
+        "next_cursor": encode_word_cursor(words[-1]["id"]) if has_more else None,
+        "has_more": has_more
+    }
 
 @app.get("/api/user/profile")
 async def get_user_profile(current_user: dict = Depends(get_current_user)):
@@ -855,10 +3975,13 @@ async def get_user_profile(current_user: dict = Depends(get_current_user)):
     )
     
     # Update user with calculated values
-    await db.users.update_one(
-        {"id": current_user["id"]},
-        {"$set": {"level": level, "badges": badges}}
-    )
+    if level != current_user.get("level") or badges != current_user.get("badges"):
+        await db.users.update_one(
+            {"id": current_user["id"]},
+            {"$set": {"level": level, "badges": badges}}
+        )
+        leaderboard.upsert_user({**current_user, "level": level, "badges": badges})
+        await user_changed(current_user["id"])
     
     return {
         "id": current_user["id"],
@@ -877,56 +4000,183 @@ async def get_user_profile(current_user: dict = Depends(get_current_user)):
     }
 
 @app.post("/api/study-session")
-async def record_study_session(session: StudySession, current_user: dict = Depends(get_current_user)):
+async def record_study_session(
+    session: StudySession,
+    idempotency_key: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user)
+):
     # Get word to determine points
-    word = await db.words.find_one({"id": session.word_id})
-    points_earned = word.get("points", 10) if session.correct else 0
+    word_points = await resolve_word_points([session.word_id])
+    if session.word_id not in word_points:
+        raise HTTPException(status_code=404, detail="Word not found")
+    points_earned = word_points[session.word_id] if session.correct else 0
     
+    # Sessions and points always belong to the authenticated user
     session_doc = {
-        "user_id": session.user_id,
+        "user_id": current_user["id"],
+        "client_event_id": session.client_event_id or idempotency_key,
         "word_id": session.word_id,
         "correct": session.correct,
         "timestamp": session.timestamp,
         "points_earned": points_earned
     }
-    await db.study_sessions.insert_one(session_doc)
+    if EVENT_WRITE_BEHIND:
+        # The id keeps a replayed or retried flush from writing the event twice
+        session_doc["client_event_id"] = session_doc["client_event_id"] or str(uuid.uuid4())
+        event_buffer.add("study_session", session_doc)
+        return {"status": "queued", "points_earned": points_earned}
     
-    # Update user points
-    if points_earned > 0:
-        await db.users.update_one(
-            {"id": current_user["id"]},
-            {"$inc": {"total_points": points_earned}}
-        )
+    if not session_doc["client_event_id"]:
+        del session_doc["client_event_id"]
+    inserted = await write_study_sessions([session_doc])
+    if not inserted[0]:
+        # A retry: report the original outcome without counting it again
+        recorded = await find_recorded_event(db.study_sessions, current_user["id"], session_doc["client_event_id"])
+        return {"status": "duplicate", "points_earned": recorded.get("points_earned", 0)}
     
     return {"status": "recorded", "points_earned": points_earned}
 
-@app.post("/api/quiz-result")
-async def record_quiz_result(result: QuizResult, current_user: dict = Depends(get_current_user)):
-    points_earned = result.score * 5  # 5 points per correct answer
-    
-    result_doc = {
-        "user_id": result.user_id,
-        "score": result.score,
-        "total_questions": result.total_questions,
-        "timestamp": result.timestamp,
-        "points_earned": points_earned
+@app.post("/api/study-sessions/batch")
+async def record_study_sessions_batch(batch: StudySessionBatch, current_user: dict = Depends(get_current_user)):
+    """Record many flashcard answers at once; retried events are ignored by client_event_id"""
+    word_points = await resolve_word_points([event.word_id for event in batch.sessions])
+    
+    results = []
+    docs = []
+    for event in batch.sessions:
+        if event.word_id not in word_points:
+            results.append({"client_event_id": event.client_event_id, "status": "error", "detail": "Word not found"})
+            continue
+        doc = {
+            "user_id": current_user["id"],
+            "client_event_id": event.client_event_id,
+            "word_id": event.word_id,
+            "correct": event.correct,
+            "timestamp": event.timestamp,
+            "points_earned": word_points[event.word_id] if event.correct else 0
+        }
+        results.append({"client_event_id": event.client_event_id, "doc": doc})
+        docs.append(doc)
+    
+    inserted = iter(await write_study_sessions(docs))
+    for result in results:
+        doc = result.pop("doc", None)
+        if doc is None:
+            continue
+        if next(inserted):
+            result.update({"status": "recorded", "points_earned": doc["points_earned"]})
+        else:
+            result.update({"status": "duplicate", "points_earned": 0})
+    
+    return {
+        "results": results,
+        "recorded": sum(1 for r in results if r["status"] == "recorded"),
+        "duplicates": sum(1 for r in results if r["status"] == "duplicate"),
+        "points_earned": sum(r.get("points_earned", 0) for r in results)
     }
-    await db.quiz_results.insert_one(result_doc)
+
+@app.get("/api/review-queue")
+async def get_review_queue(limit: int = Query(20, ge=1, le=200), current_user: dict = Depends(get_current_user)):
+    """Next cards to study: due reviews first, then words the student has not seen yet"""
+    await word_catalog.ensure_loaded()
+    now = datetime.utcnow()
     
-    # Update user points
-    if points_earned > 0:
-        await db.users.update_one(
-            {"id": current_user["id"]},
-            {"$inc": {"total_points": points_earned}}
-        )
+    cards = []
+    async for card in db.srs_cards.find(
+        {"user_id": current_user["id"], "due_at": {"$lte": now}}, {"_id": 0}
+    ).sort("due_at", 1).limit(limit):
+        word = word_catalog.get(card["word_id"])
+        if word:
+            cards.append({**word, "srs": {k: card[k] for k in ["ease", "interval_days", "reps", "lapses", "due_at"]}})
+    due_count = len(cards)
     
-    return {"status": "recorded", "points_earned": points_earned}
+    if len(cards) < limit:
+        for word_id in await first_unseen_words(current_user["id"], limit - len(cards)):
+            word = word_catalog.get(word_id)
+            if word:
+                cards.append({**word, "srs": None})
+    
+    return {"due": due_count, "new": len(cards) - due_count, "cards": cards}
+
+@app.get("/api/user/progress", response_model=UserProgress)
+async def get_progress(current_user: dict = Depends(get_current_user)):
+    """Mastered, studying and difficult words derived from the review schedule"""
+    progress = {"mastered": [], "studying": [], "difficult": []}
+    async for card in db.srs_cards.find({"user_id": current_user["id"]}, {"_id": 0, "word_id": 1, "ease": 1, "interval_days": 1, "lapses": 1}):
+        progress[classify_srs_card(card)].append(card["word_id"])
+    
+    return UserProgress(
+        user_id=current_user["id"],
+        mastered_words=progress["mastered"],
+        studying_words=progress["studying"],
+        difficult_words=progress["difficult"]
+    )
+
+@app.post("/api/quiz/generate")
+async def generate_quiz_questions(quiz_request: QuizGenerateRequest, current_user: dict = Depends(get_current_user)):
+    """Multiple-choice quiz built on the server from the distractor index"""
+    word_ids = await quiz_word_pool(quiz_request)
+    seed = quiz_request.seed if quiz_request.seed is not None else random.randrange(2 ** 31)
+    return {"seed": seed, "questions": generate_quiz(word_ids, quiz_request.count, quiz_request.choices, seed)}
+
+@app.post("/api/quiz/sessions")
+async def create_quiz_session(session_request: QuizSessionCreate, current_user: dict = Depends(get_current_user)):
+    """Start a server-scored quiz; the answers stay on the server"""
+    word_ids = await quiz_word_pool(session_request)
+    seed = session_request.seed if session_request.seed is not None else random.randrange(2 ** 31)
+    questions = generate_quiz(word_ids, session_request.count, session_request.choices, seed)
+    session = await quiz_sessions.create(current_user["id"], seed, questions, session_request.time_limit_seconds)
+    return {
+        "session_id": session["id"],
+        "seed": seed,
+        "deadline": session["deadline"],
+        "questions": [public_quiz_question(question) for question in questions]
+    }
+
+@app.post("/api/quiz/sessions/{session_id}/answers")
+async def answer_quiz_question(session_id: str, answer: QuizAnswer, current_user: dict = Depends(get_current_user)):
+    session = await quiz_sessions.get(session_id, current_user["id"])
+    return await score_quiz_answer(session, answer)
+
+@app.post("/api/quiz/sessions/{session_id}/finalize")
+async def finalize_quiz_session(session_id: str, current_user: dict = Depends(get_current_user)):
+    """Write the session's result once; finalizing again returns the stored result"""
+    try:
+        # Read the answers back from Mongo; some may have been recorded by other workers
+        session = await quiz_sessions.get(session_id, current_user["id"], fresh=True)
+    except HTTPException:
+        recorded = await find_recorded_event(db.quiz_results, current_user["id"], session_id)
+        if not recorded:
+            raise
+        return {"status": "duplicate", "score": recorded["score"], "total_questions": recorded["total_questions"], "points_earned": recorded["points_earned"]}
+    
+    result_doc = quiz_session_result(session)
+    summary = {"score": result_doc["score"], "total_questions": result_doc["total_questions"], "points_earned": result_doc["points_earned"]}
+    if EVENT_WRITE_BEHIND:
+        event_buffer.add("quiz_result", result_doc)
+        await quiz_sessions.delete(session_id)
+        return {"status": "queued", **summary}
+    
+    # The session id doubles as the event id, so a concurrent finalize is stored once
+    inserted = await write_quiz_results([result_doc])
+    await quiz_sessions.delete(session_id)
+    return {"status": "recorded" if inserted[0] else "duplicate", **summary}
+
+@app.post("/api/quiz-result")
+async def record_quiz_result(current_user: dict = Depends(get_current_user)):
+    """Retired: a client-reported score could award any number of points"""
+    raise HTTPException(status_code=410, detail="Quiz results are scored on the server; use /api/quiz/sessions")
 
 @app.get("/api/admin/users")
-async def get_all_users(current_user: dict = Depends(get_current_user)):
+async def get_all_users(request: Request, response: Response, current_user: dict = Depends(get_current_user)):
     if not current_user.get("is_teacher"):
         raise HTTPException(status_code=403, detail="Admin access required")
     
+    etag = make_etag("users", await get_revision("users"))
+    if etag_matches(request, etag):
+        return not_modified_response(etag)
+    set_cache_headers(response, etag)
+    
     users = []
     async for user in db.users.find({}, {"password": 0}):  # Exclude password
         users.append({
@@ -973,23 +4223,74 @@ async def get_user_progress(user_id: str, current_user: dict = Depends(get_curre
         "quiz_results": quiz_results
     }
 
+def leaderboard_scope_value(scope: str, value: Optional[str], current_user: dict) -> Optional[str]:
+    """Students see their own school/teacher/class/block; teachers may pick any"""
+    if scope not in LEADERBOARD_SCOPES:
+        raise HTTPException(status_code=400, detail=f"scope must be one of {', '.join(LEADERBOARD_SCOPES)}")
+    field = LEADERBOARD_SCOPES[scope]
+    if field is None:
+        return None
+    if value and current_user.get("is_teacher"):
+        return value
+    if not current_user.get(field):
+        raise HTTPException(status_code=400, detail=f"No {field} set for this scope")
+    return current_user[field]
+
 @app.get("/api/leaderboard")
-async def get_leaderboard(current_user: dict = Depends(get_current_user)):
+async def get_leaderboard(
+    request: Request,
+    response: Response,
+    scope: str = "global",
+    value: Optional[str] = None,
+    window: str = "all",
+    limit: int = Query(10, ge=1, le=100),
+    current_user: dict = Depends(get_current_user)
+):
     """Get top students by points"""
+    if window not in LEADERBOARD_WINDOWS:
+        raise HTTPException(status_code=400, detail=f"window must be one of {', '.join(LEADERBOARD_WINDOWS)}")
+    scope_value = leaderboard_scope_value(scope, value, current_user)
+    await leaderboard.ensure_loaded()
+    
+    # Windowed boards also change when the day rolls over
+    # This worker's board version, since each worker's board catches up on its own schedule
+    etag = make_etag("leaderboard", leaderboard.instance, leaderboard.version, scope, scope_value, window, limit, datetime.utcnow().strftime("%Y%m%d"))
+    if etag_matches(request, etag):
+        return not_modified_response(etag)
+    set_cache_headers(response, etag)
+    
     users = []
-    async for user in db.users.find(
-        {"is_teacher": False}, 
-        {"password": 0}
-    ).sort("total_points", -1).limit(10):
-        users.append({
-            "first_name": user["first_name"],
-            "last_name": user["last_name"],
-            "level": user.get("level", 1),
-            "total_points": user.get("total_points", 0),
-            "badges": user.get("badges", [])
-        })
+    for entry in leaderboard.top(scope, scope_value, window, limit):
+        user = {
+            "rank": entry["rank"],
+            "first_name": entry["first_name"],
+            "last_name": entry["last_name"],
+            "level": entry.get("level", 1),
+            "total_points": entry.get("total_points", 0),
+            "badges": entry.get("badges", [])
+        }
+        if "window_points" in entry:
+            user["window_points"] = entry["window_points"]
+        users.append(user)
     return users
 
+@app.get("/api/leaderboard/me")
+async def get_my_rank(
+    scope: str = "global",
+    window: str = "all",
+    current_user: dict = Depends(get_current_user)
+):
+    """Rank of the current student within a leaderboard scope"""
+    if window not in LEADERBOARD_WINDOWS:
+        raise HTTPException(status_code=400, detail=f"window must be one of {', '.join(LEADERBOARD_WINDOWS)}")
+    scope_value = leaderboard_scope_value(scope, None, current_user)
+    await leaderboard.ensure_loaded()
+    
+    rank = leaderboard.rank(current_user["id"], scope, scope_value, window)
+    if rank is None:
+        raise HTTPException(status_code=404, detail="Not ranked on the leaderboard")
+    return {"scope": scope, "value": scope_value, "window": window, **rank}
+
 @app.post("/api/admin/create-word")
 async def create_word(word_data: dict, current_user: dict = Depends(get_current_user)):
     if not current_user.get("is_teacher"):
@@ -999,10 +4300,12 @@ async def create_word(word_data: dict, current_user: dict = Depends(get_current_
     word_id = str(uuid.uuid4())
     word_doc = {
         "id": word_id,
-        **word_data
+        **(await store_inline_image(without_server_image_fields(word_data)))
     }
     
     await db.words.insert_one(word_doc)
+    await word_catalog.invalidate()
+    schedule_image_variants(word_id, word_doc)
     return {"status": "created", "id": word_id}
 
 @app.put("/api/admin/update-word/{word_id}")
@@ -1010,14 +4313,24 @@ async def update_word(word_id: str, word_data: dict, current_user: dict = Depend
     if not current_user.get("is_teacher"):
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    result = await db.words.update_one(
+    update_data = await store_inline_image(without_server_image_fields(word_data))
+    if "image" in update_data and not update_data["image"]:
+        # Image removed from the slide
+        update_data.update({"image_hash": None, "image_variants": None})
+    
+    word = await db.words.find_one_and_update(
         {"id": word_id},
-        {"$set": word_data}
+        {"$set": update_data},
+        projection={"_id": 0, "image_hash": 1, "image_variants": 1},
+        return_document=ReturnDocument.AFTER
     )
     
-    if result.matched_count == 0:
+    if word is None:
         raise HTTPException(status_code=404, detail="Word not found")
     
+    await word_catalog.invalidate()
+    # Render from the stored image, which also repairs variants lost to earlier edits
+    schedule_image_variants(word_id, word)
     return {"status": "updated"}
 
 @app.delete("/api/admin/delete-word/{word_id}")
@@ -1030,8 +4343,88 @@ async def delete_word(word_id: str, current_user: dict = Depends(get_current_use
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Word not found")
     
+    await word_catalog.invalidate()
     return {"status": "deleted"}
 
+@app.post("/api/admin/words/import")
+async def import_words(
+    request: Request,
+    response: Response,
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$"),
+    dry_run: bool = False,
+    wait: bool = True,
+    current_user: dict = Depends(get_current_user)
+):
+    """Bulk upsert words from an NDJSON or CSV body as a background job"""
+    if not current_user.get("is_teacher"):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    # Spool the body so the job does not depend on this connection staying open
+    import_format = format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+    descriptor, path = tempfile.mkstemp(prefix="word-import-", suffix=f".{import_format}")
+    with os.fdopen(descriptor, "wb") as spool:
+        async for chunk in request.stream():
+            spool.write(chunk)
+    
+    params = {"format": import_format, "dry_run": dry_run, "path": path}
+    job_id = await job_runner.submit("word-import", params, current_user["id"])
+    if not wait:
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {"status": "queued", "job_id": job_id}
+    
+    job = await job_runner.wait(job_id)
+    if job["status"] != "completed":
+        raise HTTPException(status_code=500, detail=f"Import failed: {job.get('error')}")
+    return {**job["result"], "job_id": job_id}
+
+@app.get("/api/admin/words/export")
+async def export_words(format: str = Query("ndjson", pattern="^(ndjson|csv)$"), current_user: dict = Depends(get_current_user)):
+    """Stream every word as NDJSON or CSV, in the format the import accepts"""
+    if not current_user.get("is_teacher"):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    filename = f"words-{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{format}"
+    return StreamingResponse(
+        iter_word_export(format),
+        media_type="text/csv" if format == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.get("/api/media/{digest}")
+async def get_media(digest: str, request: Request):
+    """Stream a stored image, honouring single byte-range requests"""
+    media = await db.media.find_one({"_id": digest})
+    if not media or not media_store.path(digest).exists():
+        raise HTTPException(status_code=404, detail="Media not found")
+    
+    # Content never changes for a digest, so it can be cached forever
+    size = media["size"]
+    headers = {
+        "ETag": f'"{digest}"',
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Accept-Ranges": "bytes",
+        "X-Content-Type-Options": "nosniff"
+    }
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    
+    start, end = 0, size - 1
+    status_code = 200
+    range_header = request.headers.get("range")
+    if range_header:
+        start, end = parse_byte_range(range_header, size)
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        status_code = 206
+    
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        media_store.iter_range(digest, start, end),
+        status_code=status_code,
+        # Blobs stored before uploads were restricted to images are never served as markup
+        media_type=media["content_type"] if media["content_type"] in IMAGE_CONTENT_TYPES else "application/octet-stream",
+        headers=headers
+    )
+
 @app.get("/api/admin/study-sets")
 async def get_study_sets(current_user: dict = Depends(get_current_user)):
     if not current_user.get("is_teacher"):
@@ -1068,109 +4461,139 @@ async def list_backups(current_user: dict = Depends(get_current_user)):
     if not current_user.get("is_teacher"):
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    # Get all backup collections
-    collections = await db.list_collection_names()
-    backup_collections = [col for col in collections if col.startswith("words_backup_")]
-    
+    # Full-copy backups from before snapshots are registered here by the pruning task
     backups = []
-    for backup_col in backup_collections:
-        count = await db[backup_col].count_documents({})
-        timestamp_str = backup_col.replace("words_backup_", "")
-        
-        # Parse timestamp for readable format
-        try:
-            timestamp = datetime.strptime(timestamp_str, "%Y%m%d_%H%M%S")
-            readable_time = timestamp.strftime("%Y-%m-%d %H:%M:%S")
-        except:
-            readable_time = timestamp_str
-        
+    projection = {"timestamp": 1, "word_count": 1}
+    async for snapshot in db.word_snapshots.find({"status": "complete"}, projection).sort("created_at", -1):
         backups.append({
-            "collection_name": backup_col,
-            "timestamp": timestamp_str,
-            "readable_time": readable_time,
-            "word_count": count
+            "collection_name": snapshot["_id"],
+            "timestamp": snapshot["timestamp"],
+            "readable_time": backup_readable_time(snapshot["timestamp"]),
+            "word_count": snapshot["word_count"]
         })
-    
-    # Sort by timestamp (newest first)
-    backups.sort(key=lambda x: x["timestamp"], reverse=True)
     return backups
 
+@app.post("/api/admin/backups/prune")
+async def prune_backups_now(dry_run: bool = False, current_user: dict = Depends(get_current_user)):
+    """Apply the backup retention policy immediately"""
+    if not current_user.get("is_teacher"):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return await prune_backups(dry_run)
+
 @app.post("/api/admin/create-backup")
 async def create_manual_backup(current_user: dict = Depends(get_current_user)):
     if not current_user.get("is_teacher"):
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    # Get current words
-    existing_words = []
-    async for word in db.words.find({}):
-        word.pop('_id', None)
-        existing_words.append(word)
-    
-    if not existing_words:
-        raise HTTPException(status_code=400, detail="No words to backup")
-    
-    # Create backup with timestamp
-    backup_timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    backup_collection = f"words_backup_{backup_timestamp}"
-    await db[backup_collection].insert_many(existing_words)
+    job = await job_runner.wait(await job_runner.submit("backup", {}, current_user["id"]))
+    if job["status"] != "completed":
+        raise HTTPException(status_code=400, detail=job.get("error") or "Backup failed")
+    backup = job["result"]
     
-    logger.info(f"🔐 MANUAL BACKUP CREATED: {len(existing_words)} words backed up to {backup_collection}")
+    if backup["created"]:
+        logger.info(f"🔐 MANUAL BACKUP CREATED: {backup['word_count']} words backed up to {backup['collection_name']}")
     
     return {
-        "status": "backup_created",
-        "collection_name": backup_collection,
-        "word_count": len(existing_words),
-        "timestamp": backup_timestamp
+        "status": "backup_created" if backup["created"] else "backup_unchanged",
+        "collection_name": backup["collection_name"],
+        "word_count": backup["word_count"],
+        "timestamp": backup["timestamp"],
+        "job_id": job["_id"]
     }
 
 @app.post("/api/admin/restore-backup")
-async def restore_backup(backup_data: dict, current_user: dict = Depends(get_current_user)):
+async def restore_backup(backup_data: dict, response: Response, current_user: dict = Depends(get_current_user)):
     if not current_user.get("is_teacher"):
         raise HTTPException(status_code=403, detail="Admin access required")
     
     collection_name = backup_data.get("collection_name")
-    if not collection_name or not collection_name.startswith("words_backup_"):
+    if not collection_name or not collection_name.startswith(WORD_BACKUP_PREFIX):
         raise HTTPException(status_code=400, detail="Invalid backup collection name")
     
     # Check if backup exists
-    collections = await db.list_collection_names()
-    if collection_name not in collections:
+    backup = await find_word_backup(collection_name)
+    if not backup:
         raise HTTPException(status_code=404, detail="Backup not found")
     
-    # Get backup data
-    backup_words = []
-    async for word in db[collection_name].find({}):
-        word.pop('_id', None)
-        backup_words.append(word)
+    job_id = await job_runner.submit("restore", {"backup": backup["_id"]}, current_user["id"])
+    if not backup_data.get("wait", True):
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {"status": "queued", "job_id": job_id}
+    
+    # The job keeps running if the client disconnects while waiting
+    job = await job_runner.wait(job_id)
+    if job["status"] != "completed":
+        raise HTTPException(status_code=500, detail=f"Restore failed: {job.get('error')}")
     
-    if not backup_words:
-        raise HTTPException(status_code=400, detail="Backup is empty")
+    return {"status": "restored", **job["result"], "job_id": job_id}
+
+@app.post("/api/admin/jobs")
+async def submit_job(job_data: JobCreate, response: Response, current_user: dict = Depends(get_current_user)):
+    if not current_user.get("is_teacher"):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    if job_data.type not in JOB_SUBMITTABLE:
+        raise HTTPException(status_code=400, detail=f"type must be one of {', '.join(sorted(JOB_SUBMITTABLE))}")
     
-    # Create a backup of current state before restoring
-    current_backup_timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    current_backup_collection = f"words_backup_before_restore_{current_backup_timestamp}"
+    job_id = await job_runner.submit(job_data.type, job_data.params, current_user["id"])
+    response.status_code = status.HTTP_202_ACCEPTED
+    return job_response(await db.jobs.find_one({"_id": job_id}))
+
+@app.get("/api/admin/jobs")
+async def list_jobs(
+    type: Optional[str] = None,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: dict = Depends(get_current_user)
+):
+    if not current_user.get("is_teacher"):
+        raise HTTPException(status_code=403, detail="Admin access required")
     
-    current_words = []
-    async for word in db.words.find({}):
-        word.pop('_id', None)
-        current_words.append(word)
+    query = {field: value for field, value in {"type": type, "status": status_filter}.items() if value is not None}
+    return [job_response(job) async for job in db.jobs.find(query).sort("created_at", -1).limit(limit)]
+
+@app.get("/api/admin/jobs/{job_id}")
+async def get_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    if not current_user.get("is_teacher"):
+        raise HTTPException(status_code=403, detail="Admin access required")
     
-    if current_words:
-        await db[current_backup_collection].insert_many(current_words)
-        logger.info(f"🔐 PRE-RESTORE BACKUP: {len(current_words)} words backed up to {current_backup_collection}")
+    job = await db.jobs.find_one({"_id": job_id})
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_response(job)
+
+@app.post("/api/admin/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    if not current_user.get("is_teacher"):
+        raise HTTPException(status_code=403, detail="Admin access required")
     
-    # Clear current words and restore from backup
-    await db.words.delete_many({})
-    await db.words.insert_many(backup_words)
+    job = await job_runner.cancel(job_id)
+    if not job:
+        if not await db.jobs.find_one({"_id": job_id}, {"_id": 1}):
+            raise HTTPException(status_code=404, detail="Job not found")
+        raise HTTPException(status_code=400, detail="Job has already finished")
+    return job_response(job)
+
+@app.get("/api/admin/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request, current_user: dict = Depends(get_current_user)):
+    """Server-sent events with the job's state on every change, ending when it finishes"""
+    if not current_user.get("is_teacher"):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    if not await db.jobs.find_one({"_id": job_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Job not found")
     
-    logger.info(f"✅ RESTORED: {len(backup_words)} words restored from {collection_name}")
+    async def events():
+        last_update = None
+        while True:
+            job = await db.jobs.find_one({"_id": job_id})
+            finished = job["status"] not in JOB_ACTIVE_STATUSES
+            if job["updated_at"] != last_update or finished:
+                last_update = job["updated_at"]
+                yield f"event: {'end' if finished else 'progress'}\ndata: {json.dumps(job_response(job), default=str)}\n\n"
+            if finished or await request.is_disconnected():
+                return
+            await asyncio.sleep(JOB_EVENT_POLL_SECONDS)
     
-    return {
-        "status": "restored",
-        "restored_from": collection_name,
-        "word_count": len(backup_words),
-        "pre_restore_backup": current_backup_collection
-    }
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 # Login Code Management Endpoints
 
@@ -1182,8 +4605,8 @@ async def create_login_code(code_data: LoginCodeCreate, current_user: dict = Dep
     # Generate unique code
     code = generate_login_code()
     
-    # Ensure code is unique
-    while await db.login_codes.find_one({"code": code, "active": True}):
+    # Ensure code is unique (inactive codes keep their code)
+    while await db.login_codes.find_one({"code": code}):
         code = generate_login_code()
     
     # Calculate expiration date
@@ -1205,6 +4628,7 @@ async def create_login_code(code_data: LoginCodeCreate, current_user: dict = Dep
     }
     
     await db.login_codes.insert_one(login_code_doc)
+    await bump_revision("login_codes")
     
     logger.info(f"✅ LOGIN CODE CREATED: {code} for class {code_data.class_name} by teacher {current_user['email']}")
     
@@ -1224,10 +4648,19 @@ async def create_login_code(code_data: LoginCodeCreate, current_user: dict = Dep
     }
 
 @app.get("/api/admin/login-codes")
-async def get_login_codes(current_user: dict = Depends(get_current_user)):
+async def get_login_codes(request: Request, response: Response, current_user: dict = Depends(get_current_user)):
     if not current_user.get("is_teacher"):
         raise HTTPException(status_code=403, detail="Admin access required")
     
+    # is_expired changes with time alone, so the number of expired codes is part of the version
+    expired_count = await db.login_codes.count_documents(
+        {"teacher_id": current_user["id"], "expires_at": {"$lte": datetime.utcnow()}}
+    )
+    etag = make_etag("login_codes", await get_revision("login_codes"), current_user["id"], expired_count)
+    if etag_matches(request, etag):
+        return not_modified_response(etag)
+    set_cache_headers(response, etag)
+    
     login_codes = []
     async for code in db.login_codes.find({"teacher_id": current_user["id"]}).sort("created_at", -1):
         code.pop('_id', None)
@@ -1273,6 +4706,8 @@ async def toggle_login_code(code_id: str, current_user: dict = Depends(get_curre
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Login code not found")
     
+    await bump_revision("login_codes")
+    
     logger.info(f"🔄 LOGIN CODE TOGGLED: {code['code']} -> active: {new_active_status}")
     
     return {
@@ -1296,6 +4731,8 @@ async def delete_login_code(code_id: str, current_user: dict = Depends(get_curre
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Login code not found")
     
+    await bump_revision("login_codes")
+    
     logger.info(f"🗑️ LOGIN CODE DELETED: {code['code']} for class {code['class_name']}")
     
     return {"status": "deleted", "code": code["code"]}
@@ -1348,40 +4785,38 @@ async def get_student_profile(student_id: str, current_user: dict = Depends(get_
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     
-    # Get student analytics
-    # Study sessions
-    study_sessions = []
-    async for session in db.study_sessions.find({"user_id": student_id}):
-        session.pop('_id', None)
-        study_sessions.append(session)
-    
-    # Quiz results
-    quiz_results = []
-    async for result in db.quiz_results.find({"user_id": student_id}):
-        result.pop('_id', None)
-        quiz_results.append(result)
+    # Get student analytics from the precomputed stats document
+    stats = await db.user_stats.find_one({"user_id": student_id}) or {}
     
-    # Calculate analytics
-    total_sessions = len(study_sessions)
-    correct_sessions = len([s for s in study_sessions if s.get('correct', False)])
+    total_sessions = stats.get("study_sessions", 0)
+    correct_sessions = stats.get("study_correct", 0)
     accuracy_rate = (correct_sessions / total_sessions * 100) if total_sessions > 0 else 0
     
-    total_quizzes = len(quiz_results)
-    average_quiz_score = sum([r.get('score', 0) for r in quiz_results]) / total_quizzes if total_quizzes > 0 else 0
+    total_quizzes = stats.get("quiz_count", 0)
+    average_quiz_score = stats.get("quiz_score_sum", 0) / total_quizzes if total_quizzes > 0 else 0
     
     # Recent activity (last 7 days)
-    from datetime import timedelta
-    recent_date = datetime.utcnow() - timedelta(days=7)
-    recent_sessions = [s for s in study_sessions if datetime.fromisoformat(s.get('timestamp', '').replace('Z', '+00:00')) > recent_date]
+    today = datetime.utcnow().date()
+    daily = stats.get("daily", {})
+    recent_days = [(today - timedelta(days=offset)).strftime("%Y-%m-%d") for offset in range(7)]
+    recent_activity_count = sum(daily.get(day, {}).get("sessions", 0) for day in recent_days)
+    
+    # Latest sessions and quiz results, oldest first
+    study_sessions = await db.study_sessions.find(
+        {"user_id": student_id}, {"_id": 0}
+    ).sort("timestamp", -1).limit(10).to_list(10)
+    quiz_results = await db.quiz_results.find(
+        {"user_id": student_id}, {"_id": 0}
+    ).sort("timestamp", -1).limit(5).to_list(5)
     
     analytics = {
         "total_study_sessions": total_sessions,
         "accuracy_rate": round(accuracy_rate, 1),
         "total_quizzes": total_quizzes,
         "average_quiz_score": round(average_quiz_score, 1),
-        "recent_activity_count": len(recent_sessions),
-        "study_sessions": study_sessions[-10:],  # Last 10 sessions
-        "quiz_results": quiz_results[-5:],  # Last 5 quiz results
+        "recent_activity_count": recent_activity_count,
+        "study_sessions": study_sessions[::-1],  # Last 10 sessions
+        "quiz_results": quiz_results[::-1],  # Last 5 quiz results
     }
     
     return {
@@ -1404,6 +4839,30 @@ async def get_student_profile(student_id: str, current_user: dict = Depends(get_
         "analytics": analytics
     }
 
+@app.get("/api/admin/analytics/classes")
+async def get_class_analytics(
+    group_by: str = "class_name",
+    teacher: Optional[str] = None,
+    class_name: Optional[str] = None,
+    block_number: Optional[str] = None,
+    school: Optional[str] = None,
+    grade: Optional[str] = None,
+    days: int = Query(7, ge=1, le=365),
+    current_user: dict = Depends(get_current_user)
+):
+    """Class dashboard: per-student accuracy, activity and weakest roots grouped by class field"""
+    if not current_user.get("is_teacher"):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    if group_by not in ANALYTICS_GROUP_FIELDS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(ANALYTICS_GROUP_FIELDS)}")
+    
+    filters = {"teacher": teacher, "class_name": class_name, "block_number": block_number, "school": school, "grade": grade}
+    filters = {k: v for k, v in filters.items() if v is not None}
+    
+    await word_catalog.ensure_loaded()
+    return await run_class_analytics(db, group_by, filters, days)
+
 @app.put("/api/admin/student/{student_id}")
 async def update_student_profile(student_id: str, student_data: dict, current_user: dict = Depends(get_current_user)):
     if not current_user.get("is_teacher"):
@@ -1436,6 +4895,10 @@ async def update_student_profile(student_id: str, student_data: dict, current_us
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Student not found")
     
+    student = await db.users.find_one({"id": student_id}, {"_id": 0, "password": 0})
+    if student:
+        leaderboard.upsert_user(student)
+    await user_changed(student_id)
     return {"status": "updated", "student_id": student_id}
 
 @app.delete("/api/admin/student/{student_id}")
@@ -1455,6 +4918,10 @@ async def delete_student_profile(student_id: str, current_user: dict = Depends(g
     await db.users.delete_one({"id": student_id})
     await db.study_sessions.delete_many({"user_id": student_id})
     await db.quiz_results.delete_many({"user_id": student_id})
+    await db.user_stats.delete_one({"user_id": student_id})
+    await db.srs_cards.delete_many({"user_id": student_id})
+    leaderboard.remove_user(student_id)
+    await user_changed(student_id)
     
     return {"status": "deleted", "student_id": student_id}
 
@@ -1470,7 +4937,7 @@ async def create_student_profile(student_data: UserCreate, current_user: dict =
     
     # Create new student
     student_id = str(uuid.uuid4())
-    hashed_password = hash_password(student_data.password)
+    hashed_password = await hash_password(student_data.password)
     
     student_doc = {
         "id": student_id,
@@ -1491,6 +4958,8 @@ async def create_student_profile(student_data: UserCreate, current_user: dict =
     }
     
     await db.users.insert_one(student_doc)
+    leaderboard.upsert_user(student_doc)
+    await bump_revision("users")
     
     return {
         "status": "created",
@@ -1498,6 +4967,231 @@ async def create_student_profile(student_data: UserCreate, current_user: dict =
         "message": f"Student {student_data.first_name} {student_data.last_name} created successfully"
     }
 
+# Management commands
+async def migrate_inline_images():
+    """Move base64 images embedded in word documents into the media store"""
+    migrated = 0
+    async for word in db.words.find({"image": {"$regex": "^data:"}}, {"_id": 0, "id": 1, "image": 1}):
+        try:
+            update = await store_inline_image({"image": word["image"]})
+        except HTTPException:
+            logger.warning(f"Skipping word {word['id']}: invalid image data")
+            continue
+        await db.words.update_one({"id": word["id"]}, {"$set": update})
+        migrated += 1
+    
+    # Render variants for every stored image that does not have them yet
+    rendered = 0
+    async for word in db.words.find({"image_hash": {"$ne": None}, "image_variants": None}, {"_id": 0, "id": 1, "image_hash": 1}):
+        variants = await build_image_variants(word["image_hash"])
+        await db.words.update_one({"id": word["id"]}, {"$set": {"image_variants": variants}})
+        rendered += 1
+    
+    if migrated or rendered:
+        await bump_revision("words")
+    image_executor.shutdown()
+    logger.info(f"✅ Migrated {migrated} inline images to {MEDIA_ROOT}, rendered variants for {rendered}")
+
+async def rebuild_user_stats():
+    """Recompute every user_stats document from study_sessions and quiz_results.
+
+    Safe while events are being recorded. One worker at a time holds the
+    rebuild lease and publishes a cutoff a few seconds ahead; events recorded
+    before it are aggregated here, and writers send the statistics of later
+    events to user_stats_deltas, which are merged once the rebuilt documents
+    are in place.
+    """
+    async with Lease(STATS_REBUILD_LEASE) as lease:
+        # Deltas left by an interrupted rebuild belong to events recounted here
+        await db.user_stats_deltas.delete_many({})
+        cutoff = datetime.utcnow() + timedelta(seconds=STATS_REBUILD_SETTLE_SECONDS)
+        await lease.update(cutoff=cutoff)
+        # Let every event recorded before the cutoff finish its own increment first
+        await asyncio.sleep(2 * STATS_REBUILD_SETTLE_SECONDS)
+        
+        started_at = datetime.utcnow()
+        before_cutoff = {"$match": {"$or": [{"recorded_at": {"$lt": cutoff}}, {"recorded_at": {"$exists": False}}]}}
+        day_expr = {"$dateToString": {"format": "%Y-%m-%d", "date": {"$toDate": "$timestamp"}}}
+        stats = {}
+        
+        def user_doc(user_id):
+            return stats.setdefault(user_id, {
+                "user_id": user_id, "study_sessions": 0, "study_correct": 0,
+                "quiz_count": 0, "quiz_score_sum": 0, "points": 0, "daily": {}
+            })
+        
+        async for row in db.study_sessions.aggregate([
+            before_cutoff,
+            {"$group": {
+                "_id": {"user_id": "$user_id", "day": day_expr},
+                "sessions": {"$sum": 1},
+                "correct": {"$sum": {"$cond": ["$correct", 1, 0]}},
+                "points": {"$sum": {"$ifNull": ["$points_earned", 0]}}
+            }}
+        ]):
+            doc = user_doc(row["_id"]["user_id"])
+            doc["study_sessions"] += row["sessions"]
+            doc["study_correct"] += row["correct"]
+            doc["points"] += row["points"]
+            doc["daily"].setdefault(row["_id"]["day"], {}).update(
+                {"sessions": row["sessions"], "correct": row["correct"], "points": row["points"]}
+            )
+        
+        async for row in db.quiz_results.aggregate([
+            before_cutoff,
+            {"$group": {
+                "_id": {"user_id": "$user_id", "day": day_expr},
+                "quizzes": {"$sum": 1},
+                "score": {"$sum": {"$ifNull": ["$score", 0]}},
+                "points": {"$sum": {"$ifNull": ["$points_earned", 0]}}
+            }}
+        ]):
+            doc = user_doc(row["_id"]["user_id"])
+            doc["quiz_count"] += row["quizzes"]
+            doc["quiz_score_sum"] += row["score"]
+            doc["points"] += row["points"]
+            bucket = doc["daily"].setdefault(row["_id"]["day"], {})
+            bucket["quizzes"] = row["quizzes"]
+            bucket["points"] = bucket.get("points", 0) + row["points"]
+        
+        for user_id, doc in stats.items():
+            doc["updated_at"] = datetime.utcnow()
+            await db.user_stats.replace_one({"user_id": user_id}, doc, upsert=True)
+        # Users whose events were all deleted keep no stats document
+        await db.user_stats.delete_many({"updated_at": {"$lt": started_at}})
+        
+        # Send new events straight to user_stats again, then fold in what was diverted
+        await lease.update(cutoff=None)
+        await asyncio.sleep(STATS_REBUILD_SETTLE_SECONDS)
+        merged = await merge_user_stats_deltas()
+    logger.info(f"✅ Rebuilt statistics for {len(stats)} users, merged {merged} users' events recorded meanwhile")
+
+async def bench_class_analytics():
+    """Time the class analytics pipeline on a synthetic dataset in a scratch database"""
+    total_sessions = int(os.environ.get('BENCH_SESSIONS', '1000000'))
+    student_count = int(os.environ.get('BENCH_STUDENTS', '1000'))
+    bench_db = client[f"{DB_NAME}_bench"]
+    await client.drop_database(bench_db.name)
+    
+    await ensure_indexes(bench_db)
+    
+    word_ids = [word["id"] for word in SAMPLE_CONTENT]
+    students = [{
+        "id": f"student-{n}",
+        "email": f"student{n}@bench.local",
+        "first_name": "Student",
+        "last_name": f"{n:05d}",
+        "is_teacher": False,
+        "total_points": 0,
+        "teacher": f"Teacher {n % 10}",
+        "class_name": f"Class {n % 30}",
+        "block_number": f"B{n % 6}",
+        "school": f"School {n % 3}",
+        "grade": f"{6 + n % 3}th Grade"
+    } for n in range(student_count)]
+    await bench_db.users.insert_many(students)
+    
+    now = datetime.utcnow()
+    batch = []
+    for n in range(total_sessions):
+        batch.append({
+            "user_id": f"student-{n % student_count}",
+            "word_id": random.choice(word_ids),
+            "correct": random.random() < 0.7,
+            "timestamp": now - timedelta(minutes=random.randint(0, 60 * 24 * 60)),
+            "points_earned": 10
+        })
+        if len(batch) == 10000:
+            await bench_db.study_sessions.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await bench_db.study_sessions.insert_many(batch, ordered=False)
+    await bench_db.quiz_results.insert_many([{
+        "user_id": f"student-{n % student_count}",
+        "score": random.randint(0, 10),
+        "total_questions": 10,
+        "timestamp": now - timedelta(days=random.randint(0, 60)),
+        "points_earned": 0
+    } for n in range(student_count * 5)])
+    logger.info(f"Seeded {total_sessions} sessions for {student_count} students")
+    
+    for label, filters in [("one class", {"class_name": "Class 0"}), ("one teacher", {"teacher": "Teacher 0"}), ("all students", {})]:
+        started = datetime.utcnow()
+        result = await run_class_analytics(bench_db, "class_name", filters, 7)
+        elapsed = (datetime.utcnow() - started).total_seconds()
+        logger.info(f"⏱️ {label}: {len(result['students'])} students, {len(result['groups'])} groups in {elapsed:.2f}s")
+    
+    await client.drop_database(bench_db.name)
+
+async def bench_search():
+    """Time word search on a synthetic catalog built in memory"""
+    word_count = int(os.environ.get('BENCH_WORDS', '50000'))
+    queries = int(os.environ.get('BENCH_QUERIES', '2000'))
+    rng = random.Random(0)
+    syllables = ["an", "ti", "bi", "o", "ge", "lo", "gy", "pho", "to", "gra", "mi", "cro", "tel", "e", "vis", "port", "struct", "duc", "spec", "scrib"]
+    
+    def made_up_word() -> str:
+        return "".join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+    
+    words = []
+    for n in range(word_count):
+        template = SAMPLE_CONTENT[n % len(SAMPLE_CONTENT)]
+        root = made_up_word()
+        words.append({
+            **template,
+            "id": f"bench-{n}",
+            "root": f"{root}-" if template["type"] == "prefix" else f"-{root}" if template["type"] == "suffix" else root,
+            "examples": [root + made_up_word() for _ in range(3)],
+            "meaning": f"{template['meaning']} {made_up_word()}"
+        })
+    
+    index = SearchIndex()
+    started = time.perf_counter()
+    index.apply(words, [])
+    logger.info(f"Indexed {word_count} words ({len(index.postings)} terms) in {time.perf_counter() - started:.2f}s")
+    
+    samples = {
+        "exact root": [words[rng.randrange(word_count)]["root"] for _ in range(queries)],
+        "prefix": [made_up_word()[:3] for _ in range(queries)],
+        "hyphenated": [f"{made_up_word()}-{made_up_word()}" for _ in range(queries)],
+        "two terms": [f"{made_up_word()} {rng.choice(['against', 'life', 'earth', 'write'])}" for _ in range(queries)]
+    }
+    for label, sample in samples.items():
+        started = time.perf_counter()
+        for query in sample:
+            index.search(query, 20)
+        elapsed = (time.perf_counter() - started) / len(sample)
+        logger.info(f"⏱️ {label}: {elapsed * 1e6:.0f}µs per query")
+
+async def check_indexes():
+    """Fail when a registered hot query is not answered from an index"""
+    problems = await check_hot_queries()
+    for problem in problems:
+        logger.error(f"❌ {problem}")
+    if problems:
+        return 1
+    logger.info(f"✅ All {len(HOT_QUERIES)} hot queries use an index")
+
+async def prune_backups_command():
+    """Apply the backup retention policy once"""
+    await prune_backups()
+
+MANAGEMENT_COMMANDS = {
+    "migrate-images": migrate_inline_images,
+    "rebuild-user-stats": rebuild_user_stats,
+    "bench-class-analytics": bench_class_analytics,
+    "bench-search": bench_search,
+    "ensure-indexes": ensure_indexes,
+    "check-indexes": check_indexes,
+    "prune-backups": prune_backups_command,
+}
+
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
+    import sys
+    if len(sys.argv) > 1:
+        if sys.argv[1] not in MANAGEMENT_COMMANDS:
+            sys.exit(f"Unknown command {sys.argv[1]}. Available: {', '.join(MANAGEMENT_COMMANDS)}")
+        sys.exit(asyncio.run(MANAGEMENT_COMMANDS[sys.argv[1]]()))
+    else:
+        import uvicorn
+        uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
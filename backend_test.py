@@ -1,6 +1,8 @@
 import requests
+import base64
 import unittest
 import uuid
+import time
 from datetime import datetime
 import json
 
@@ -161,15 +163,30 @@ class GreekLatinAPITester:
         }
         return self.run_test("Record Study Session", "POST", "study-session", 200, data, self.student_token)
 
+    def answer_quiz_session(self, score=8, total=10, seed=7):
+        """Start a quiz session and answer `score` of its questions correctly; returns the session path"""
+        success, session = self.run_test("Create Quiz Session", "POST", "quiz/sessions", 200, {"count": total, "seed": seed}, self.student_token)
+        if not success:
+            return None
+        # The same seed generates the same quiz, with its answers
+        success, quiz = self.run_test("Generate Matching Quiz", "POST", "quiz/generate", 200, {"count": total, "seed": seed}, self.student_token)
+        if not success:
+            return None
+        session_path = f"quiz/sessions/{session['session_id']}"
+        for index, question in enumerate(quiz['questions']):
+            choice = question['answer_index'] if index < score else (question['answer_index'] + 1) % len(question['choices'])
+            answer = {"question_id": question['question_id'], "choice_index": choice}
+            success, _ = self.run_test("Answer Quiz Question", "POST", f"{session_path}/answers", 200, answer, self.student_token)
+            if not success:
+                return None
+        return session_path
+
     def record_quiz_result(self, score=8, total=10):
-        """Record a quiz result"""
-        data = {
-            "user_id": self.student_id,
-            "score": score,
-            "total_questions": total,
-            "timestamp": datetime.utcnow().isoformat()
-        }
-        return self.run_test("Record Quiz Result", "POST", "quiz-result", 200, data, self.student_token)
+        """Record a quiz result through a server-scored quiz session"""
+        session_path = self.answer_quiz_session(score, total)
+        if not session_path:
+            return False, {}
+        return self.run_test("Finalize Quiz Session", "POST", f"{session_path}/finalize", 200, token=self.student_token)
 
     def get_admin_users(self):
         """Get all users (admin only) and verify enhanced student profiles"""
@@ -955,11 +972,13 @@ def test_backup_system():
         print("❌ Failed to get updated backups")
         return False
     
+    # A backup of an unchanged catalog reuses the latest snapshot instead of adding one
+    expected_backup_count = initial_backup_count + (create_response.get('status') == 'backup_created')
     updated_backup_count = len(updated_backups)
-    print(f"✅ Found {updated_backup_count} backups (should be {initial_backup_count + 1})")
+    print(f"✅ Found {updated_backup_count} backups (should be {expected_backup_count})")
     
-    if updated_backup_count <= initial_backup_count:
-        print(f"❌ Backup count mismatch: expected at least {initial_backup_count + 1}, got {updated_backup_count}")
+    if updated_backup_count < expected_backup_count:
+        print(f"❌ Backup count mismatch: expected at least {expected_backup_count}, got {updated_backup_count}")
         return False
     
     # Find our new backup in the list
@@ -1644,6 +1663,688 @@ def test_login_code_management():
     print(f"✅ Login code management testing completed successfully")
     return True
 
+def test_words_pagination():
+    """Test the paginated, filterable v2 word listing"""
+    print("\n🔍 Testing Paginated Word Listing...")
+    
+    success, admin_token = test_admin_login_specific()
+    if not success:
+        print("❌ Admin login failed, stopping word pagination test")
+        return False
+    
+    tester = GreekLatinAPITester()
+    
+    # 1. Page through the whole catalog and compare with the legacy listing
+    success, all_words = tester.run_test("Get All Words", "GET", "words", 200, token=admin_token)
+    if not success:
+        return False
+    
+    seen_ids = []
+    cursor = None
+    while True:
+        endpoint = "v2/words?limit=5" + (f"&cursor={cursor}" if cursor else "")
+        success, page = tester.run_test("Get Word Page", "GET", endpoint, 200, token=admin_token)
+        if not success:
+            return False
+        seen_ids.extend(word['id'] for word in page['items'])
+        if not page['has_more']:
+            break
+        cursor = page['next_cursor']
+    
+    if sorted(seen_ids) != sorted(word['id'] for word in all_words):
+        print(f"❌ Pagination returned {len(seen_ids)} words, expected {len(all_words)}")
+        return False
+    print(f"✅ Paged through all {len(seen_ids)} words without gaps or duplicates")
+    
+    # 2. Filters and projection
+    success, page = tester.run_test(
+        "Filter Greek Prefixes", "GET", "v2/words?origin=Greek&type=prefix&fields=root,meaning", 200, token=admin_token
+    )
+    if not success:
+        return False
+    for word in page['items']:
+        if set(word.keys()) != {'id', 'root', 'meaning'}:
+            print(f"❌ Projection returned unexpected fields: {list(word.keys())}")
+            return False
+    print(f"✅ Filtered projection returned {len(page['items'])} Greek prefixes")
+    
+    # 3. Invalid input is rejected
+    success, _ = tester.run_test("Reject Unknown Field", "GET", "v2/words?fields=password", 400, token=admin_token)
+    if not success:
+        return False
+    success, _ = tester.run_test("Reject Bad Cursor", "GET", "v2/words?cursor=not-a-cursor", 400, token=admin_token)
+    return success
+
+def test_conditional_requests():
+    """Test ETag / If-None-Match handling on read-heavy endpoints"""
+    print("\n🔍 Testing Conditional GET Support...")
+    
+    success, admin_token = test_admin_login_specific()
+    if not success:
+        print("❌ Admin login failed, stopping conditional GET test")
+        return False
+    
+    tester = GreekLatinAPITester()
+    headers = {'Authorization': f'Bearer {admin_token}'}
+    
+    for endpoint in ["words", "leaderboard", "admin/users", "admin/login-codes"]:
+        url = f"{tester.base_url}/api/{endpoint}"
+        first = requests.get(url, headers=headers)
+        etag = first.headers.get('ETag')
+        if first.status_code != 200 or not etag:
+            print(f"❌ {endpoint} did not return an ETag (status {first.status_code})")
+            return False
+        
+        second = requests.get(url, headers={**headers, 'If-None-Match': etag})
+        if second.status_code != 304:
+            print(f"❌ {endpoint} returned {second.status_code} for a matching ETag, expected 304")
+            return False
+        print(f"✅ {endpoint} returned 304 Not Modified for ETag {etag}")
+    
+    # A write must change the ETag
+    url = f"{tester.base_url}/api/admin/login-codes"
+    etag = requests.get(url, headers=headers).headers.get('ETag')
+    success, created = tester.run_test(
+        "Create Login Code", "POST", "admin/create-login-code", 200, {"class_name": "ETag Test Class"}, token=admin_token
+    )
+    if not success:
+        return False
+    refreshed = requests.get(url, headers={**headers, 'If-None-Match': etag})
+    tester.run_test("Delete Login Code", "DELETE", f"admin/login-code/{created['login_code']['id']}", 200, token=admin_token)
+    if refreshed.status_code != 200:
+        print(f"❌ Login codes returned {refreshed.status_code} after a write, expected 200")
+        return False
+    
+    print("✅ Conditional GET testing completed successfully")
+    return True
+
+def test_media_storage():
+    """Test that slide images are moved into the content-addressed media store"""
+    print("\n🔍 Testing Slide Image Storage...")
+    
+    success, admin_token = test_admin_login_specific()
+    if not success:
+        print("❌ Admin login failed, stopping media storage test")
+        return False
+    
+    tester = GreekLatinAPITester()
+    
+    # 1x1 transparent PNG
+    png_base64 = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII="
+    slide_data = {
+        "type": "root",
+        "root": "imag",
+        "origin": "Latin",
+        "meaning": "likeness",
+        "examples": ["image", "imagine"],
+        "definition": "A root meaning likeness or copy",
+        "difficulty": "beginner",
+        "points": 10,
+        "category": "test",
+        "image": f"data:image/png;base64,{png_base64}"
+    }
+    success, created = tester.run_test("Create Slide With Image", "POST", "admin/create-word", 200, slide_data, token=admin_token)
+    if not success:
+        return False
+    
+    try:
+        success, words = tester.run_test("Get Words", "GET", "words", 200, token=admin_token)
+        slide = next((word for word in words if word['id'] == created['id']), None)
+        if not slide or not (slide.get('image') or '').startswith('/api/media/'):
+            print(f"❌ Slide image was not stored by URL: {slide and slide.get('image', '')[:40]}")
+            return False
+        print(f"✅ Slide image stored as {slide['image']}")
+        
+        url = f"{tester.base_url}{slide['image']}"
+        full = requests.get(url)
+        if full.status_code != 200 or 'immutable' not in full.headers.get('Cache-Control', ''):
+            print(f"❌ Media fetch failed: {full.status_code} {full.headers.get('Cache-Control')}")
+            return False
+        if full.headers.get('X-Content-Type-Options') != 'nosniff':
+            print("❌ Media response is missing X-Content-Type-Options: nosniff")
+            return False
+        
+        partial = requests.get(url, headers={'Range': 'bytes=0-7'})
+        if partial.status_code != 206 or len(partial.content) != 8 or partial.content != full.content[:8]:
+            print(f"❌ Range request failed: {partial.status_code}, {len(partial.content)} bytes")
+            return False
+        print("✅ Media endpoint serves full and ranged responses")
+        
+        html_base64 = base64.b64encode(b"<script>alert(localStorage.token)</script>").decode()
+        for label, image in (("HTML", f"data:text/html;base64,{html_base64}"), ("Mislabelled HTML", f"data:image/png;base64,{html_base64}")):
+            success, _ = tester.run_test(f"Reject {label} Image", "PUT", f"admin/update-word/{created['id']}", 400, {"image": image}, token=admin_token)
+            if not success:
+                return False
+        print("✅ Non-image uploads are rejected")
+        return True
+    finally:
+        tester.run_test("Delete Slide", "DELETE", f"admin/delete-word/{created['id']}", 200, token=admin_token)
+
+def test_class_analytics():
+    """Test the class analytics dashboard endpoint"""
+    print("\n🔍 Testing Class Analytics...")
+    
+    success, admin_token = test_admin_login_specific()
+    if not success:
+        print("❌ Admin login failed, stopping class analytics test")
+        return False
+    
+    tester = GreekLatinAPITester()
+    
+    # Register a student in a known class and record some activity
+    if not tester.register_student():
+        return False
+    success, words = tester.get_words()
+    if not success or not words:
+        return False
+    for correct in [True, False, False]:
+        tester.record_study_session(words[0]['id'], correct=correct)
+    tester.record_quiz_result(score=7)
+    
+    success, analytics = tester.run_test(
+        "Class Analytics by Teacher", "GET", "admin/analytics/classes?group_by=teacher&teacher=Ms.%20Johnson", 200, token=admin_token
+    )
+    if not success:
+        return False
+    
+    student = next((s for s in analytics['students'] if s['id'] == tester.student_id), None)
+    if not student:
+        print("❌ Registered student missing from class analytics")
+        return False
+    if student['study_sessions'] != 3 or student['total_quizzes'] != 1 or student['accuracy_rate'] != 33.3:
+        print(f"❌ Unexpected student analytics: {student}")
+        return False
+    if not student['weakest_roots'] or student['weakest_roots'][0]['word_id'] != words[0]['id']:
+        print(f"❌ Weakest roots not reported: {student['weakest_roots']}")
+        return False
+    print(f"✅ Student analytics: {student['accuracy_rate']}% accuracy, weakest root {student['weakest_roots'][0]['root']}")
+    
+    group = next((g for g in analytics['groups'] if g['group'] == 'Ms. Johnson'), None)
+    if not group or group['students'] < 1:
+        print(f"❌ Teacher group missing: {analytics['groups']}")
+        return False
+    print(f"✅ Group analytics for {group['group']}: {group['students']} students")
+    
+    success, _ = tester.run_test("Reject Bad Group", "GET", "admin/analytics/classes?group_by=password", 400, token=admin_token)
+    if not success:
+        return False
+    success, _ = tester.run_test("Students Forbidden", "GET", "admin/analytics/classes", 403, token=tester.student_token)
+    return success
+
+def test_study_session_batch():
+    """Test batched study-session ingestion with client event ids"""
+    print("\n🔍 Testing Batched Study Sessions...")
+    
+    tester = GreekLatinAPITester()
+    if not tester.register_student():
+        return False
+    success, words = tester.get_words()
+    if not success or len(words) < 2:
+        return False
+    
+    events = [
+        {"client_event_id": str(uuid.uuid4()), "word_id": words[0]['id'], "correct": True, "timestamp": datetime.utcnow().isoformat()},
+        {"client_event_id": str(uuid.uuid4()), "word_id": words[1]['id'], "correct": False, "timestamp": datetime.utcnow().isoformat()},
+        {"client_event_id": str(uuid.uuid4()), "word_id": "missing-word", "correct": True, "timestamp": datetime.utcnow().isoformat()},
+    ]
+    success, response = tester.run_test(
+        "Record Study Session Batch", "POST", "study-sessions/batch", 200, {"sessions": events}, token=tester.student_token
+    )
+    if not success:
+        return False
+    
+    statuses = [r['status'] for r in response['results']]
+    if statuses != ['recorded', 'recorded', 'error'] or response['points_earned'] != words[0]['points']:
+        print(f"❌ Unexpected batch results: {response}")
+        return False
+    print(f"✅ Batch recorded {response['recorded']} sessions for {response['points_earned']} points")
+    
+    # Retrying the same batch must not double count
+    success, retry = tester.run_test(
+        "Retry Study Session Batch", "POST", "study-sessions/batch", 200, {"sessions": events[:2]}, token=tester.student_token
+    )
+    if not success or retry['duplicates'] != 2 or retry['points_earned'] != 0:
+        print(f"❌ Retried batch was not idempotent: {retry}")
+        return False
+    
+    success, profile = tester.get_user_profile()
+    if not success or profile['total_points'] != words[0]['points']:
+        print(f"❌ Points were double counted: {profile.get('total_points')}")
+        return False
+    print("✅ Retried batch was a no-op")
+    return True
+
+def test_idempotent_events():
+    """Test that retried study sessions and quiz results are not double counted"""
+    print("\n🔍 Testing Idempotent Event Recording...")
+    
+    tester = GreekLatinAPITester()
+    if not tester.register_student():
+        return False
+    success, words = tester.get_words()
+    if not success or not words:
+        return False
+    
+    session = {
+        "user_id": tester.student_id,
+        "word_id": words[0]['id'],
+        "correct": True,
+        "timestamp": datetime.utcnow().isoformat(),
+        "client_event_id": str(uuid.uuid4())
+    }
+    session_path = tester.answer_quiz_session(score=8, total=10)
+    if not session_path:
+        return False
+    
+    for attempt in range(3):
+        success, response = tester.run_test(f"Study Session Attempt {attempt + 1}", "POST", "study-session", 200, session, token=tester.student_token)
+        if not success or response['points_earned'] != words[0]['points']:
+            return False
+        success, response = tester.run_test(f"Quiz Finalize Attempt {attempt + 1}", "POST", f"{session_path}/finalize", 200, token=tester.student_token)
+        if not success or response['points_earned'] != 40:
+            return False
+        if attempt > 0 and response['status'] != 'duplicate':
+            print(f"❌ Retry was not reported as a duplicate: {response}")
+            return False
+    
+    success, profile = tester.get_user_profile()
+    expected_points = words[0]['points'] + 40
+    if not success or profile['total_points'] != expected_points:
+        print(f"❌ Expected {expected_points} points after retries, got {profile.get('total_points')}")
+        return False
+    print(f"✅ Three attempts of each event counted once ({expected_points} points)")
+    return True
+
+def test_leaderboard_scopes():
+    """Test scoped, windowed leaderboards and rank lookups"""
+    print("\n🔍 Testing Leaderboard Scopes...")
+    
+    tester = GreekLatinAPITester()
+    if not tester.register_student():
+        return False
+    success, words = tester.get_words()
+    if not success or not words:
+        return False
+    tester.record_study_session(words[0]['id'], correct=True)
+    
+    for scope in ["global", "school", "teacher", "class", "block"]:
+        if scope == "class":
+            # Students registered without a login code have no class
+            success, _ = tester.run_test("Leaderboard Without Class", "GET", "leaderboard?scope=class", 400, token=tester.student_token)
+            if not success:
+                return False
+            continue
+        success, board = tester.run_test(f"Leaderboard {scope}", "GET", f"leaderboard?scope={scope}&limit=100", 200, token=tester.student_token)
+        if not success:
+            return False
+        ranks = [entry['rank'] for entry in board]
+        if ranks != sorted(ranks):
+            print(f"❌ {scope} leaderboard is not ordered by rank: {ranks}")
+            return False
+    
+    success, week = tester.run_test("Weekly School Leaderboard", "GET", "leaderboard?scope=school&window=week", 200, token=tester.student_token)
+    if not success or not all('window_points' in entry for entry in week):
+        return False
+    
+    success, me = tester.run_test("My Rank", "GET", "leaderboard/me?scope=school&window=week", 200, token=tester.student_token)
+    if not success or me['points'] != words[0]['points'] or me['rank'] < 1:
+        print(f"❌ Unexpected rank: {me}")
+        return False
+    print(f"✅ Rank {me['rank']} of {me['total']} in {me['value']} this week")
+    
+    success, _ = tester.run_test("Reject Bad Scope", "GET", "leaderboard?scope=planet", 400, token=tester.student_token)
+    return success
+
+def test_review_queue():
+    """Test the spaced-repetition review queue and progress endpoints"""
+    print("\n🔍 Testing Spaced Repetition Review Queue...")
+    
+    tester = GreekLatinAPITester()
+    if not tester.register_student():
+        return False
+    
+    # A new student only gets unseen words
+    success, queue = tester.run_test("Initial Review Queue", "GET", "review-queue?limit=5", 200, token=tester.student_token)
+    if not success or queue['due'] != 0 or len(queue['cards']) != 5:
+        print(f"❌ Unexpected initial queue: due={queue.get('due')}, cards={len(queue.get('cards', []))}")
+        return False
+    
+    # A missed word is scheduled for relearning, a known word is pushed out
+    missed, known = queue['cards'][0], queue['cards'][1]
+    tester.record_study_session(missed['id'], correct=False)
+    tester.record_study_session(known['id'], correct=True)
+    
+    success, queue = tester.run_test("Review Queue After Study", "GET", "review-queue?limit=50", 200, token=tester.student_token)
+    if not success:
+        return False
+    queued_ids = [card['id'] for card in queue['cards']]
+    if missed['id'] in queued_ids[:queue['due']] or known['id'] in queued_ids:
+        print(f"❌ Studied cards scheduled incorrectly: {queued_ids[:5]}")
+        return False
+    print(f"✅ Review queue has {queue['due']} due and {queue['new']} new cards")
+    
+    success, progress = tester.run_test("User Progress", "GET", "user/progress", 200, token=tester.student_token)
+    if not success or set(progress['studying_words']) != {missed['id'], known['id']}:
+        print(f"❌ Unexpected progress: {progress}")
+        return False
+    print("✅ Progress lists both studied words")
+    return True
+
+def test_quiz_generation():
+    """Test server-side multiple-choice quiz generation"""
+    print("\n🔍 Testing Quiz Generation...")
+    
+    tester = GreekLatinAPITester()
+    if not tester.register_student():
+        return False
+    success, words = tester.get_words()
+    if not success:
+        return False
+    meanings = {word['id']: word['meaning'] for word in words}
+    
+    success, quiz = tester.run_test("Generate Quiz", "POST", "quiz/generate", 200, {"count": 10, "seed": 1234}, token=tester.student_token)
+    if not success or len(quiz['questions']) != 10:
+        return False
+    for question in quiz['questions']:
+        if len(set(question['choices'])) != 4 or question['choices'][question['answer_index']] != meanings[question['word_id']]:
+            print(f"❌ Malformed question: {question}")
+            return False
+    print(f"✅ Generated {len(quiz['questions'])} questions with 4 distinct choices each")
+    
+    success, again = tester.run_test("Regenerate Seeded Quiz", "POST", "quiz/generate", 200, {"count": 10, "seed": 1234}, token=tester.student_token)
+    if not success or again['questions'] != quiz['questions']:
+        print("❌ The same seed produced a different quiz")
+        return False
+    print("✅ Seeded quiz is reproducible")
+    
+    success, _ = tester.run_test("Reject Empty Pool", "POST", "quiz/generate", 400, {"word_ids": ["missing-word"]}, token=tester.student_token)
+    return success
+
+def test_quiz_sessions():
+    """Test server-scored quiz sessions"""
+    print("\n🔍 Testing Quiz Sessions...")
+    
+    tester = GreekLatinAPITester()
+    if not tester.register_student():
+        return False
+    
+    success, session = tester.run_test("Create Quiz Session", "POST", "quiz/sessions", 200, {"count": 5, "seed": 99}, token=tester.student_token)
+    if not success:
+        return False
+    if any('answer_index' in question for question in session['questions']):
+        print("❌ Quiz session leaked the answers")
+        return False
+    success, quiz = tester.run_test("Generate Matching Quiz", "POST", "quiz/generate", 200, {"count": 5, "seed": 99}, token=tester.student_token)
+    if not success:
+        return False
+    
+    session_path = f"quiz/sessions/{session['session_id']}"
+    for question in quiz['questions'][:3]:
+        answer = {"question_id": question['question_id'], "choice_index": question['answer_index']}
+        success, outcome = tester.run_test("Answer Question", "POST", f"{session_path}/answers", 200, answer, token=tester.student_token)
+        if not success or not outcome['correct']:
+            return False
+    success, _ = tester.run_test("Reject Repeated Answer", "POST", f"{session_path}/answers", 400, {"question_id": 0, "choice_index": 0}, token=tester.student_token)
+    if not success:
+        return False
+    
+    success, result = tester.run_test("Finalize Quiz Session", "POST", f"{session_path}/finalize", 200, token=tester.student_token)
+    if not success or result['score'] != 3 or result['total_questions'] != 5 or result['points_earned'] != 15:
+        print(f"❌ Unexpected quiz result: {result}")
+        return False
+    print(f"✅ Server scored {result['score']}/{result['total_questions']}")
+    
+    success, again = tester.run_test("Finalize Again", "POST", f"{session_path}/finalize", 200, token=tester.student_token)
+    if not success or again['status'] != 'duplicate' or again['points_earned'] != 15:
+        return False
+    
+    # Client-reported scores are no longer accepted
+    reported = {"user_id": tester.student_id, "score": 50, "total_questions": 50, "timestamp": datetime.utcnow().isoformat()}
+    success, _ = tester.run_test("Reject Reported Quiz Score", "POST", "quiz-result", 410, reported, token=tester.student_token)
+    return success
+
+def test_word_search():
+    """Test ranked word search"""
+    print("\n🔍 Testing Word Search...")
+    
+    tester = GreekLatinAPITester()
+    if not tester.register_student():
+        return False
+    
+    expectations = [("anti", "anti-"), ("-ology", "-ology"), ("ology", "-ology"), ("biosphere", "bio-"), ("life", "bio-")]
+    for query, expected_root in expectations:
+        success, response = tester.run_test(f"Search '{query}'", "GET", f"words/search?q={query}", 200, token=tester.student_token)
+        if not success or not response['results']:
+            return False
+        top = response['results'][0]['word']['root']
+        if top != expected_root:
+            print(f"❌ Expected {expected_root} first for '{query}', got {top}")
+            return False
+        print(f"✅ '{query}' -> {top}")
+    
+    success, response = tester.run_test("Filtered Search", "GET", "words/search?q=anti&origin=Latin", 200, token=tester.student_token)
+    return success and all(result['word']['origin'] == 'Latin' for result in response['results'])
+
+def test_word_decomposition():
+    """Test splitting words into catalog morphemes"""
+    print("\n🔍 Testing Word Decomposition...")
+    
+    tester = GreekLatinAPITester()
+    if not tester.register_student():
+        return False
+    
+    words = ["transportation", "biology", "microscope", "xyz"]
+    success, response = tester.run_test("Decompose Words", "POST", "words/decompose", 200, {"words": words, "limit": 3}, token=tester.student_token)
+    if not success:
+        return False
+    results = {result['word']: result['segmentations'] for result in response['results']}
+    
+    expected = {
+        "transportation": ["trans", "port", "a", "tion"],
+        "biology": ["bio", "ology"],
+        "microscope": ["micro", "scope"]
+    }
+    for word, parts in expected.items():
+        best = [segment['text'] for segment in results[word][0]['segments']]
+        if best != parts:
+            print(f"❌ {word}: expected {parts}, got {best}")
+            return False
+        print(f"✅ {word} -> {' + '.join(best)}")
+    if results["xyz"]:
+        print("❌ Expected no segmentation for 'xyz'")
+        return False
+    
+    success, response = tester.run_test("Decompose Batch", "POST", "words/decompose", 200, {"words": ["telephone"] * 2000}, token=tester.student_token)
+    return success and len(response['results']) == 2000
+
+def test_word_import_export():
+    """Test streaming bulk word import and export"""
+    print("\n🔍 Testing Bulk Word Import/Export...")
+    
+    success, admin_token = test_admin_login_specific()
+    if not success:
+        print("❌ Admin login failed, stopping import/export test")
+        return False
+    
+    tester = GreekLatinAPITester()
+    headers = {'Authorization': f'Bearer {admin_token}'}
+    suffix = datetime.now().strftime('%H%M%S')
+    rows = [
+        {"type": "root", "root": f"test-import-{suffix}", "origin": "Latin", "meaning": "imported root",
+         "examples": ["importer"], "definition": "A root loaded by the import test", "difficulty": "beginner",
+         "points": 10, "category": "testing"},
+        {"type": "root", "root": "missing fields"}
+    ]
+    body = "\n".join(json.dumps(row) for row in rows) + "\nnot json\n"
+    response = requests.post(f"{tester.base_url}/api/admin/words/import", data=body,
+                             headers={**headers, 'Content-Type': 'application/x-ndjson'})
+    report = response.json()
+    if response.status_code != 200 or report['inserted'] != 1 or report['failed'] != 2:
+        print(f"❌ Unexpected NDJSON import report: {report}")
+        return False
+    print(f"✅ NDJSON import: {report['inserted']} inserted, {report['failed']} rejected")
+    
+    # Re-importing the same row without an id updates it instead of duplicating it
+    csv_body = "type,root,origin,meaning,examples,definition,difficulty,points,category\n"
+    csv_body += f'root,test-import-{suffix},Latin,"imported, again",importer; imports,Updated by CSV,beginner,15,testing\n'
+    response = requests.post(f"{tester.base_url}/api/admin/words/import", data=csv_body,
+                             headers={**headers, 'Content-Type': 'text/csv'})
+    report = response.json()
+    if response.status_code != 200 or report['updated'] != 1 or report['inserted'] != 0:
+        print(f"❌ Unexpected CSV import report: {report}")
+        return False
+    print("✅ CSV import updated the existing word")
+    
+    response = requests.get(f"{tester.base_url}/api/admin/words/export?format=ndjson", headers=headers)
+    exported = [json.loads(line) for line in response.text.splitlines() if line]
+    imported = [word for word in exported if word['root'] == f"test-import-{suffix}"]
+    if response.status_code != 200 or len(imported) != 1 or imported[0]['examples'] != ["importer", "imports"]:
+        print(f"❌ Export did not contain the imported word: {imported}")
+        return False
+    print(f"✅ Exported {len(exported)} words")
+    
+    success, _ = tester.run_test("Delete Imported Word", "DELETE", f"admin/delete-word/{imported[0]['id']}", 200, token=admin_token)
+    return success
+
+def test_backup_deduplication():
+    """Test that backups of an unchanged catalog are skipped"""
+    print("\n🔍 Testing Backup Deduplication...")
+    
+    success, admin_token = test_admin_login_specific()
+    if not success:
+        print("❌ Admin login failed, stopping backup deduplication test")
+        return False
+    
+    tester = GreekLatinAPITester()
+    success, first = tester.run_test("Create Backup", "POST", "admin/create-backup", 200, token=admin_token)
+    if not success:
+        return False
+    success, second = tester.run_test("Create Unchanged Backup", "POST", "admin/create-backup", 200, token=admin_token)
+    if not success or second['status'] != 'backup_unchanged' or second['collection_name'] != first['collection_name']:
+        print(f"❌ Expected the unchanged catalog to reuse {first['collection_name']}, got {second}")
+        return False
+    print(f"✅ Unchanged catalog reused backup {second['collection_name']}")
+    
+    success, restore = tester.run_test("Restore Snapshot", "POST", "admin/restore-backup", 200,
+                                       {"collection_name": first['collection_name']}, token=admin_token)
+    return success and restore['word_count'] == first['word_count']
+
+def test_readiness():
+    """Test the warm-up readiness report"""
+    print("\n🔍 Testing Readiness Endpoint...")
+    
+    tester = GreekLatinAPITester()
+    success, report = tester.run_test("Readiness", "GET", "ready", 200)
+    if not success:
+        return False
+    for phase in ["database", "seed", "indexes", "catalog", "leaderboard", "admin"]:
+        if report['phases'].get(phase, {}).get('status') != 'done':
+            print(f"❌ Startup phase {phase} not done: {report['phases'].get(phase)}")
+            return False
+    timings = ", ".join(f"{name} {phase['seconds']}s" for name, phase in report['phases'].items())
+    print(f"✅ Ready after warm-up ({timings})")
+    return report['ready']
+
+def test_restore_job():
+    """Test restoring a backup as a background job with status polling"""
+    print("\n🔍 Testing Restore Job Status...")
+    
+    success, admin_token = test_admin_login_specific()
+    if not success:
+        print("❌ Admin login failed, stopping restore job test")
+        return False
+    
+    tester = GreekLatinAPITester()
+    success, backup = tester.run_test("Create Backup", "POST", "admin/create-backup", 200, token=admin_token)
+    if not success:
+        return False
+    success, queued = tester.run_test("Queue Restore", "POST", "admin/restore-backup", 202,
+                                      {"collection_name": backup['collection_name'], "wait": False}, token=admin_token)
+    if not success:
+        return False
+    
+    job = {}
+    for _ in range(30):
+        success, job = tester.run_test("Poll Restore Job", "GET", f"admin/jobs/{queued['job_id']}", 200, token=admin_token)
+        if not success or job['status'] in ('completed', 'failed'):
+            break
+        time.sleep(1)
+    if job.get('status') != 'completed' or job['progress']['fraction'] != 1.0:
+        print(f"❌ Restore job did not complete: {job}")
+        return False
+    print(f"✅ Restore job restored {job['result']['word_count']} words")
+    
+    success, words = tester.run_test("Get Words After Restore", "GET", "words", 200, token=admin_token)
+    return success and len(words) == backup['word_count']
+
+def test_backup_retention():
+    """Test backup listing order and the retention dry run"""
+    print("\n🔍 Testing Backup Retention...")
+    
+    success, admin_token = test_admin_login_specific()
+    if not success:
+        print("❌ Admin login failed, stopping backup retention test")
+        return False
+    
+    tester = GreekLatinAPITester()
+    success, backups = tester.run_test("List Backups", "GET", "admin/backups", 200, token=admin_token)
+    if not success:
+        return False
+    timestamps = [backup['timestamp'] for backup in backups]
+    if timestamps != sorted(timestamps, reverse=True):
+        print("❌ Backups are not listed newest first")
+        return False
+    
+    success, report = tester.run_test("Retention Dry Run", "POST", "admin/backups/prune?dry_run=true", 200, token=admin_token)
+    if not success or report['kept'] + len(report['pruned']) != len(backups):
+        print(f"❌ Retention report does not cover every backup: {report}")
+        return False
+    print(f"✅ Retention would keep {report['kept']} and prune {len(report['pruned'])} of {len(backups)} backups")
+    
+    success, after = tester.run_test("List Backups After Dry Run", "GET", "admin/backups", 200, token=admin_token)
+    return success and len(after) == len(backups)
+
+def test_admin_jobs():
+    """Test submitting, polling, streaming and cancelling admin jobs"""
+    print("\n🔍 Testing Admin Jobs...")
+    
+    success, admin_token = test_admin_login_specific()
+    if not success:
+        print("❌ Admin login failed, stopping admin jobs test")
+        return False
+    
+    tester = GreekLatinAPITester()
+    success, job = tester.run_test("Submit Prune Job", "POST", "admin/jobs", 202,
+                                   {"type": "prune-backups", "params": {"dry_run": True}}, token=admin_token)
+    if not success:
+        return False
+    
+    # The event stream ends with the finished job
+    url = f"{tester.base_url}/api/admin/jobs/{job['job_id']}/events"
+    response = requests.get(url, headers={'Authorization': f'Bearer {admin_token}'}, stream=True, timeout=60)
+    events = [line for line in response.iter_lines(decode_unicode=True) if line.startswith('event:')]
+    if not events or events[-1] != 'event: end':
+        print(f"❌ Event stream did not end with the finished job: {events}")
+        return False
+    print(f"✅ Received {len(events)} job events")
+    
+    success, finished = tester.run_test("Get Finished Job", "GET", f"admin/jobs/{job['job_id']}", 200, token=admin_token)
+    if not success or finished['status'] != 'completed' or not finished['result'].get('dry_run'):
+        print(f"❌ Prune job did not complete: {finished}")
+        return False
+    print(f"✅ Dry run would keep {finished['result']['kept']} backups")
+    
+    success, _ = tester.run_test("Cancel Finished Job", "POST", f"admin/jobs/{job['job_id']}/cancel", 400, token=admin_token)
+    if not success:
+        return False
+    for job_type in ["restore", "rebuild-user-stats"]:
+        success, _ = tester.run_test(f"Reject {job_type} Job", "POST", "admin/jobs", 400, {"type": job_type}, token=admin_token)
+        if not success:
+            return False
+    
+    success, jobs = tester.run_test("List Jobs", "GET", "admin/jobs?type=prune-backups", 200, token=admin_token)
+    return success and any(listed['job_id'] == job['job_id'] for listed in jobs)
+
 def main():
     # Run login code management test
     login_code_management_success = test_login_code_management()
@@ -1663,13 +2364,85 @@ def main():
     # Run student management test
     student_management_success = test_student_management()
     
+    # Run paginated word listing test
+    words_pagination_success = test_words_pagination()
+    
+    # Run conditional GET test
+    conditional_requests_success = test_conditional_requests()
+    
+    # Run slide image storage test
+    media_storage_success = test_media_storage()
+    
+    # Run class analytics test
+    class_analytics_success = test_class_analytics()
+    
+    # Run batched study session test
+    study_session_batch_success = test_study_session_batch()
+    
+    # Run idempotent event recording test
+    idempotent_events_success = test_idempotent_events()
+    
+    # Run leaderboard scopes test
+    leaderboard_scopes_success = test_leaderboard_scopes()
+    
+    # Run spaced repetition review queue test
+    review_queue_success = test_review_queue()
+    
+    # Run server-side quiz generation test
+    quiz_generation_success = test_quiz_generation()
+    
+    # Run server-scored quiz session test
+    quiz_sessions_success = test_quiz_sessions()
+    
+    # Run word search test
+    word_search_success = test_word_search()
+    
+    # Run word decomposition test
+    word_decomposition_success = test_word_decomposition()
+    
+    # Run bulk word import/export test
+    word_import_export_success = test_word_import_export()
+    
+    # Run backup deduplication test
+    backup_deduplication_success = test_backup_deduplication()
+    
+    # Run readiness endpoint test
+    readiness_success = test_readiness()
+    
+    # Run background restore job test
+    restore_job_success = test_restore_job()
+    
+    # Run backup retention test
+    backup_retention_success = test_backup_retention()
+    
+    # Run admin job framework test
+    admin_jobs_success = test_admin_jobs()
+    
     # Run all other tests
     tester = GreekLatinAPITester()
     all_tests_success = tester.run_all_tests()
     
     return 0 if (login_code_management_success and admin_test_success and backup_system_success and 
                 slide_management_success and slide_test_success and 
-                student_management_success and all_tests_success) else 1
+                student_management_success and words_pagination_success
+                and conditional_requests_success
+                and media_storage_success
+                and class_analytics_success
+                and study_session_batch_success
+                and idempotent_events_success
+                and leaderboard_scopes_success
+                and review_queue_success
+                and quiz_generation_success
+                and quiz_sessions_success
+                and word_search_success
+                and word_decomposition_success
+                and word_import_export_success
+                and backup_deduplication_success
+                and readiness_success
+                and restore_job_success
+                and backup_retention_success
+                and admin_jobs_success
+                and all_tests_success) else 1
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
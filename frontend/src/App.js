@@ -4,6 +4,27 @@ import './App.css';
 
 const API_BASE_URL = process.env.REACT_APP_BACKEND_URL || import.meta.env.REACT_APP_BACKEND_URL;
 
+// Slide images are stored by the backend and served from /api/media
+const mediaSrc = (src) => (src && src.startsWith('/api/') ? `${API_BASE_URL}${src}` : src);
+// Cards render at max-w-xs, so the 640px variant covers 2x displays
+const slideImageSrc = (word) => mediaSrc(word?.image_variants?.['640w']?.webp || word?.image);
+
+// Post a study/quiz event, retrying dropped requests; the shared client_event_id
+// lets the backend ignore retries that already reached it
+const postEvent = async (url, payload, attempts = 3) => {
+  const event = { ...payload, client_event_id: crypto.randomUUID() };
+  for (let attempt = 1; ; attempt++) {
+    try {
+      return await axios.post(url, event);
+    } catch (error) {
+      const status = error.response?.status;
+      const retryable = !status || status >= 500 || status === 429;
+      if (!retryable || attempt >= attempts) throw error;
+      await new Promise((resolve) => setTimeout(resolve, 500 * attempt));
+    }
+  }
+};
+
 // Greek and Latin Academy Logo Component
 const AcademyLogo = () => (
   <div className="flex flex-col items-center mb-8">
@@ -172,6 +193,61 @@ const MultipleChoice = ({ currentWord, onAnswer }) => {
   );
 };
 
+// Quiz question from a server quiz session; the server says which choice was right
+const QuizQuestion = ({ question, onAnswer }) => {
+  const [selectedIndex, setSelectedIndex] = useState(null);
+  const [correctIndex, setCorrectIndex] = useState(null);
+
+  useEffect(() => {
+    setSelectedIndex(null);
+    setCorrectIndex(null);
+  }, [question]);
+
+  const handleChoiceClick = async (index) => {
+    setSelectedIndex(index);
+    const outcome = await onAnswer(index);
+    if (outcome) setCorrectIndex(outcome.correct_index);
+  };
+
+  return (
+    <div className="space-y-4">
+      <h3 className="text-xl font-semibold text-navy-800 mb-4">
+        {question.prompt}
+      </h3>
+      <div className="space-y-3">
+        {question.choices.map((choice, index) => (
+          <button
+            key={index}
+            onClick={() => handleChoiceClick(index)}
+            disabled={selectedIndex !== null}
+            className={`w-full p-4 text-left rounded-lg border-2 transition-all ${
+              correctIndex === null
+                ? selectedIndex === index
+                  ? 'border-gold-400 bg-gold-50'
+                  : 'border-gray-300 hover:border-gold-400 hover:bg-gold-50'
+                : index === correctIndex
+                ? 'border-green-500 bg-green-100 text-green-800'
+                : index === selectedIndex
+                ? 'border-red-500 bg-red-100 text-red-800'
+                : 'border-gray-300 bg-gray-50'
+            }`}
+          >
+            <div className="flex items-center justify-between">
+              <span className="font-medium">{choice}</span>
+              {correctIndex === index && (
+                <span className="text-green-600">✓</span>
+              )}
+              {correctIndex !== null && selectedIndex === index && index !== correctIndex && (
+                <span className="text-red-600">✗</span>
+              )}
+            </div>
+          </button>
+        ))}
+      </div>
+    </div>
+  );
+};
+
 // Slide Creator Component
 const SlideCreator = ({ onSave, onCancel, editingSlide = null }) => {
   const [slideData, setSlideData] = useState({
@@ -342,14 +418,14 @@ const SlideCreator = ({ onSave, onCancel, editingSlide = null }) => {
             <label className="block text-sm font-medium text-navy-700 mb-2">Upload Image</label>
             <input
               type="file"
-              accept="image/*"
+              accept="image/png,image/jpeg,image/gif,image/webp"
               onChange={handleImageUpload}
               className="w-full p-3 border border-gray-300 rounded-lg focus:ring-2 focus:ring-gold-500"
             />
             {slideData.image && (
               <div className="mt-2">
                 <img 
-                  src={slideData.image} 
+                  src={mediaSrc(slideData.image)} 
                   alt="Preview" 
                   className="w-32 h-32 object-cover rounded-lg border"
                 />
@@ -395,7 +471,8 @@ const BackupManager = ({ backups, onCreateBackup, onRestoreBackup, onCancel }) =
       <div className="mb-6 p-4 bg-blue-50 rounded-lg border border-blue-200">
         <h3 className="font-semibold text-blue-800 mb-2">📋 About Backups</h3>
         <ul className="text-sm text-blue-700 space-y-1">
-          <li>• Automatic backups are created every time the system starts</li>
+          <li>• Automatic backups are created when the system starts if word cards changed</li>
+          <li>• Older backups are thinned out automatically: one per day is kept for a month, then one per week</li>
           <li>• Manual backups preserve your current word cards with a timestamp</li>
           <li>• Restoring a backup will replace all current word cards</li>
           <li>• A safety backup is automatically created before any restoration</li>
@@ -603,6 +680,7 @@ function App() {
   const [showAnswer, setShowAnswer] = useState(false);
   const [useMultipleChoice, setUseMultipleChoice] = useState(true);
   const [quizMode, setQuizMode] = useState(false);
+  const [quizSession, setQuizSession] = useState(null);
   const [quizScore, setQuizScore] = useState(0);
   const [quizQuestion, setQuizQuestion] = useState(0);
   const [adminUsers, setAdminUsers] = useState([]);
@@ -752,7 +830,7 @@ function App() {
     if (!user || !currentWords[currentWordIndex]) return;
     
     try {
-      const response = await axios.post(`${API_BASE_URL}/api/study-session`, {
+      const response = await postEvent(`${API_BASE_URL}/api/study-session`, {
         user_id: user.id,
         word_id: currentWords[currentWordIndex].id,
         correct: correct,
@@ -770,39 +848,62 @@ function App() {
     }
   };
 
-  const startQuiz = () => {
-    setQuizMode(true);
-    setQuizScore(0);
-    setQuizQuestion(0);
+  // Quizzes are generated and scored by the server; only the chosen answers are sent
+  const startQuiz = async () => {
     const currentWords = getCurrentWords();
-    setCurrentWordIndex(Math.floor(Math.random() * currentWords.length));
-    setShowAnswer(false);
-  };
-
-  const answerQuiz = (correct) => {
-    if (correct) setQuizScore(prev => prev + 1);
+    const sessionRequest = { count: 10 };
+    if (selectedStudySet !== 'all') {
+      sessionRequest.word_ids = currentWords.map((word) => word.id);
+    }
     
-    if (quizQuestion < 9) {
-      setQuizQuestion(prev => prev + 1);
-      const currentWords = getCurrentWords();
-      setCurrentWordIndex(Math.floor(Math.random() * currentWords.length));
+    try {
+      const response = await axios.post(`${API_BASE_URL}/api/quiz/sessions`, sessionRequest);
+      setQuizSession(response.data);
+      setQuizScore(0);
+      setQuizQuestion(0);
+      setQuizMode(true);
       setShowAnswer(false);
-    } else {
-      recordQuizResult();
-      setQuizMode(false);
+    } catch (error) {
+      alert('Failed to start quiz: ' + (error.response?.data?.detail || 'Unknown error'));
+    }
+  };
+
+  const exitQuiz = () => {
+    setQuizMode(false);
+    setQuizSession(null);
+  };
+
+  const answerQuiz = async (choiceIndex) => {
+    const question = quizSession.questions[quizQuestion];
+    let outcome = null;
+    try {
+      const response = await axios.post(
+        `${API_BASE_URL}/api/quiz/sessions/${quizSession.session_id}/answers`,
+        { question_id: question.question_id, choice_index: choiceIndex }
+      );
+      outcome = response.data;
+      setQuizScore(outcome.score);
+    } catch (error) {
+      console.error('Failed to record quiz answer:', error);
     }
+    
+    // Leave the marked answer on screen for a moment
+    setTimeout(() => {
+      if (quizQuestion < quizSession.questions.length - 1) {
+        setQuizQuestion((prev) => prev + 1);
+      } else {
+        finalizeQuiz();
+      }
+    }, 1000);
+    return outcome;
   };
 
-  const recordQuizResult = async () => {
-    if (!user) return;
+  const finalizeQuiz = async () => {
+    const session = quizSession;
+    exitQuiz();
     
     try {
-      const response = await axios.post(`${API_BASE_URL}/api/quiz-result`, {
-        user_id: user.id,
-        score: quizScore,
-        total_questions: 10,
-        timestamp: new Date().toISOString()
-      });
+      const response = await postEvent(`${API_BASE_URL}/api/quiz/sessions/${session.session_id}/finalize`, {});
       
       if (response.data.points_earned > 0) {
         setUserProfile(prev => ({
@@ -811,7 +912,7 @@ function App() {
         }));
       }
       
-      alert(`🎉 Quiz Completed!\nScore: ${quizScore}/10\nPoints Earned: ${response.data.points_earned}`);
+      alert(`🎉 Quiz Completed!\nScore: ${response.data.score}/${response.data.total_questions}\nPoints Earned: ${response.data.points_earned}`);
     } catch (error) {
       console.error('Failed to record quiz result:', error);
     }
@@ -936,7 +1037,11 @@ function App() {
   const createBackup = async () => {
     try {
       const response = await axios.post(`${API_BASE_URL}/api/admin/create-backup`);
-      alert(`✅ Backup Created Successfully!\n\nWord Count: ${response.data.word_count}\nTimestamp: ${response.data.timestamp}`);
+      if (response.data.status === 'backup_unchanged') {
+        alert(`✅ No changes since the last backup.\n\nLatest Backup: ${response.data.collection_name}\nWord Count: ${response.data.word_count}`);
+      } else {
+        alert(`✅ Backup Created Successfully!\n\nWord Count: ${response.data.word_count}\nTimestamp: ${response.data.timestamp}`);
+      }
       loadBackups(); // Refresh backup list
     } catch (error) {
       alert('Failed to create backup: ' + (error.response?.data?.detail || 'Unknown error'));
@@ -2491,7 +2596,7 @@ function App() {
             {currentWord?.image && (
               <div className="mt-6">
                 <img 
-                  src={currentWord.image} 
+                  src={slideImageSrc(currentWord)} 
                   alt="Visual aid" 
                   className="max-w-xs mx-auto rounded-lg shadow-lg"
                 />
@@ -2554,7 +2659,10 @@ function App() {
       setCurrentWordIndex(0);
     }
     
-    const currentWord = currentWords[currentWordIndex];
+    const quizItem = quizMode && quizSession ? quizSession.questions[quizQuestion] : null;
+    const currentWord = quizItem
+      ? (words.find((word) => word.id === quizItem.word_id) || quizItem)
+      : currentWords[currentWordIndex];
     
     return (
       <div className="min-h-screen bg-gradient-to-br from-navy-900 via-navy-800 to-navy-700">
@@ -2574,7 +2682,7 @@ function App() {
               </div>
               {quizMode && (
                 <div className="text-sm text-orange-600 font-medium">
-                  Quiz Mode - Question {quizQuestion + 1}/10 (Score: {quizScore})
+                  Quiz Mode - Question {quizQuestion + 1}/{quizSession.questions.length} (Score: {quizScore})
                 </div>
               )}
             </div>
@@ -2601,7 +2709,7 @@ function App() {
               )}
               {quizMode && (
                 <button
-                  onClick={() => setQuizMode(false)}
+                  onClick={exitQuiz}
                   className="px-4 py-2 bg-gray-500 text-white rounded-lg hover:bg-gray-600 transition-colors"
                 >
                   Exit Quiz
@@ -2635,9 +2743,14 @@ function App() {
               {currentWord?.root || 'Loading...'}
             </div>
             
-            {showAnswer ? (
-              useMultipleChoice && !quizMode ? (
-                <MultipleChoice 
+            {quizItem ? (
+              <QuizQuestion
+                question={quizItem}
+                onAnswer={answerQuiz}
+              />
+            ) : showAnswer ? (
+              useMultipleChoice ? (
+                <MultipleChoice
                   currentWord={currentWord}
                   onAnswer={(correct) => {
                     recordStudySession(correct);
@@ -2668,7 +2781,7 @@ function App() {
                   {currentWord?.image && (
                     <div className="mt-4">
                       <img 
-                        src={currentWord.image} 
+                        src={slideImageSrc(currentWord)} 
                         alt="Visual aid" 
                         className="max-w-xs mx-auto rounded-lg shadow-lg"
                       />
@@ -2677,29 +2790,22 @@ function App() {
                 </div>
               )
             ) : (
-              quizMode && useMultipleChoice ? (
-                <MultipleChoice 
-                  currentWord={currentWord}
-                  onAnswer={answerQuiz}
-                />
-              ) : (
-                <div className="space-y-6">
-                  <div className="text-xl text-gray-500 mb-8">
-                    {quizMode ? "What does this mean?" : "Click 'Show Answer' to reveal the meaning"}
-                  </div>
-                  <button
-                    onClick={() => setShowAnswer(true)}
-                    className="px-12 py-4 bg-gradient-to-r from-gold-500 to-gold-600 text-navy-900 rounded-full font-semibold hover:from-gold-600 hover:to-gold-700 transition-all transform hover:scale-105 shadow-lg text-lg"
-                  >
-                    👁️ Show Answer
-                  </button>
+              <div className="space-y-6">
+                <div className="text-xl text-gray-500 mb-8">
+                  Click 'Show Answer' to reveal the meaning
                 </div>
-              )
+                <button
+                  onClick={() => setShowAnswer(true)}
+                  className="px-12 py-4 bg-gradient-to-r from-gold-500 to-gold-600 text-navy-900 rounded-full font-semibold hover:from-gold-600 hover:to-gold-700 transition-all transform hover:scale-105 shadow-lg text-lg"
+                >
+                  👁️ Show Answer
+                </button>
+              </div>
             )}
           </div>
 
           {/* Navigation Controls */}
-          <div className="flex justify-between items-center">
+          <div className={`flex justify-between items-center ${quizMode ? 'invisible' : ''}`}>
             <button
               onClick={prevCard}
               className="flex items-center space-x-2 px-8 py-4 bg-white text-navy-700 rounded-xl shadow-lg hover:shadow-xl transition-all hover:scale-105 font-medium"
@@ -2710,37 +2816,18 @@ function App() {
 
             {showAnswer && !useMultipleChoice && (
               <div className="flex space-x-4">
-                {quizMode ? (
-                  <>
-                    <button
-                      onClick={() => answerQuiz(false)}
-                      className="px-8 py-4 bg-red-500 text-white rounded-xl hover:bg-red-600 transition-colors font-medium"
-                    >
-                      ❌ Incorrect
-                    </button>
-                    <button
-                      onClick={() => answerQuiz(true)}
-                      className="px-8 py-4 bg-green-500 text-white rounded-xl hover:bg-green-600 transition-colors font-medium"
-                    >
-                      ✅ Correct
-                    </button>
-                  </>
-                ) : (
-                  <>
-                    <button
-                      onClick={() => { recordStudySession(false); nextCard(); }}
-                      className="px-8 py-4 bg-red-500 text-white rounded-xl hover:bg-red-600 transition-colors font-medium"
-                    >
-                      😵 Too Hard
-                    </button>
-                    <button
-                      onClick={() => { recordStudySession(true); nextCard(); }}
-                      className="px-8 py-4 bg-green-500 text-white rounded-xl hover:bg-green-600 transition-colors font-medium"
-                    >
-                      😊 Got It!
-                    </button>
-                  </>
-                )}
+                <button
+                  onClick={() => { recordStudySession(false); nextCard(); }}
+                  className="px-8 py-4 bg-red-500 text-white rounded-xl hover:bg-red-600 transition-colors font-medium"
+                >
+                  😵 Too Hard
+                </button>
+                <button
+                  onClick={() => { recordStudySession(true); nextCard(); }}
+                  className="px-8 py-4 bg-green-500 text-white rounded-xl hover:bg-green-600 transition-colors font-medium"
+                >
+                  😊 Got It!
+                </button>
               </div>
             )}
 
@@ -0,0 +1,137 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import server
+
+
+class FakeCollection:
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+        self.writes = []
+
+    def find(self, query=None, projection=None):
+        async def cursor():
+            for doc in self.docs:
+                if all(doc.get(field) == value for field, value in (query or {}).items() if not isinstance(value, dict)):
+                    yield doc
+        return cursor()
+
+    async def count_documents(self, query):
+        return len(self.docs)
+
+    async def insert_one(self, doc):
+        self.writes.append(("insert_one", doc))
+
+    async def update_many(self, query, update):
+        self.writes.append(("update_many", query, update))
+
+    async def insert_many(self, docs, ordered=True):
+        self.writes.append(("insert_many", docs))
+
+
+class FakeDB:
+    def __init__(self, collections):
+        self.collections = collections
+
+    def __getattr__(self, name):
+        return self.collections.setdefault(name, FakeCollection())
+
+    __getitem__ = __getattr__
+
+    async def list_collection_names(self):
+        return list(self.collections)
+
+
+def test_dry_run_reports_legacy_backups_without_registering_them(monkeypatch):
+    now = datetime.utcnow()
+    fake_db = FakeDB({
+        "word_snapshots": FakeCollection([
+            {"_id": f"words_backup_{n}", "kind": "manual", "status": "complete", "created_at": now - timedelta(hours=n)}
+            for n in range(3)
+        ]),
+        "words_backup_20200101_000000": FakeCollection([{"id": "w1"}]),
+    })
+    monkeypatch.setattr(server, "db", fake_db)
+
+    report = asyncio.run(server.prune_backups(dry_run=True))
+    assert report["registered"] == 1 and report["dry_run"]
+    assert report["kept"] == 4 and report["pruned"] == []
+    assert fake_db.word_snapshots.writes == []
+
+
+def test_reused_blobs_are_touched_before_they_are_looked_up(monkeypatch):
+    fake_db = FakeDB({"word_blobs": FakeCollection([{"_id": "known"}])})
+    monkeypatch.setattr(server, "db", fake_db)
+
+    new = asyncio.run(server.store_word_blobs({"known": {"id": "w1"}, "fresh": {"id": "w2"}}))
+    assert new == 1
+    touch, insert = fake_db.word_blobs.writes
+    assert touch[0] == "update_many" and touch[1] == {"_id": {"$in": ["known", "fresh"]}}
+    assert [blob["_id"] for blob in insert[1]] == ["fresh"]
+    assert insert[1][0]["last_used"] == insert[1][0]["created_at"]
+
+
+
+def test_unchanged_catalog_stores_no_blobs(monkeypatch):
+    fake_db = FakeDB({"words": FakeCollection([{"id": "w1", "word": "λόγος"}, {"id": "w2", "word": "amor"}])})
+    monkeypatch.setattr(server, "db", fake_db)
+    _, catalog_hash, _ = asyncio.run(server.collect_manifest(fake_db.words, store=False))
+
+    async def latest():
+        return {"_id": "words_backup_1", "status": "complete", "catalog_hash": catalog_hash}
+    monkeypatch.setattr(server, "latest_word_snapshot", latest)
+
+    snapshot = asyncio.run(server.create_word_snapshot(kind="startup"))
+    assert snapshot["_id"] == "words_backup_1" and not snapshot["created"]
+    assert fake_db.word_blobs.writes == [] and fake_db.word_snapshots.writes == []
+
+
+def snapshots_at(*times):
+    return [{"_id": created_at.strftime("%Y%m%d_%H%M"), "created_at": created_at} for created_at in times]
+
+
+def retention(monkeypatch, keep_last, daily_days, weekly_weeks):
+    monkeypatch.setattr(server, "BACKUP_KEEP_LAST", keep_last)
+    monkeypatch.setattr(server, "BACKUP_KEEP_DAILY_DAYS", daily_days)
+    monkeypatch.setattr(server, "BACKUP_KEEP_WEEKLY_WEEKS", weekly_weeks)
+
+
+def test_keeps_latest_then_one_per_day(monkeypatch):
+    retention(monkeypatch, keep_last=2, daily_days=3, weekly_weeks=0)
+    now = datetime(2024, 1, 10, 12, 0)
+    snapshots = snapshots_at(
+        now - timedelta(hours=1), now - timedelta(hours=2), now - timedelta(hours=3),
+        datetime(2024, 1, 9, 18, 0), datetime(2024, 1, 9, 8, 0),
+        datetime(2024, 1, 8, 9, 0),
+    )
+    # The two newest also stand for their day, so the third of Jan 10 goes
+    assert server.select_backups_to_keep(snapshots, now) == {"20240110_1100", "20240110_1000", "20240109_1800", "20240108_0900"}
+
+
+def test_weekly_backups_follow_iso_weeks_across_the_year_boundary(monkeypatch):
+    retention(monkeypatch, keep_last=0, daily_days=1, weekly_weeks=4)
+    now = datetime(2025, 1, 20, 12, 0)
+    snapshots = snapshots_at(
+        datetime(2025, 1, 2, 9, 0),    # ISO 2025-W01
+        datetime(2024, 12, 30, 9, 0),  # Monday of ISO 2025-W01, in calendar 2024
+        datetime(2024, 12, 29, 9, 0),  # Sunday of ISO 2024-W52
+        datetime(2024, 12, 28, 9, 0),  # also 2024-W52
+        datetime(2024, 12, 1, 9, 0),   # beyond the weekly window
+    )
+    assert server.select_backups_to_keep(snapshots, now) == {"20250102_0900", "20241229_0900"}
+
+
+def test_zero_weekly_weeks_keeps_weekly_backups_forever(monkeypatch):
+    retention(monkeypatch, keep_last=1, daily_days=1, weekly_weeks=0)
+    now = datetime(2024, 6, 1)
+    snapshots = snapshots_at(now - timedelta(hours=1), datetime(2020, 1, 1), datetime(2020, 1, 2), datetime(2019, 12, 30))
+    # 2019-12-30 opens ISO 2020-W01, the same week as Jan 1 and 2
+    assert server.select_backups_to_keep(snapshots, now) == {"20240531_2300", "20200102_0000"}
+
+
+def test_result_does_not_depend_on_input_order(monkeypatch):
+    retention(monkeypatch, keep_last=1, daily_days=0, weekly_weeks=0)
+    now = datetime(2024, 1, 10)
+    assert server.select_backups_to_keep([], now) == set()
+    snapshots = snapshots_at(datetime(2024, 1, 1), datetime(2024, 1, 9))
+    assert server.select_backups_to_keep(snapshots, now) == server.select_backups_to_keep(snapshots[::-1], now) == {"20240109_0000", "20240101_0000"}
@@ -0,0 +1,83 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import server
+
+STUDENTS = 2000
+WORDS_PER_STUDENT = 200
+MAX_BSON_DOCUMENT = 16 * 1024 * 1024
+
+
+class FakeUsers:
+    """Yields the documents the pipeline would emit, one per student"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.pipeline = None
+
+    def aggregate(self, pipeline, allowDiskUse=False):
+        self.pipeline = pipeline
+
+        async def cursor():
+            for doc in self.docs:
+                yield doc
+        return cursor()
+
+
+def student_doc(n):
+    # Word w0 is answered wrong by everyone, so it is every group's weakest root
+    word_stats = [{"word_id": f"w{w}", "attempts": 3, "correct": 0 if w == 0 else 3} for w in range(WORDS_PER_STUDENT)]
+    return {
+        "id": f"s{n}", "first_name": "Student", "last_name": f"{n:05d}", "total_points": 0,
+        "class_name": f"Class {n % 4}", "block_number": n % 3 or None,
+        "word_stats": word_stats,
+        "study_sessions": 3 * WORDS_PER_STUDENT, "correct": 3 * (WORDS_PER_STUDENT - 1), "recent": 1,
+        "quizzes": 2, "quiz_score": 14,
+    }
+
+
+@pytest.fixture(autouse=True)
+def empty_catalog(monkeypatch):
+    monkeypatch.setattr(server, "word_catalog", SimpleNamespace(get=lambda word_id: None))
+
+
+def test_school_wide_analytics_stream_one_document_per_student():
+    docs = [student_doc(n) for n in range(STUDENTS)]
+    # Collected into one $facet document, the per-word stats alone would pass the 16MB cap
+    assert len(json.dumps([doc["word_stats"] for doc in docs])) > MAX_BSON_DOCUMENT
+
+    users = FakeUsers(docs)
+    result = asyncio.run(server.run_class_analytics(SimpleNamespace(users=users), "class_name", {}, 7))
+
+    stages = [next(iter(stage)) for stage in users.pipeline]
+    assert "$facet" not in stages and "$group" not in stages
+    assert max(len(json.dumps(doc)) for doc in docs) < MAX_BSON_DOCUMENT // 100
+
+    assert len(result["students"]) == STUDENTS
+    assert [group["group"] for group in result["groups"]] == ["Class 0", "Class 1", "Class 2", "Class 3"]
+    group = result["groups"][0]
+    assert group["students"] == STUDENTS // 4
+    assert group["study_sessions"] == STUDENTS // 4 * 3 * WORDS_PER_STUDENT
+    assert group["average_quiz_score"] == 7.0
+    assert group["weakest_roots"][0] == {"word_id": "w0", "root": "w0", "attempts": 3 * STUDENTS // 4, "accuracy_rate": 0.0}
+    assert result["students"][0]["weakest_roots"][0]["word_id"] == "w0"
+
+
+def test_groups_sort_like_mongo_with_missing_values_first():
+    docs = [student_doc(n) for n in range(6)]
+    result = asyncio.run(server.run_class_analytics(SimpleNamespace(users=FakeUsers(docs)), "block_number", {}, 7))
+    assert [group["group"] for group in result["groups"]] == [None, 1, 2]
+
+
+def test_weakest_roots_needs_enough_attempts_and_orders_by_accuracy():
+    stats = [
+        {"word_id": "rare", "attempts": 2, "correct": 0},
+        {"word_id": "half", "attempts": 4, "correct": 2},
+        {"word_id": "often-half", "attempts": 10, "correct": 5},
+        {"word_id": "good", "attempts": 5, "correct": 5},
+        {"word_id": "bad", "attempts": 3, "correct": 0},
+    ]
+    assert [root["word_id"] for root in server.weakest_roots(stats)] == ["bad", "often-half", "half"]
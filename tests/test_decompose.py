@@ -0,0 +1,68 @@
+import pytest
+
+import server
+
+CATALOG = [
+    ("p-trans", "trans-", "prefix"), ("p-bio", "bio-", "prefix"),
+    ("r-port", "port", "root"), ("r-log", "log", "root"), ("r-graph", "graph", "root"),
+    ("s-tion", "-tion", "suffix"), ("s-ology", "-ology", "suffix"), ("s-logy", "-logy", "suffix"),
+    ("s-y", "-y", "suffix"),
+]
+
+
+@pytest.fixture
+def automaton():
+    automaton = server.MorphemeAutomaton()
+    automaton.apply([{"id": word_id, "root": root, "type": kind} for word_id, root, kind in CATALOG], [])
+    return automaton
+
+
+def segmentation(result):
+    return [(segment["text"], segment["type"]) for segment in result["segments"]]
+
+
+def test_matches_reports_overlapping_morphemes_by_start(automaton):
+    assert automaton.matches("biology") == {0: ["bio"], 2: ["ology"], 3: ["log", "logy"]}
+
+
+def test_transportation_splits_with_a_connecting_gap(automaton):
+    best = automaton.decompose("transportation", 1)[0]
+    assert segmentation(best) == [("trans", "prefix"), ("port", "root"), ("a", "gap"), ("tion", "suffix")]
+    assert best["unmatched_letters"] == 1
+    assert best["segments"][1]["word_ids"] == ["r-port"]
+
+
+def test_overlapping_morphemes_may_share_a_vowel(automaton):
+    results = automaton.decompose("biology", 5)
+    complete = [segmentation(result) for result in results if result["unmatched_letters"] == 0]
+    assert [("bio", "prefix"), ("logy", "suffix")] in complete
+    # "ology" starts on the o that closes "bio"
+    assert [("bio", "prefix"), ("ology", "suffix")] in complete
+    shared = next(result for result in results if segmentation(result) == [("bio", "prefix"), ("ology", "suffix")])
+    assert (shared["segments"][0]["end"], shared["segments"][1]["start"]) == (3, 2)
+
+
+def test_morphemes_keep_prefix_root_suffix_order(automaton):
+    # A suffix cannot come before a root, and a prefix cannot follow a gap
+    for word in ["tionport", "xtransport"]:
+        for result in automaton.decompose(word, 10):
+            kinds = [kind for _, kind in segmentation(result) if kind != "gap"]
+            assert kinds in (["suffix"], ["root"]), (word, kinds)
+
+
+def test_single_letter_morphemes_and_punctuation_are_ignored(automaton):
+    assert "y" not in automaton.morphemes
+    assert segmentation(automaton.decompose("Trans-Port", 1)[0]) == [("trans", "prefix"), ("port", "root")]
+
+
+def test_words_without_morphemes_have_no_segmentation(automaton):
+    assert automaton.decompose("xyz", 5) == []
+
+
+def test_catalog_changes_update_the_morpheme_table(automaton):
+    automaton.decompose("biology", 1)
+    automaton.apply([{"id": "r-port", "root": "porta", "type": "root"}], ["s-ology"])
+    assert "port" not in automaton.morphemes and "ology" not in automaton.morphemes
+    assert automaton.morphemes["porta"] == {"root": ["r-port"]}
+    # The automaton is recompiled on the next lookup
+    assert segmentation(automaton.decompose("transportation", 1)[0]) == [("trans", "prefix"), ("porta", "root"), ("tion", "suffix")]
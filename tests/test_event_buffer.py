@@ -0,0 +1,217 @@
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from pymongo.errors import PyMongoError
+
+import server
+
+
+class FakeWriter:
+    """Records written batches; fails or blocks on the calls it is told to"""
+
+    def __init__(self, fail=(), block=()):
+        self.fail = dict(fail)
+        self.block = set(block)
+        self.calls = 0
+        self.written = []
+        self.blocked = asyncio.Event()
+
+    async def __call__(self, docs):
+        self.calls += 1
+        if self.calls in self.block:
+            self.blocked.set()
+            await asyncio.Event().wait()
+        if self.calls in self.fail:
+            raise self.fail[self.calls]
+        self.written.extend(docs)
+        return [True] * len(docs)
+
+
+@pytest.fixture
+def writers(monkeypatch):
+    def install(study=None, quiz=None):
+        study = study or FakeWriter()
+        quiz = quiz or FakeWriter()
+        monkeypatch.setitem(server.EVENT_WRITERS, "study_session", study)
+        monkeypatch.setitem(server.EVENT_WRITERS, "quiz_result", quiz)
+        return study, quiz
+    return install
+
+
+def study_event(n):
+    return {"user_id": "u1", "word_id": f"w{n}", "client_event_id": f"e{n}",
+            "timestamp": datetime(2024, 3, 1, 12, n), "correct": True, "points_earned": 10}
+
+
+def make_buffer(tmp_path=None, flush_max=2, max_events=10):
+    spill = str(tmp_path / "events.jsonl") if tmp_path else ""
+    return server.EventWriteBuffer(10, flush_max, max_events, spill)
+
+
+def test_full_buffer_rejects_with_429(writers):
+    writers()
+    buffer = make_buffer(max_events=2)
+    buffer.add("study_session", study_event(1))
+    buffer.add("study_session", study_event(2))
+    with pytest.raises(HTTPException) as error:
+        buffer.add("study_session", study_event(3))
+    assert error.value.status_code == 429
+    assert error.value.headers == {"Retry-After": "1"}
+    assert buffer.rejected == 1
+    assert len(buffer.pending) == 2
+
+
+def test_flush_requested_once_flush_max_events_are_pending(writers):
+    writers()
+    buffer = make_buffer(flush_max=2)
+    buffer.add("study_session", study_event(1))
+    assert not buffer.flush_requested.is_set()
+    buffer.add("study_session", study_event(2))
+    assert buffer.flush_requested.is_set()
+
+
+def test_flush_writes_in_batches_by_kind(writers):
+    study, quiz = writers()
+    buffer = make_buffer(flush_max=2)
+    for n in range(3):
+        buffer.add("study_session", study_event(n))
+    buffer.add("quiz_result", {"client_event_id": "q1"})
+    asyncio.run(buffer.flush())
+    assert [doc["word_id"] for doc in study.written] == ["w0", "w1", "w2"]
+    assert quiz.written == [{"client_event_id": "q1"}]
+    assert buffer.written == 4 and not buffer.pending
+
+
+def test_mongo_failure_without_spill_requeues_batch_in_order(writers):
+    study, _ = writers(study=FakeWriter(fail={1: PyMongoError("down")}))
+    buffer = make_buffer(flush_max=2)
+    for n in range(3):
+        buffer.add("study_session", study_event(n))
+    asyncio.run(buffer.flush())
+    assert [doc["word_id"] for _, doc in buffer.pending] == ["w0", "w1", "w2"]
+    assert buffer.failed_flushes == 1
+
+    asyncio.run(buffer.flush())
+    assert [doc["word_id"] for doc in study.written] == ["w0", "w1", "w2"]
+
+
+def test_unexpected_error_requeues_batch_and_propagates(writers):
+    writers(quiz=FakeWriter(fail={1: ValueError("bad doc")}))
+    buffer = make_buffer(flush_max=5)
+    buffer.add("study_session", study_event(1))
+    buffer.add("quiz_result", {"client_event_id": "q1"})
+    with pytest.raises(ValueError):
+        asyncio.run(buffer.flush())
+    # The study session was already written; the whole batch goes back in order
+    assert [kind for kind, _ in buffer.pending] == ["study_session", "quiz_result"]
+
+
+def test_spilled_events_are_replayed_on_next_start(writers, tmp_path):
+    writers(study=FakeWriter(fail={1: PyMongoError("down")}))
+    buffer = make_buffer(tmp_path)
+    buffer.add("study_session", study_event(1))
+    asyncio.run(buffer.flush())
+    assert buffer.spilled == 1 and not buffer.pending
+    spilled = [json.loads(line) for line in (tmp_path / "events.jsonl").read_text().splitlines()]
+    assert spilled[0]["kind"] == "study_session"
+
+    study, _ = writers()
+    restarted = make_buffer(tmp_path)
+    asyncio.run(restarted.replay())
+    assert study.written == [study_event(1)]
+    assert not list(tmp_path.iterdir())
+
+
+def test_stop_writes_batch_interrupted_mid_flush(writers):
+    study, _ = writers(study=FakeWriter(block={1}))
+    buffer = make_buffer(flush_max=2)
+
+    async def scenario():
+        buffer.start()
+        buffer.add("study_session", study_event(1))
+        buffer.add("study_session", study_event(2))
+        await asyncio.wait_for(study.blocked.wait(), timeout=1)
+        await buffer.stop()
+
+    asyncio.run(scenario())
+    assert [doc["word_id"] for doc in study.written] == ["w1", "w2"]
+    assert not buffer.pending and buffer.task is None
+
+
+def test_spilled_quiz_session_result_keeps_its_datetimes(writers, tmp_path):
+    started = datetime(2024, 3, 1, 9, 30)
+    session = {
+        "id": "s1", "user_id": "u1", "score": 1, "created_at": started,
+        "questions": [
+            {"question_id": 0, "word_id": "w1", "root": "port"},
+            {"question_id": 1, "word_id": "w2", "root": "graph"},
+        ],
+        "answers": {"0": {"choice": 2, "correct": True, "answered_at": started}},
+    }
+    result = server.quiz_session_result(session)
+
+    writers(quiz=FakeWriter(fail={1: PyMongoError("down")}))
+    buffer = make_buffer(tmp_path)
+    buffer.add("quiz_result", result)
+    asyncio.run(buffer.flush())
+    assert buffer.spilled == 1
+
+    _, quiz = writers()
+    asyncio.run(make_buffer(tmp_path).replay())
+    assert quiz.written == [result]
+    assert quiz.written[0]["started_at"] == started
+    assert quiz.written[0]["questions"][1] == {"word_id": "w2", "root": "graph", "choice": None, "correct": False}
+
+
+def test_replays_spill_files_with_bare_iso_timestamps(writers, tmp_path):
+    line = {"kind": "study_session", "doc": {"user_id": "u1", "timestamp": "2024-03-01T12:00:00Z"}}
+    (tmp_path / "events.jsonl").write_text(json.dumps(line) + "\n")
+    study, _ = writers()
+    asyncio.run(make_buffer(tmp_path).replay())
+    assert study.written == [{"user_id": "u1", "timestamp": datetime(2024, 3, 1, 12, 0)}]
+
+
+def test_replay_file_is_kept_until_every_replayed_event_is_written(writers, tmp_path):
+    lines = [json.dumps({"kind": "study_session", "doc": {**study_event(n), "timestamp": f"2024-03-01T12:0{n}:00"}})
+             for n in range(3)]
+    (tmp_path / "events.jsonl").write_text("\n".join(lines) + "\n")
+    replay_file = tmp_path / "events.jsonl.replay"
+
+    # Mongo refuses the second batch, so the third event is only in memory afterwards
+    study, _ = writers(study=FakeWriter(fail={2: PyMongoError("down")}))
+    buffer = make_buffer(tmp_path, flush_max=1)
+    asyncio.run(buffer.replay())
+    assert [doc["word_id"] for doc in study.written] == ["w0"]
+    assert [doc["word_id"] for _, doc in buffer.pending] == ["w2"]
+    assert replay_file.exists()
+
+    asyncio.run(buffer.flush())
+    assert [doc["word_id"] for doc in study.written] == ["w0", "w2"]
+    assert not replay_file.exists() and buffer.replay_path is None
+    # The refused batch was spilled again for the next start
+    assert json.loads((tmp_path / "events.jsonl").read_text())["doc"]["word_id"] == "w1"
+
+
+def test_unfinished_replay_file_is_replayed_with_newer_spill(writers, tmp_path):
+    def spill_line(n):
+        return json.dumps({"kind": "study_session", "doc": {**study_event(n), "timestamp": f"2024-03-01T12:0{n}:00"}}) + "\n"
+
+    (tmp_path / "events.jsonl.replay").write_text(spill_line(1))
+    (tmp_path / "events.jsonl").write_text(spill_line(2))
+    study, _ = writers()
+    asyncio.run(make_buffer(tmp_path, flush_max=5).replay())
+    assert [doc["word_id"] for doc in study.written] == ["w1", "w2"]
+    assert not list(tmp_path.iterdir())
+
+
+def test_stop_spills_events_mongo_refused(writers, tmp_path):
+    writers(study=FakeWriter(fail={1: PyMongoError("down")}))
+    buffer = make_buffer(tmp_path, flush_max=1)
+    for n in range(3):
+        buffer.add("study_session", study_event(n))
+    asyncio.run(buffer.stop())
+    spilled = [json.loads(line)["doc"]["word_id"] for line in (tmp_path / "events.jsonl").read_text().splitlines()]
+    assert sorted(spilled) == ["w0", "w1", "w2"] and not buffer.pending
@@ -0,0 +1,195 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from pymongo.errors import PyMongoError
+
+import server
+
+
+def matches(doc, query):
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(matches(doc, option) for option in condition):
+                return False
+        elif isinstance(condition, dict) and "$in" in condition:
+            if doc.get(field) not in condition["$in"]:
+                return False
+        elif isinstance(condition, dict) and "$lte" in condition:
+            if doc.get(field) is None or doc[field] > condition["$lte"]:
+                return False
+        elif doc.get(field) != condition:
+            return False
+    return True
+
+
+def apply_update(doc, update):
+    doc.update(update.get("$set", {}))
+    for field in update.get("$unset", {}):
+        doc.pop(field, None)
+    for field, value in update.get("$addToSet", {}).items():
+        if value not in doc.setdefault(field, []):
+            doc[field].append(value)
+    for field, value in update.get("$inc", {}).items():
+        doc[field] = doc.get(field, 0) + value
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = []
+        self.calls = 0
+        self.fail_calls = set()
+
+    async def find_one_and_update(self, query, update, projection=None, upsert=False, return_document=None):
+        self.calls += 1
+        if self.calls in self.fail_calls:
+            raise PyMongoError("primary stepped down")
+        doc = next((doc for doc in self.docs if matches(doc, query)), None)
+        if doc is None and upsert:
+            doc = {field: value for field, value in query.items() if not field.startswith("$")}
+            self.docs.append(doc)
+        if doc is not None:
+            apply_update(doc, update)
+            return dict(doc)
+        return None
+
+    async def update_many(self, query, update):
+        for doc in self.docs:
+            if matches(doc, query):
+                apply_update(doc, update)
+
+    def find(self, query, projection=None):
+        docs = [dict(doc) for doc in self.docs if matches(doc, query)]
+
+        class Cursor:
+            def limit(self, count):
+                return self
+
+            def __aiter__(self):
+                return self.iterate()
+
+            async def iterate(self):
+                for doc in docs:
+                    yield doc
+
+        return Cursor()
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    database = SimpleNamespace(
+        study_sessions=FakeCollection(), quiz_results=FakeCollection(),
+        users=FakeCollection(), user_stats=FakeCollection(), user_stats_deltas=FakeCollection()
+    )
+    database.users.docs.append({"id": "u1", "total_points": 0})
+    monkeypatch.setattr(server, "db", database)
+    monkeypatch.setattr(server, "stats_rebuild_cutoff", SimpleNamespace(get=lambda: asyncio.sleep(0)))
+    awarded = []
+    monkeypatch.setattr(server, "leaderboard", SimpleNamespace(add_points=lambda user_id, daily, *_: awarded.append(daily)))
+    monkeypatch.setattr(server, "user_changed", lambda user_id: asyncio.sleep(0))
+
+    async def insert_events(collection, docs):
+        # Upsert on (user_id, client_event_id) like the real bulk write
+        inserted = []
+        for doc in docs:
+            if any(stored["client_event_id"] == doc["client_event_id"] for stored in collection.docs):
+                inserted.append(False)
+                continue
+            doc["_id"] = len(collection.docs) + 1
+            collection.docs.append(dict(doc))
+            inserted.append(True)
+        return inserted
+
+    monkeypatch.setattr(server, "insert_events", insert_events)
+    database.awarded = awarded
+    return database
+
+
+def study_event(n=1, correct=True):
+    return {"user_id": "u1", "word_id": f"w{n}", "client_event_id": f"e{n}", "correct": correct,
+            "timestamp": datetime(2024, 3, 1, 12, n), "points_earned": 10 if correct else 0}
+
+
+def write_sessions(docs, reviewed=None):
+    async def srs(pending):
+        if reviewed is not None:
+            reviewed.extend(doc["word_id"] for doc in pending)
+    return asyncio.run(server.write_events(server.db.study_sessions, docs, server.study_session_increments, {"srs": srs}))
+
+
+def test_new_events_are_applied_once_and_flagged(fake_db):
+    reviewed = []
+    assert write_sessions([study_event(1), study_event(2, correct=False)], reviewed) == [True, True]
+    assert fake_db.users.docs[0]["total_points"] == 10
+    assert fake_db.user_stats.docs[0]["study_sessions"] == 2
+    assert reviewed == ["w1", "w2"]
+    for event in fake_db.study_sessions.docs:
+        assert event["applied"] and sorted(event["applied_steps"]) == ["points", "srs", "stats"]
+        assert "claim" not in event and isinstance(event["recorded_at"], datetime)
+
+    # A plain retry of an applied event changes nothing
+    assert write_sessions([study_event(1)], reviewed) == [False]
+    assert fake_db.users.docs[0]["total_points"] == 10
+    assert fake_db.user_stats.docs[0]["study_sessions"] == 2
+    assert reviewed == ["w1", "w2"]
+
+
+def test_retry_finishes_an_event_whose_write_failed_part_way(fake_db):
+    fake_db.users.fail_calls = {1}
+    with pytest.raises(PyMongoError):
+        write_sessions([study_event(1)])
+    event = fake_db.study_sessions.docs[0]
+    assert not event["applied"] and event["applied_steps"] == ["stats"]
+    # The failed writer released its claim
+    assert event["claimed_until"] == datetime.min
+
+    # The client retries with the same client_event_id
+    reviewed = []
+    assert write_sessions([study_event(1)], reviewed) == [False]
+    assert fake_db.users.docs[0]["total_points"] == 10
+    # Statistics were applied by the first attempt and are not counted again
+    assert fake_db.user_stats.docs[0]["study_sessions"] == 1
+    assert reviewed == ["w1"] and fake_db.awarded == [{"2024-03-01": 10}]
+    assert event["applied"]
+
+
+def test_retry_leaves_an_event_claimed_by_another_writer(fake_db):
+    fake_db.study_sessions.docs.append({
+        **study_event(1), "_id": 1, "applied": False, "applied_steps": [], "recorded_at": None,
+        "claim": "other", "claimed_until": datetime.utcnow() + timedelta(minutes=1)
+    })
+    assert write_sessions([study_event(1)]) == [False]
+    assert fake_db.users.docs[0]["total_points"] == 0 and not fake_db.user_stats.docs
+
+
+def test_sweep_applies_events_whose_claim_lapsed(fake_db):
+    fake_db.quiz_results.docs.append({
+        "_id": 1, "user_id": "u1", "client_event_id": "s1", "score": 3, "points_earned": 15,
+        "timestamp": datetime(2024, 3, 1, 9), "applied": False, "applied_steps": ["stats"], "recorded_at": datetime(2024, 3, 1, 9),
+        "claim": "crashed", "claimed_until": datetime.utcnow() - timedelta(seconds=1)
+    })
+    asyncio.run(server.apply_unapplied_events())
+    assert fake_db.users.docs[0]["total_points"] == 15
+    assert not fake_db.user_stats.docs
+    assert fake_db.quiz_results.docs[0]["applied"]
+
+
+def test_buffered_batch_failing_part_way_still_awards_everything(fake_db, monkeypatch):
+    monkeypatch.setattr(server, "update_srs_cards", lambda docs: asyncio.sleep(0))
+    # The quiz result's points fail after the study session was fully applied
+    fake_db.users.fail_calls = {2}
+    buffer = server.EventWriteBuffer(10, 10, 10, "")
+    buffer.add("study_session", study_event(1))
+    buffer.add("quiz_result", {"user_id": "u1", "client_event_id": "s1", "score": 3, "points_earned": 15,
+                               "timestamp": datetime(2024, 3, 1, 9)})
+
+    asyncio.run(buffer.flush())
+    assert buffer.failed_flushes == 1 and len(buffer.pending) == 2
+    asyncio.run(buffer.flush())
+
+    assert not buffer.pending
+    assert fake_db.users.docs[0]["total_points"] == 25
+    stats = fake_db.user_stats.docs[0]
+    assert (stats["study_sessions"], stats["quiz_count"], stats["points"]) == (1, 1, 25)
+    assert all(event["applied"] for event in fake_db.study_sessions.docs + fake_db.quiz_results.docs)
@@ -0,0 +1,64 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import server
+
+TEACHER = {"id": "t1", "is_teacher": True}
+VARIANTS = {"thumb": {"webp": "/api/media/thumb"}}
+
+
+class FakeWords:
+    def __init__(self, docs):
+        self.docs = {doc["id"]: doc for doc in docs}
+
+    async def find_one_and_update(self, query, update, projection=None, return_document=None):
+        doc = self.docs.get(query["id"])
+        if doc is None:
+            return None
+        doc.update(update["$set"])
+        return {field: doc.get(field) for field in ("image_hash", "image_variants")}
+
+    async def insert_one(self, doc):
+        self.docs[doc["id"]] = doc
+
+
+@pytest.fixture
+def words(monkeypatch):
+    stored = FakeWords([{"id": "w1", "root": "port", "image": "/api/media/abc", "image_hash": "abc", "image_variants": VARIANTS}])
+    monkeypatch.setattr(server, "db", SimpleNamespace(words=stored))
+    monkeypatch.setattr(server, "word_catalog", SimpleNamespace(invalidate=lambda: asyncio.sleep(0)))
+    scheduled = []
+    monkeypatch.setattr(server, "schedule_image_variants", lambda word_id, doc: scheduled.append((word_id, dict(doc))))
+    stored.scheduled = scheduled
+    return stored
+
+
+def test_edit_echoing_stale_variants_keeps_the_rendered_ones(words):
+    # The editor sends back the slide as it loaded it, before rendering finished
+    body = {"id": "w1", "root": "portare", "image": "/api/media/abc", "image_hash": "zzz", "image_variants": None}
+    asyncio.run(server.update_word("w1", body, current_user=TEACHER))
+    word = words.docs["w1"]
+    assert word["root"] == "portare"
+    assert (word["image_hash"], word["image_variants"]) == ("abc", VARIANTS)
+    # Variants are judged from the stored document, not the request
+    assert words.scheduled == [("w1", {"image_hash": "abc", "image_variants": VARIANTS})]
+
+
+def test_edit_of_slide_without_variants_renders_from_stored_hash(words):
+    words.docs["w1"]["image_variants"] = None
+    asyncio.run(server.update_word("w1", {"root": "portare"}, current_user=TEACHER))
+    assert words.scheduled == [("w1", {"image_hash": "abc", "image_variants": None})]
+
+
+def test_removing_the_image_clears_its_variants(words):
+    asyncio.run(server.update_word("w1", {"image": ""}, current_user=TEACHER))
+    assert (words.docs["w1"]["image_hash"], words.docs["w1"]["image_variants"]) == (None, None)
+
+
+def test_create_ignores_client_image_fields(words):
+    body = {"root": "graph", "image": "/api/media/abc", "image_hash": "abc", "image_variants": VARIANTS}
+    result = asyncio.run(server.create_word(body, current_user=TEACHER))
+    word = words.docs[result["id"]]
+    assert "image_hash" not in word and "image_variants" not in word
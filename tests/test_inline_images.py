@@ -0,0 +1,58 @@
+import asyncio
+import base64
+import io
+
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+
+import server
+
+
+def encode(image_format):
+    buffer = io.BytesIO()
+    Image.new("RGB", (2, 2), (200, 10, 10)).save(buffer, image_format)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+@pytest.fixture
+def stored(monkeypatch):
+    blobs = []
+
+    async def put(data, content_type):
+        blobs.append(content_type)
+        return "d" * 64
+
+    monkeypatch.setattr(server.media_store, "put", put)
+    return blobs
+
+
+@pytest.mark.parametrize("content_type, image_format", [
+    ("image/png", "PNG"), ("image/jpeg", "JPEG"), ("image/gif", "GIF"), ("image/webp", "WEBP"),
+])
+def test_supported_images_are_stored(stored, content_type, image_format):
+    word = asyncio.run(server.store_inline_image({"image": f"data:{content_type};base64,{encode(image_format)}"}))
+    assert word["image"] == server.media_url("d" * 64)
+    assert stored == [content_type]
+
+
+@pytest.mark.parametrize("image", [
+    "data:text/html;base64," + base64.b64encode(b"<script>alert(1)</script>").decode(),
+    "data:image/svg+xml;base64," + base64.b64encode(b"<svg onload='alert(1)'/>").decode(),
+    # Declared as PNG but the bytes are markup
+    "data:image/png;base64," + base64.b64encode(b"<script>alert(1)</script>").decode(),
+    # Declared as PNG but the bytes are a JPEG
+    "data:image/png;base64," + encode("JPEG"),
+    "data:image/png,not-base64",
+])
+def test_non_images_are_rejected(stored, image):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(server.store_inline_image({"image": image}))
+    assert error.value.status_code == 400
+    assert stored == []
+
+
+def test_urls_and_empty_images_pass_through(stored):
+    for word in ({"image": "/api/media/abc"}, {"image": ""}, {"image": None}, {}):
+        assert asyncio.run(server.store_inline_image(word)) == word
+    assert stored == []
@@ -0,0 +1,71 @@
+import asyncio
+from types import SimpleNamespace
+
+import server
+
+
+def student(user_id, points):
+    return {"id": user_id, "first_name": user_id, "last_name": "Student", "total_points": points, "class_name": "A"}
+
+
+class SlowCursor:
+    """A find() cursor that lets the test act while the rebuild is reading"""
+
+    def __init__(self, docs, during=None):
+        self.docs = docs
+        self.during = during
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+        if self.during:
+            self.during()
+
+
+def fake_db(users, stats, during=None):
+    return SimpleNamespace(
+        users=SimpleNamespace(find=lambda *args: SlowCursor(users, during)),
+        user_stats=SimpleNamespace(find=lambda *args: SlowCursor(stats)),
+    )
+
+
+def test_points_awarded_during_rebuild_survive_it(monkeypatch):
+    board = server.Leaderboard()
+    day = server.datetime.utcnow().strftime("%Y-%m-%d")
+    # Mongo already held 100 when the users were read; the award lands after that read
+    award = lambda: board.add_points("s1", {day: 10}, total_points=110, day_totals={day: 30})
+    monkeypatch.setattr(server, "db", fake_db([student("s1", 100), student("s2", 105)],
+                                              [{"user_id": "s1", "daily": {day: {"points": 20}}}], during=award))
+    asyncio.run(board.rebuild())
+
+    assert board.users["s1"]["total_points"] == 110
+    assert board.daily["s1"][day] == 30
+    assert [entry["id"] for entry in board.top("global", None, "all", 2)] == ["s1", "s2"]
+
+
+def test_absolute_totals_make_replayed_and_reordered_awards_harmless():
+    board = server.Leaderboard()
+    board.upsert_user(student("s1", 100))
+    board.add_points("s1", {"2024-03-01": 10}, total_points=120, day_totals={"2024-03-01": 20})
+    # An earlier award whose reply arrived late, then the same award again
+    board.add_points("s1", {"2024-03-01": 10}, total_points=110, day_totals={"2024-03-01": 10})
+    board.add_points("s1", {"2024-03-01": 10}, total_points=120, day_totals={"2024-03-01": 20})
+    assert board.users["s1"]["total_points"] == 120
+    assert board.daily["s1"]["2024-03-01"] == 20
+
+    # Without Mongo's totals the award is added on
+    board.add_points("s1", {"2024-03-01": 5})
+    assert board.users["s1"]["total_points"] == 125
+
+
+def test_board_version_changes_with_every_update():
+    board = server.Leaderboard()
+    other_worker = server.Leaderboard()
+    assert board.instance != other_worker.instance
+    version = board.version
+    board.upsert_user(student("s1", 0))
+    board.add_points("s1", {"2024-03-01": 5})
+    assert board.version == version + 2
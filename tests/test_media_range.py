@@ -0,0 +1,35 @@
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=900-5000", (900, 999)),
+    ("bytes=999-999", (999, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    (" bytes=0-0 ", (0, 0)),
+])
+def test_valid_ranges(header, expected):
+    assert server.parse_byte_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header, size, detail", [
+    ("bytes=-", 1000, "Invalid range"),
+    ("bytes=0-1,5-9", 1000, "Invalid range"),
+    ("items=0-9", 1000, "Invalid range"),
+    ("bytes=a-9", 1000, "Invalid range"),
+    ("bytes=1000-", 1000, "Range not satisfiable"),
+    ("bytes=500-100", 1000, "Range not satisfiable"),
+    ("bytes=-0", 1000, "Range not satisfiable"),
+    ("bytes=0-", 0, "Range not satisfiable"),
+])
+def test_invalid_or_unsatisfiable_ranges_are_416(header, size, detail):
+    with pytest.raises(HTTPException) as error:
+        server.parse_byte_range(header, size)
+    assert error.value.status_code == 416
+    assert error.value.detail == detail
+    assert error.value.headers == {"Content-Range": f"bytes */{size}"}
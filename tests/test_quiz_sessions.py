@@ -0,0 +1,107 @@
+import asyncio
+import copy
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+class FakeSessions:
+    """Just enough of a Motor collection for QuizSessionStore"""
+
+    def __init__(self):
+        self.docs = {}
+
+    async def insert_one(self, doc):
+        self.docs[doc["id"]] = copy.deepcopy(doc)
+
+    async def find_one(self, query, projection=None):
+        doc = self.docs.get(query["id"])
+        return copy.deepcopy(doc) if doc else None
+
+    async def find_one_and_update(self, query, update, projection=None, return_document=None):
+        doc = self.docs.get(query["id"])
+        field = next(key for key in query if key.startswith("answers."))
+        question_id = field.split(".", 1)[1]
+        if not doc or question_id in doc["answers"]:
+            return None
+        doc["answers"][question_id] = update["$set"][field]
+        doc["score"] += update["$inc"]["score"]
+        return copy.deepcopy(doc)
+
+    async def delete_one(self, query):
+        self.docs.pop(query["id"], None)
+
+
+QUESTIONS = [
+    {"question_id": n, "word_id": f"w{n}", "root": f"r{n}", "choices": ["a", "b", "c"], "answer_index": 1}
+    for n in range(3)
+]
+
+
+@pytest.fixture
+def workers(monkeypatch):
+    """Two workers' stores over one collection; answers go through the first"""
+    collection = FakeSessions()
+    first = server.QuizSessionStore(collection, 100, 60)
+    second = server.QuizSessionStore(collection, 100, 60)
+    monkeypatch.setattr(server, "quiz_sessions", first)
+    return first, second
+
+
+def answer(question_id, choice_index):
+    return server.QuizAnswer(question_id=question_id, choice_index=choice_index)
+
+
+def test_session_created_on_one_worker_is_scored_and_finalized_on_another(workers):
+    first, second = workers
+
+    async def scenario():
+        session = await second.create("u1", 7, QUESTIONS, 60)
+        cached = await first.get(session["id"], "u1")
+        outcome = await server.score_quiz_answer(cached, answer(0, 1))
+        assert outcome == {"question_id": 0, "correct": True, "correct_index": 1, "score": 1, "answered": 1}
+        await server.score_quiz_answer(cached, answer(2, 0))
+        # The creating worker's cached copy has no answers; finalizing reads them back
+        return server.quiz_session_result(await second.get(session["id"], "u1", fresh=True))
+
+    result = asyncio.run(scenario())
+    assert result["score"] == 1
+    assert [question["choice"] for question in result["questions"]] == [1, None, 0]
+
+
+def test_answer_recorded_elsewhere_is_rejected_despite_stale_cache(workers):
+    first, second = workers
+
+    async def scenario():
+        session = await first.create("u1", 7, QUESTIONS, 60)
+        stale = await second.get(session["id"], "u1")
+        await server.score_quiz_answer(await first.get(session["id"], "u1"), answer(0, 1))
+        with pytest.raises(HTTPException) as error:
+            await server.score_quiz_answer(stale, answer(0, 2))
+        return error.value
+
+    error = asyncio.run(scenario())
+    assert error.status_code == 400 and error.detail == "Question already answered"
+
+
+def test_expired_deleted_and_foreign_sessions_are_not_found(workers):
+    first, second = workers
+
+    async def scenario():
+        session = await first.create("u1", 7, QUESTIONS, 60)
+        with pytest.raises(HTTPException):
+            await second.get(session["id"], "u2")
+
+        session["expires_at"] = first.cache[session["id"]]["expires_at"] = datetime.utcnow() - timedelta(seconds=1)
+        with pytest.raises(HTTPException):
+            await first.get(session["id"], "u1")
+
+        other = await first.create("u1", 8, QUESTIONS, 60)
+        await second.delete(other["id"])
+        with pytest.raises(HTTPException):
+            await first.get(other["id"], "u1", fresh=True)
+
+    asyncio.run(scenario())
@@ -0,0 +1,106 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import server
+
+NOW = datetime(2024, 3, 1, 12, 0)
+
+
+def review(card, *answers):
+    for correct in answers:
+        card = server.srs_review(card, correct, NOW)
+    return card
+
+
+def test_correct_answers_follow_sm2_intervals():
+    card = server.new_srs_card("u1", "w1")
+    first = review(card, True)
+    second = review(first, True)
+    third = review(second, True)
+    assert (first["interval_days"], second["interval_days"]) == (1, 6)
+    # Quality 4 leaves the ease unchanged
+    assert third["ease"] == server.SRS_INITIAL_EASE
+    assert third["interval_days"] == round(6 * server.SRS_INITIAL_EASE)
+    assert third["due_at"] == NOW + timedelta(days=15)
+    assert third["reps"] == 3 and third["last_reviewed_at"] == NOW
+
+
+def test_lapse_resets_repetitions_and_schedules_relearning():
+    card = review(server.new_srs_card("u1", "w1"), True, True, True)
+    lapsed = review(card, False)
+    assert (lapsed["reps"], lapsed["lapses"], lapsed["interval_days"]) == (0, 1, 0)
+    assert lapsed["due_at"] == NOW + timedelta(minutes=server.SRS_RELEARN_MINUTES)
+    assert lapsed["ease"] < card["ease"]
+    # Relearning starts over at one day
+    assert review(lapsed, True)["interval_days"] == 1
+
+
+def test_review_does_not_modify_the_stored_card():
+    card = server.new_srs_card("u1", "w1")
+    review(card, False)
+    assert card == server.new_srs_card("u1", "w1")
+
+
+def test_ease_never_drops_below_the_floor():
+    card = review(server.new_srs_card("u1", "w1"), *[False] * 10)
+    assert card["ease"] == server.SRS_MIN_EASE
+    assert card["lapses"] == 10
+
+
+def test_classification_thresholds():
+    card = {"ease": 2.5, "interval_days": server.SRS_MASTERED_INTERVAL_DAYS, "lapses": 0}
+    assert server.classify_srs_card(card) == "mastered"
+    assert server.classify_srs_card({**card, "interval_days": server.SRS_MASTERED_INTERVAL_DAYS - 1}) == "studying"
+    assert server.classify_srs_card({**card, "lapses": server.SRS_DIFFICULT_LAPSES}) == "difficult"
+    assert server.classify_srs_card({**card, "ease": 1.79}) == "difficult"
+
+
+def catalog_word(word_id, difficulty):
+    return {"id": word_id, "difficulty": difficulty}
+
+
+def test_new_word_order_follows_catalog_changes():
+    order = server.NewWordOrder()
+    order.apply([catalog_word("b", "advanced"), catalog_word("c", "beginner"), catalog_word("a", "beginner"),
+                 catalog_word("z", "unknown")], [])
+    assert [word_id for _, word_id in order.keys] == ["a", "c", "b", "z"]
+    order.apply([catalog_word("b", "beginner")], ["c"])
+    assert [word_id for _, word_id in order.keys] == ["a", "b", "z"]
+
+
+class FakeCards:
+    def __init__(self, seen):
+        self.seen = set(seen)
+        self.queries = []
+
+    async def distinct(self, field, query):
+        self.queries.append(query["word_id"]["$in"])
+        return [word_id for word_id in query["word_id"]["$in"] if word_id in self.seen]
+
+
+def unseen(monkeypatch, seen, count, words=200):
+    order = server.NewWordOrder()
+    order.apply([catalog_word(f"w{n:03d}", "beginner") for n in range(words)], [])
+    cards = FakeCards(seen)
+    monkeypatch.setattr(server, "new_word_order", order)
+    monkeypatch.setattr(server, "db", SimpleNamespace(srs_cards=cards))
+    return asyncio.run(server.first_unseen_words("u1", count)), cards.queries
+
+
+def test_unseen_words_need_one_indexed_lookup_for_a_new_student(monkeypatch):
+    words, queries = unseen(monkeypatch, seen=[], count=5)
+    assert words == ["w000", "w001", "w002", "w003", "w004"]
+    assert len(queries) == 1 and len(queries[0]) == 50
+
+
+def test_unseen_words_skip_seen_ones_in_growing_chunks(monkeypatch):
+    words, queries = unseen(monkeypatch, seen=[f"w{n:03d}" for n in range(120)], count=3)
+    assert words == ["w120", "w121", "w122"]
+    assert [len(chunk) for chunk in queries] == [50, 100]
+
+
+def test_unseen_words_stop_at_the_end_of_the_catalog(monkeypatch):
+    words, queries = unseen(monkeypatch, seen=[f"w{n:03d}" for n in range(199)], count=3)
+    assert words == ["w199"]
+    assert sum(len(chunk) for chunk in queries) == 200
@@ -0,0 +1,71 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import server
+
+
+class FakeCollection:
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+        self.updates = []
+
+    async def find_one(self, query):
+        return next((doc for doc in self.docs if all(doc.get(k) == v for k, v in query.items())), None)
+
+    async def find_one_and_update(self, query, update, projection=None, upsert=False, return_document=None):
+        self.updates.append((query, update))
+        return None
+
+    def find(self, query):
+        async def docs():
+            for doc in list(self.docs):
+                yield doc
+        return docs()
+
+    async def delete_one(self, query):
+        self.docs = [doc for doc in self.docs if doc["_id"] != query["_id"]]
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    database = SimpleNamespace(leases=FakeCollection(), user_stats=FakeCollection(), user_stats_deltas=FakeCollection())
+    monkeypatch.setattr(server, "db", database)
+    monkeypatch.setattr(server, "stats_rebuild_cutoff", server.StatsRebuildCutoff())
+    return database
+
+
+def test_flatten_increments_restores_dotted_daily_fields():
+    nested = {"study_sessions": 2, "daily": {"2024-03-01": {"sessions": 2, "points": 20}}}
+    assert server.flatten_increments(nested) == {
+        "study_sessions": 2, "daily.2024-03-01.sessions": 2, "daily.2024-03-01.points": 20
+    }
+
+
+def test_events_after_rebuild_cutoff_go_to_deltas(fake_db):
+    cutoff = datetime.utcnow()
+    fake_db.leases.docs.append({"_id": server.STATS_REBUILD_LEASE, "cutoff": cutoff,
+                                "expires_at": cutoff + timedelta(minutes=1)})
+    assert asyncio.run(server.user_stats_collection(cutoff - timedelta(seconds=1))) is fake_db.user_stats
+    assert asyncio.run(server.user_stats_collection(cutoff)) is fake_db.user_stats_deltas
+
+
+def test_expired_rebuild_lease_is_ignored(fake_db):
+    cutoff = datetime.utcnow() - timedelta(minutes=5)
+    fake_db.leases.docs.append({"_id": server.STATS_REBUILD_LEASE, "cutoff": cutoff,
+                                "expires_at": cutoff + timedelta(minutes=1)})
+    assert asyncio.run(server.user_stats_collection(datetime.utcnow())) is fake_db.user_stats
+
+
+def test_merge_applies_and_removes_deltas(fake_db):
+    fake_db.user_stats_deltas.docs.append({
+        "_id": 1, "user_id": "u1", "updated_at": datetime.utcnow(),
+        "quiz_count": 1, "daily": {"2024-03-01": {"quizzes": 1}}
+    })
+    assert asyncio.run(server.merge_user_stats_deltas()) == 1
+    query, update = fake_db.user_stats.updates[0]
+    assert query == {"user_id": "u1"}
+    assert update["$inc"] == {"quiz_count": 1, "daily.2024-03-01.quizzes": 1}
+    assert not fake_db.user_stats_deltas.docs
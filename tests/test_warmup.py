@@ -0,0 +1,97 @@
+import asyncio
+from types import SimpleNamespace
+
+import server
+
+
+async def noop():
+    pass
+
+
+def test_not_ready_until_every_expected_phase_is_done():
+    warmup = server.Warmup()
+    warmup.expect("database", "seed", "catalog")
+    asyncio.run(warmup.phase("database", noop))
+    assert not warmup.ready
+    assert warmup.report()["phases"]["seed"]["status"] == "pending"
+
+    # A finished optional phase does not make the worker ready on its own
+    asyncio.run(warmup.phase("backup", noop, required=False))
+    assert not warmup.ready
+
+    asyncio.run(warmup.phase("seed", noop))
+    asyncio.run(warmup.phase("catalog", noop))
+    assert warmup.ready
+
+
+def test_failed_required_phase_keeps_worker_unready():
+    async def boom():
+        raise RuntimeError("no catalog")
+
+    warmup = server.Warmup()
+    warmup.expect("catalog")
+    asyncio.run(warmup.phase("catalog", boom))
+    assert not warmup.ready
+    assert warmup.phases["catalog"]["error"] == "no catalog"
+
+
+def test_optional_phase_failure_does_not_block_readiness():
+    async def boom():
+        raise RuntimeError("backup failed")
+
+    warmup = server.Warmup()
+    warmup.expect("database")
+    asyncio.run(warmup.phase("backup", boom, required=False))
+    asyncio.run(warmup.phase("database", noop))
+    assert warmup.ready
+
+
+class FakeWords:
+    def __init__(self, docs):
+        self.docs = list(docs)
+
+    async def find_one(self, query, projection=None):
+        return self.docs[0] if self.docs else None
+
+    async def insert_many(self, docs):
+        self.docs.extend(docs)
+
+
+def run_seed(monkeypatch, words):
+    backup_started = []
+
+    async def backup():
+        backup_started.append(True)
+        # A large catalog takes a while to hash
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(server, "db", SimpleNamespace(words=words))
+    monkeypatch.setattr(server, "warmup", server.Warmup())
+    monkeypatch.setattr(server, "background_tasks", [])
+    monkeypatch.setattr(server, "backup_existing_words", backup)
+
+    async def scenario():
+        server.warmup.expect("seed")
+        await server.warmup.phase("seed", server.seed_sample_content)
+        await asyncio.sleep(0)
+        ready = server.warmup.ready
+        for task in server.background_tasks:
+            task.cancel()
+        return ready
+
+    return asyncio.run(scenario()), backup_started
+
+
+def test_existing_catalog_is_backed_up_without_holding_up_readiness(monkeypatch):
+    words = FakeWords([{"id": "w1"}])
+    ready, backup_started = run_seed(monkeypatch, words)
+    assert ready and backup_started
+    assert server.warmup.phases["backup"]["status"] == "running"
+    assert words.docs == [{"id": "w1"}]
+
+
+def test_empty_catalog_is_seeded_without_a_backup(monkeypatch):
+    words = FakeWords([])
+    ready, backup_started = run_seed(monkeypatch, words)
+    assert ready and not backup_started
+    assert len(words.docs) == len(server.SAMPLE_CONTENT)
@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+import server
+
+
+class FakeCatalog:
+    def __init__(self):
+        self.invalidations = 0
+
+    async def invalidate(self):
+        self.invalidations += 1
+
+
+def word(n):
+    return {"root": f"root{n}", "type": "root", "origin": "Latin", "meaning": "m", "examples": ["e"],
+            "definition": "d", "difficulty": "easy", "points": 10, "category": "c"}
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    async def fake_write(batch, report, dry_run):
+        if not dry_run:
+            report["inserted"] += len(batch)
+        report["valid"] += len(batch)
+
+    catalog = FakeCatalog()
+    monkeypatch.setattr(server, "word_catalog", catalog)
+    monkeypatch.setattr(server, "write_word_import_batch", fake_write)
+    monkeypatch.setattr(server, "WORD_IMPORT_BATCH_SIZE", 1)
+    return catalog
+
+
+def records_then(error):
+    async def records():
+        yield 1, word(1), None
+        yield 2, word(2), None
+        raise error
+    return records()
+
+
+def test_cancelled_import_still_invalidates_written_batches(catalog):
+    with pytest.raises(server.JobCancelled):
+        asyncio.run(server.import_word_records(records_then(server.JobCancelled()), "ndjson", False))
+    assert catalog.invalidations == 1
+
+
+def test_dry_run_and_empty_imports_do_not_invalidate(catalog):
+    with pytest.raises(server.JobCancelled):
+        asyncio.run(server.import_word_records(records_then(server.JobCancelled()), "ndjson", True))
+
+    async def nothing():
+        return
+        yield
+
+    report = asyncio.run(server.import_word_records(nothing(), "csv", False))
+    assert report["received"] == 0
+    assert catalog.invalidations == 0